@@ -0,0 +1,112 @@
+import sys
+
+# Markers of array constants in saved flows: {"__npy__": "path/to/array.npy"} for arrays loaded
+# from a file, {"__array__": [...], "dtype": "float64"} for arrays typed in the editor
+NPY_MARKER = "__npy__"
+ARRAY_MARKER = "__array__"
+
+
+# NumPy is optional: without it, vectorized nodes loop over their list inputs
+def get_numpy():
+    """Import NumPy on first use (None if it is not installed)"""
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def call_vectorized(function, args, elementwise=False):
+    """Call a function once over whole arrays, falling back to one call per element
+
+    Returns the result and whether the elementwise fallback was used. With ``elementwise``
+    the array call is not tried, which is how a node remembers that its body does not
+    support arrays.
+    """
+    np = get_numpy()
+    if np is None:
+        return _call_per_element(function, args), True
+
+    arrays = [np.asarray(arg) for arg in args]
+    if not elementwise:
+        try:
+            return function(*arrays), False
+        except (ValueError, TypeError):
+            pass  # The body only handles scalars (e.g. it uses `if` on an input)
+
+    # With the output type given NumPy does not call the function an extra time to find it,
+    # so the type is found from the results instead
+    result = np.vectorize(function, otypes=[object])(*arrays)
+    try:
+        return np.array(result.tolist()), True
+    except ValueError:
+        return result, True  # Results of different shapes stay an array of objects
+
+
+def _call_per_element(function, args):
+    """Call a function for every element of the list inputs (scalars are repeated)"""
+    lengths = {len(arg) for arg in args if isinstance(arg, (list, tuple))}
+    if not lengths:
+        return function(*args)
+    if len(lengths) > 1:
+        raise ValueError(f"Vectorized inputs have different lengths: {sorted(lengths)}")
+
+    length = lengths.pop()
+    columns = [arg if isinstance(arg, (list, tuple)) else [arg] * length for arg in args]
+    return [function(*row) for row in zip(*columns)]
+
+
+def is_array(value):
+    """Check if a value is a NumPy array (without importing NumPy)"""
+    np = sys.modules.get("numpy")
+    return np is not None and isinstance(value, np.ndarray)
+
+
+def make_array(values, dtype=None):
+    """Create an array constant from a (nested) list"""
+    np = get_numpy()
+    if np is None:
+        raise RuntimeError("NumPy is required for array constants")
+    return np.array(values, dtype=dtype)
+
+
+def load_array(path):
+    """Load a ``.npy`` file as a read-only memory-mapped array"""
+    np = get_numpy()
+    if np is None:
+        raise RuntimeError(f"NumPy is required to load the array constant '{path}'")
+    return np.load(path, mmap_mode="r", allow_pickle=False)
+
+
+def saved_array_type(value):
+    """Get the constant type of a saved array constant ('npy' or 'array', None for other values)"""
+    if isinstance(value, dict):
+        if NPY_MARKER in value:
+            return "npy"
+        if ARRAY_MARKER in value:
+            return "array"
+    return None
+
+
+def save_constant(value, path=None):
+    """Get the JSON-safe form of a constant (``path`` is the file of a .npy constant)"""
+    if path is not None:
+        return {NPY_MARKER: path}
+    if is_array(value):
+        return {ARRAY_MARKER: value.tolist(), "dtype": str(value.dtype)}
+    return value
+
+
+def load_constant(value):
+    """Get the value of a saved constant, loading the arrays"""
+    array_type = saved_array_type(value)
+    if array_type == "npy":
+        return load_array(value[NPY_MARKER])
+    if array_type == "array":
+        return make_array(value[ARRAY_MARKER], value.get("dtype"))
+    return value
+
+
+def resolve_constants(constants):
+    """Load the array constants of a saved flow, keeping the other constants as they are"""
+    return {name: load_constant(value) for name, value in constants.items()}
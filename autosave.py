@@ -0,0 +1,258 @@
+import json
+import os
+import shutil
+import threading
+import time
+
+from flow_format import write_save_data
+
+DEFAULT_AUTOSAVE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "python-node-editor", "autosave")
+
+# A journal segment is folded into the snapshot once it grows to this many bytes
+COMPACT_BYTES = int(os.environ.get("NODE_EDITOR_AUTOSAVE_COMPACT", 1024 * 1024))
+
+SNAPSHOT_NAME = "snapshot.json"
+
+
+def autosave_dir():
+    """Get the directory of the autosave journals (None if autosave is disabled)"""
+    return os.environ.get("NODE_EDITOR_AUTOSAVE_DIR", DEFAULT_AUTOSAVE_DIR) or None
+
+
+def _segment_name(number):
+    return f"journal-{number:06d}.jsonl"
+
+
+def _segments(directory):
+    """Get the (number, path) of the journal segments of a session, oldest first"""
+    segments = []
+    for name in os.listdir(directory):
+        if name.startswith("journal-") and name.endswith(".jsonl"):
+            segments.append((int(name[8:-6]), os.path.join(directory, name)))
+    return sorted(segments)
+
+
+class JournalState:
+    """A flow rebuilt from a snapshot and the records of the journal that follow it
+
+    Nodes are kept by their code (the node id of the editor session), and edges as a set of
+    (start socket, end socket) pairs, so each record applies in constant time.
+    """
+
+    def __init__(self, save_data=None):
+        save_data = save_data or {}
+        editor_state = save_data.get("editor_state", {})
+        self.nodes = {node.get("code"): node for node in editor_state.get("nodes", [])}
+        self.edges = {(edge.get("start"), edge.get("end")) for edge in editor_state.get("edges", [])}
+        self.constants = dict(save_data.get("global_constants", {}))
+        self.settings = dict(save_data.get("settings", {}))
+
+    def apply(self, record):
+        """Apply one record of the journal"""
+        op = record["op"]
+        if op == "node":
+            self.nodes[record["state"]["code"]] = record["state"]
+        elif op == "remove":
+            node = self.nodes.pop(record["code"], None)
+            if node is not None:
+                self.set_edges(_socket_ids(node), [])
+        elif op == "body":
+            if record["code"] in self.nodes:
+                self.nodes[record["code"]]["function_body"] = record["text"]
+        elif op == "edges":
+            self.set_edges(record["sockets"], record["edges"])
+        elif op == "positions":
+            for code, (x, y) in record["positions"].items():
+                node = self.nodes.get(int(code))
+                if node is not None:
+                    node["pos_x"], node["pos_y"] = x, y
+        elif op == "constants":
+            self.constants.update(record.get("set", {}))
+            for name in record.get("removed", []):
+                self.constants.pop(name, None)
+        elif op == "settings":
+            self.settings.update(record["settings"])
+
+    def set_edges(self, sockets, edges):
+        """Replace the edges connected to some sockets"""
+        sockets = set(sockets)
+        self.edges = {edge for edge in self.edges if edge[0] not in sockets and edge[1] not in sockets}
+        self.edges.update(tuple(edge) for edge in edges)
+
+    def save_data(self):
+        """Get the flow in the form of a flow file"""
+        return {
+            "editor_state": {
+                "nodes": list(self.nodes.values()),
+                "edges": [{"start": start, "end": end} for start, end in sorted(self.edges)]
+            },
+            "global_constants": self.constants,
+            "settings": self.settings
+        }
+
+
+def _socket_ids(node_state):
+    """Get the ids of the sockets of a saved node"""
+    return [entry["socket"]["id"] for entry in node_state.get("entries", []) if entry.get("socket")]
+
+
+def _read_segment(path):
+    """Read the records of a journal segment, skipping a line cut off by a crash"""
+    records = []
+    with open(path, 'r') as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+    return records
+
+
+def replay(directory, until=None):
+    """Rebuild the flow of a session from its snapshot and journal segments
+
+    Returns the state and the number of the first segment it does not include. Only the
+    segments before ``until`` are read (all of them by default).
+    """
+    snapshot_path = os.path.join(directory, SNAPSHOT_NAME)
+    if os.path.exists(snapshot_path):
+        with open(snapshot_path, 'r') as f:
+            snapshot = json.load(f)
+        state, first = JournalState(snapshot), snapshot.get("journal_segment", 0)
+    else:
+        state, first = JournalState(), 0
+
+    for number, path in _segments(directory):
+        if number < first or (until is not None and number >= until):
+            continue
+        for record in _read_segment(path):
+            state.apply(record)
+        first = number + 1
+    return state, first
+
+
+class ChangeJournal:
+    """Append-only journal of the edits of a flow, for crash recovery
+
+    Every edit is appended to the current journal segment as one JSON line and flushed, which
+    takes microseconds, so it can run on every keystroke. Once a segment grows past
+    ``compact_bytes`` a new segment is started and a background thread folds the older ones
+    into a snapshot of the whole flow. Nothing is written until the first edit, or until
+    :meth:`restart` writes a whole flow (after it was opened, saved or replaced).
+    """
+
+    def __init__(self, directory, compact_bytes=COMPACT_BYTES):
+        self.directory = directory
+        self.compact_bytes = compact_bytes
+        self.segment = 0
+        self.size = 0  # Bytes written to the current segment
+        self._file = None
+        self._compactor = None
+
+    def append(self, op, **fields):
+        """Write one record"""
+        if self._file is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._file = open(os.path.join(self.directory, _segment_name(self.segment)), 'a')
+
+        line = json.dumps({"op": op, **fields}, separators=(",", ":"), default=repr) + "\n"
+        self._file.write(line)
+        self._file.flush()
+        self.size += len(line)
+        if self.size >= self.compact_bytes:
+            self.compact()
+
+    def restart(self, save_data):
+        """Start the journal over from a whole flow, written as the snapshot"""
+        self.wait()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        os.makedirs(self.directory, exist_ok=True)
+        self.segment += 1
+        self.size = 0
+        self._write_snapshot({**save_data, "journal_segment": self.segment})
+
+    def compact(self):
+        """Start a new segment and fold the previous ones into the snapshot in the background"""
+        if self._file is None or (self._compactor is not None and self._compactor.is_alive()):
+            return
+        self._file.close()
+        self.segment += 1
+        self.size = 0
+        self._file = open(os.path.join(self.directory, _segment_name(self.segment)), 'a')
+
+        self._compactor = threading.Thread(target=self._compact, args=(self.segment,),
+                                           name="autosave", daemon=True)
+        self._compactor.start()
+
+    def _compact(self, until):
+        """Write the snapshot of the segments before ``until`` and remove those segments"""
+        try:
+            state, first = replay(self.directory, until)
+            self._write_snapshot({**state.save_data(), "journal_segment": first})
+        except Exception as e:
+            # The segments are kept, so recovery still works from the previous snapshot
+            print(f"Autosave compaction failed: {str(e)}")
+
+    def _write_snapshot(self, save_data):
+        """Replace the snapshot and remove the segments it includes"""
+        # The snapshot is replaced atomically, so a crash leaves the old or the new one
+        temp_path = os.path.join(self.directory, "snapshot.tmp.json")
+        write_save_data(temp_path, save_data)
+        os.replace(temp_path, os.path.join(self.directory, SNAPSHOT_NAME))
+        for number, path in _segments(self.directory):
+            if number < save_data["journal_segment"]:
+                os.remove(path)
+
+    def wait(self):
+        """Wait for a running compaction"""
+        if self._compactor is not None:
+            self._compactor.join()
+
+    def close(self, discard=False):
+        """Close the journal, removing it with ``discard`` (after a clean exit)"""
+        self.wait()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if discard:
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def session_directory(root):
+    """Get the journal directory of a new editor session"""
+    return os.path.join(root, f"{os.getpid()}-{time.time_ns()}")
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, OSError):
+        return True
+    return True
+
+
+def crashed_sessions(root):
+    """Get the journal directories of sessions that ended without closing, newest first
+
+    Directories of ended sessions without any record are removed.
+    """
+    if not root or not os.path.isdir(root):
+        return []
+
+    sessions = []
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        pid = name.split("-")[0]
+        if not os.path.isdir(path) or not pid.isdigit() or _process_alive(int(pid)):
+            continue
+        if os.path.exists(os.path.join(path, SNAPSHOT_NAME)) or any(
+                os.path.getsize(segment) for _, segment in _segments(path)):
+            sessions.append(path)
+        else:
+            shutil.rmtree(path, ignore_errors=True)
+    return sorted(sessions, key=os.path.getmtime, reverse=True)
+
@@ -0,0 +1,58 @@
+"""Cost of journaling edits for autosave, and of recovering the flow from the journal
+
+Starts a journal from the snapshot of a chain of NODES nodes, then appends KEYSTROKES code
+edits (one per keystroke, each with the whole function body, as the editor does) spread over
+the nodes, with the default compaction size so snapshots are written in the background while
+edits go on. Reports the time per edit (mean and worst), the time to replay the journal, and
+checks that the replayed flow has the last code of every node. Run from the repository root:
+
+    python benchmarks/bench_autosave.py [NODES] [KEYSTROKES]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from autosave import ChangeJournal, replay
+from bench_flow_format import BODY, make_save_data
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    keystrokes = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+    save_data = make_save_data(count, 0)
+    del save_data["global_constants"]["WEIGHTS"]
+
+    with tempfile.TemporaryDirectory() as directory:
+        journal = ChangeJournal(os.path.join(directory, "session"))
+        journal.restart(save_data)
+
+        # Type into one node at a time, 50 keystrokes each
+        expected = {}
+        times = []
+        for i in range(keystrokes):
+            code = (i // 50) % count
+            text = BODY.format(scale=1, index=code) + f"\n# edit {i}"
+            start = time.perf_counter()
+            journal.append("body", code=code, text=text)
+            times.append(time.perf_counter() - start)
+            expected[code] = text
+        journal.wait()
+
+        start = time.perf_counter()
+        state, _ = replay(journal.directory)
+        replay_time = time.perf_counter() - start
+        for code, text in expected.items():
+            assert state.nodes[code]["function_body"] == text, code
+        journal.close(discard=True)
+
+    print(f"{count} nodes, {keystrokes} edits ({journal.segment} snapshots)")
+    print(f"  per edit: mean {sum(times) / len(times) * 1e6:.1f} us, "
+          f"worst {max(times) * 1000:.2f} ms")
+    print(f"  replay: {replay_time * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
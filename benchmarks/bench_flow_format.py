@@ -0,0 +1,110 @@
+"""Size and load-time comparison of JSON flow files and flow archives
+
+Builds the saved state of a chain of NODES nodes with a few lines of code each, one large
+array constant and one large list constant, and writes it as JSON (the editor's indented
+format) and as a flow archive. Reports the file sizes, the time to write and fully read each
+file, and the time of Flow.load, which leaves the code and constants of archives unread until
+they are used. Run from the repository root:
+
+    python benchmarks/bench_flow_format.py [NODES] [ARRAY_MB]
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from array_support import load_constant
+from flow_engine import Flow
+from flow_format import load_save_data, write_save_data
+
+BODY = """# Scale the input and keep a running note of what happened
+value = input1 * {scale} + OFFSET
+if value > 1e6:
+    print("large value in step {index}")
+    value = value % 1e6
+return value"""
+
+
+def node_state(index):
+    """Get the saved state of a node as the editor writes it"""
+    return {
+        "code": index, "title": f"Step {index}", "pos_x": 250.0 * index, "pos_y": 0.0,
+        "entries": [{"socket": {"id": f"{index}0"}, "custom": {}},
+                    {"socket": {"id": f"{index}1"},
+                     "custom": {"value": 1.0, "minimum": -100.0, "maximum": 100.0}},
+                    {"socket": None, "custom": {}},
+                    {"socket": None, "custom": {}}],
+        "custom": {}, "inputs": ["input1"], "input_types": {"input1": "any"},
+        "output_name": "result", "function_body": BODY.format(scale=1 + index % 3, index=index),
+        "function_name": f"function_{index}", "pure": False, "stream_inputs": [],
+        "vectorized": False, "cpu_limit": None, "memory_limit": None
+    }
+
+
+def make_save_data(count, array_mb):
+    nodes = [node_state(i) for i in range(count)]
+    edges = [{"start": f"{i}0", "end": f"{i + 1}1"} for i in range(count - 1)]
+    return {
+        "editor_state": {"nodes": nodes, "edges": edges},
+        "global_constants": {
+            "OFFSET": 1,
+            "WEIGHTS": np.random.default_rng(0).random(array_mb * 1024 * 1024 // 8),
+            "LABELS": [f"label {i}" for i in range(20000)]
+        },
+        "settings": {"max_workers": 1, "backend": "thread"}
+    }
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def check_round_trip(original, loaded):
+    """Check that a file gives back the flow that was written"""
+    assert loaded["editor_state"] == original["editor_state"]
+    for name, value in original["global_constants"].items():
+        assert np.array_equal(load_constant(loaded["global_constants"][name]), value), name
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    array_mb = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    save_data = make_save_data(count, array_mb)
+
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"{count} nodes, {array_mb} MB array constant")
+        for label, filename in (("JSON", "flow.json"), ("archive", "flow.flowz")):
+            path = os.path.join(directory, filename)
+            _, write_time = timed(write_save_data, path, save_data)
+            loaded, read_time = timed(load_save_data, path)
+            check_round_trip(save_data, loaded)
+            flow, load_time = timed(Flow.load, path)
+            _, first_body_time = timed(lambda: flow.nodes[0].function_body)
+
+            print(f"  {label:<8} size: {os.path.getsize(path) / 1024:9.1f} KB   "
+                  f"write: {write_time * 1000:7.1f} ms   full read: {read_time * 1000:7.1f} ms   "
+                  f"Flow.load: {load_time * 1000:7.1f} ms   "
+                  f"first code: {first_body_time * 1000:.2f} ms")
+
+        # Without the array constant, to compare the node data alone
+        del save_data["global_constants"]["WEIGHTS"]
+        path = os.path.join(directory, "nodes.json")
+        with open(path, 'w') as f:
+            json.dump(save_data, f, indent=2)
+        json_size = os.path.getsize(path)
+        path = os.path.join(directory, "nodes.flowz")
+        write_save_data(path, save_data)
+        print(f"  nodes only: JSON {json_size / 1024:.1f} KB, "
+              f"archive {os.path.getsize(path) / 1024:.1f} KB "
+              f"({json_size / os.path.getsize(path):.1f}x smaller)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Build time of large scenes with widgets created lazily and eagerly
+
+Builds NODES nodes from saved node states (a grid of nodes, as after loading a flow) in an
+offscreen editor, once with the widgets of every node created right away and once with only
+the nodes in view getting widgets (placeholders elsewhere). The lazy scene is then scrolled
+across in steps, which creates and deletes widgets as nodes come into and leave the view.
+Run from the repository root:
+
+    QT_QPA_PLATFORM=offscreen python benchmarks/bench_lazy_widgets.py [NODES]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5.QtWidgets import QApplication
+
+from QNodeEditor import NodeEditor
+from lazy_widgets import WidgetCuller
+from python_node import PythonFunctionNode
+from bench_flow_format import node_state
+
+
+def build(scene, count, eager):
+    """Create the nodes of a 50-column grid and return the time taken"""
+    start = time.perf_counter()
+    for i in range(count):
+        state = node_state(i)
+        state["pos_x"], state["pos_y"] = 300.0 * (i % 50), 300.0 * (i // 50)
+        node = PythonFunctionNode()
+        scene.add_node(node)
+        node.set_state(state)
+        if eager:
+            node.set_detailed(True)
+    return time.perf_counter() - start
+
+
+def update(culler):
+    """Update the widgets, running the turns the culler spreads the work over back to back"""
+    culler.update_nodes()
+    while culler.timer.isActive():
+        culler.timer.stop()
+        culler.update_nodes()
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    app = QApplication(sys.argv)
+
+    for eager in (True, False):
+        editor = NodeEditor()
+        editor.resize(1600, 1000)
+        editor.show()
+        app.processEvents()
+        culler = WidgetCuller(editor)
+        build_time = build(editor.scene, count, eager)
+        line = (f"{'eager' if eager else 'lazy':<6} build: {build_time:6.2f} s "
+                f"({build_time / count * 1000:5.2f} ms/node)")
+
+        if not eager:
+            # Show the top-left corner, then scroll down the scene a screen at a time
+            start = time.perf_counter()
+            editor.view.centerOn(800, 500)
+            update(culler)
+            line += f"   first view: {(time.perf_counter() - start) * 1000:6.1f} ms"
+            start = time.perf_counter()
+            steps = 0
+            for y in range(1500, 300 * (count // 50), 1000):
+                editor.view.centerOn(800, y)
+                update(culler)
+                steps += 1
+            line += (f"   scroll step: {(time.perf_counter() - start) / max(steps, 1) * 1000:6.1f} ms"
+                     f"   nodes with widgets: {sum(node.detailed for node in editor.scene.nodes)}")
+        print(line)
+        editor.close()
+        editor.deleteLater()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Wall-clock comparison of sequential and parallel evaluation of a wide flow
+
+Builds a flow with WIDTH independent nodes feeding one merge node and evaluates it with each
+execution backend. The process and sandbox pools are kept between runs, so the first run of
+each backend (which starts the pool) is reported apart from a later run. Run from the
+repository root:
+
+    python benchmarks/bench_parallel.py [WIDTH] [WORKERS]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flow_engine import Flow, FlowNode, BACKENDS
+
+# Simulated I/O-bound node (e.g. "Read File" on a slow disk or "Run Command")
+IO_BODY = "import time\ntime.sleep(0.05)\nreturn input1"
+
+# CPU-bound node
+CPU_BODY = "total = 0\nfor i in range(300000):\n    total += i % 7\nreturn total"
+
+
+def wide_flow(width, body):
+    """Create a flow with `width` independent nodes connected to one merge node"""
+    nodes = [FlowNode(i, f"Branch {i}", ["input1"], body, defaults={"input1": i})
+             for i in range(width)]
+    merge = FlowNode(width, "Merge", ["values"], "return len(values)")
+    connections = {width: {"values": list(range(width))}}
+    return Flow(nodes + [merge], connections)
+
+
+def measure(flow, workers, backend):
+    flow.mark_all_dirty()
+    start = time.perf_counter()
+    flow.evaluate(max_workers=workers, backend=backend)
+    return time.perf_counter() - start
+
+
+def main():
+    width = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count() or 4
+
+    for label, body in (("I/O-bound", IO_BODY), ("CPU-bound", CPU_BODY)):
+        flow = wide_flow(width, body)
+        sequential = measure(flow, 1, "thread")
+        print(f"{label} ({width} branches, {workers} workers)")
+        print(f"  sequential: {sequential:.3f}s")
+        for backend in BACKENDS:
+            first = measure(flow, workers, backend)
+            elapsed = measure(flow, workers, backend)
+            print(f"  {backend:<10}: {elapsed:.3f}s ({sequential / elapsed:.1f}x), "
+                  f"first run {first:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Wall-clock comparison of passing node values to another process by pickling or shared memory
+
+Sends bytes, str and NumPy values of growing size to a worker process, which reads them and
+sends back their length: once pickled through a pipe (as before the shared memory transport),
+and once as a shared memory handle. Run from the repository root:
+
+    python benchmarks/bench_transport.py [MAX_MB] [REPEAT]
+"""
+import multiprocessing
+import os
+import pickle
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from shared_values import to_shared, view_values, detach_unused, release
+
+
+def _worker(conn):
+    """Receive values until the pipe is closed and send back their length"""
+    while True:
+        try:
+            message = conn.recv_bytes()
+        except EOFError:
+            return
+        values = view_values(pickle.loads(message))
+        conn.send(len(values["value"]))
+        del values
+        detach_unused()
+
+
+def make_values(size):
+    return {
+        "bytes": b"x" * size,
+        "str": "x" * size,
+        "ndarray": np.ones(size // 8)
+    }
+
+
+def measure(conn, value, repeat, shared):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        sent = to_shared(value, min_size=0) if shared else value
+        conn.send_bytes(pickle.dumps({"value": sent}, protocol=pickle.HIGHEST_PROTOCOL))
+        conn.recv()
+        if shared:
+            release(sent)
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    max_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    context = multiprocessing.get_context("spawn")
+    conn, child_conn = context.Pipe()
+    process = context.Process(target=_worker, args=(child_conn,), daemon=True)
+    process.start()
+
+    try:
+        # Start the worker and import NumPy in it before measuring
+        measure(conn, np.ones(1), 1, shared=True)
+
+        size_mb = 1
+        while size_mb <= max_mb:
+            print(f"{size_mb} MB")
+            for kind, value in make_values(size_mb * 1024 * 1024).items():
+                pickled = measure(conn, value, repeat, shared=False)
+                shared = measure(conn, value, repeat, shared=True)
+                print(f"  {kind:<8} pickle: {pickled * 1000:8.2f} ms   "
+                      f"shared memory: {shared * 1000:8.2f} ms ({pickled / shared:.1f}x)")
+            size_mb *= 4
+    finally:
+        conn.close()
+        process.join()
+
+
+if __name__ == "__main__":
+    main()
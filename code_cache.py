@@ -0,0 +1,206 @@
+import hashlib
+import importlib.util
+import marshal
+import os
+import sys
+import textwrap
+import threading
+import types
+from collections import OrderedDict
+
+# Name every shared function is compiled under; nodes rename their copy on retrieval
+CANONICAL_NAME = "__node_function__"
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "python-node-editor", "bytecode")
+
+
+def normalize_body(function_body):
+    """Normalize a function body so equivalent sources hash to the same key"""
+    body = function_body.replace("\r\n", "\n").replace("\r", "\n")
+
+    # Trailing blank lines never change the meaning of the function
+    lines = body.split("\n")
+    while lines and not lines[-1].strip():
+        lines.pop()
+    return "\n".join(lines)
+
+
+def build_function_source(function_name, inputs, function_body):
+    """Build the source of the `def` statement wrapping a node function body"""
+    params = ", ".join(inputs)
+    function_code = f"def {function_name}({params}):\n"
+
+    # Handle empty function body
+    if not function_body.strip():
+        function_code += "    return None"
+    else:
+        # Indent the function body
+        function_code += textwrap.indent(function_body, '    ')
+
+    return function_code
+
+
+class BytecodeCache:
+    """Content-addressed LRU cache of compiled node functions, persisted to disk"""
+
+    def __init__(self, max_entries=512, cache_dir=None, max_disk_entries=4096):
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.max_disk_entries = max_disk_entries
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Counters
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def key(self, inputs, function_body):
+        """Get the content hash of a function signature and normalized body"""
+        digest = hashlib.sha256()
+        digest.update(sys.implementation.cache_tag.encode())
+        digest.update(b"\0")
+        digest.update(",".join(inputs).encode())
+        digest.update(b"\0")
+        digest.update(normalize_body(function_body).encode())
+        return digest.hexdigest()
+
+    def get_function_code(self, function_name, inputs, function_body):
+        """Get the code object for a node function, compiling it only if it is not cached"""
+        key = self.key(inputs, function_body)
+
+        with self._lock:
+            code = self._entries.get(key)
+            if code is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+
+        if code is None:
+            code = self._load_from_disk(key)
+            if code is not None:
+                self.disk_hits += 1
+            else:
+                self.misses += 1
+                code = self._compile(inputs, function_body)
+                self._store_on_disk(key, code)
+            self._remember(key, code)
+
+        # Give the shared code the name of the node function (used in tracebacks)
+        if function_name != CANONICAL_NAME:
+            code = code.replace(co_name=function_name, co_qualname=function_name)
+        return code
+
+    def info(self):
+        """Get the counters and current size of the cache"""
+        with self._lock:
+            size = len(self._entries)
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "size": size,
+            "max_entries": self.max_entries
+        }
+
+    def clear(self, disk=False):
+        """Clear the in-memory cache, and optionally the bytecode files on disk"""
+        with self._lock:
+            self._entries.clear()
+
+        if disk and self.cache_dir and os.path.isdir(self.cache_dir):
+            for filename in os.listdir(self.cache_dir):
+                if filename.endswith(".nodec"):
+                    try:
+                        os.remove(os.path.join(self.cache_dir, filename))
+                    except OSError:
+                        pass
+
+    def _compile(self, inputs, function_body):
+        """Compile a function body and return the code object of the function"""
+        source = build_function_source(CANONICAL_NAME, inputs, normalize_body(function_body))
+        module_code = compile(source, f"<{CANONICAL_NAME}>", "exec")
+        for const in module_code.co_consts:
+            if isinstance(const, types.CodeType) and const.co_name == CANONICAL_NAME:
+                return const
+        raise RuntimeError("Could not compile node function")
+
+    def _remember(self, key, code):
+        """Store a code object in memory, evicting the least recently used entries"""
+        with self._lock:
+            self._entries[key] = code
+            self._entries.move_to_end(key)
+            while len(self._entries) > max(self.max_entries, 0):
+                self._entries.popitem(last=False)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.{sys.implementation.cache_tag}.nodec")
+
+    def _load_from_disk(self, key):
+        """Load marshalled bytecode from the cache directory (if present and valid)"""
+        if not self.cache_dir:
+            return None
+
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+
+        # Ignore bytecode written by another interpreter version
+        magic = importlib.util.MAGIC_NUMBER
+        if not data.startswith(magic):
+            return None
+
+        try:
+            code = marshal.loads(data[len(magic):])
+        except (EOFError, ValueError, TypeError):
+            return None
+
+        # Mark as recently used so disk eviction keeps it
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return code if isinstance(code, types.CodeType) else None
+
+    def _store_on_disk(self, key, code):
+        """Write marshalled bytecode to the cache directory, evicting old files"""
+        if not self.cache_dir:
+            return
+
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+            # Write to a temporary file first so readers never see partial data
+            path = self._path(key)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(importlib.util.MAGIC_NUMBER + marshal.dumps(code))
+            os.replace(tmp_path, path)
+
+            self._prune_disk()
+        except OSError:
+            # The disk cache is only an optimization
+            pass
+
+    def _prune_disk(self):
+        """Remove the least recently used bytecode files above the disk size cap"""
+        files = [entry for entry in os.scandir(self.cache_dir) if entry.name.endswith(".nodec")]
+        if len(files) <= self.max_disk_entries:
+            return
+
+        files.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in files[:len(files) - self.max_disk_entries]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+
+# Cache shared by every node in the process
+shared_cache = BytecodeCache(
+    max_entries=int(os.environ.get("NODE_EDITOR_CACHE_SIZE", 512)),
+    cache_dir=os.environ.get("NODE_EDITOR_CACHE_DIR", DEFAULT_CACHE_DIR) or None
+)
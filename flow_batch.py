@@ -0,0 +1,220 @@
+import ast
+import contextlib
+import csv
+import json
+import pickle
+import sys
+import time
+
+from flow_engine import Flow
+from result_cache import shared_disk_cache
+
+# Flow of each process of the batch pool, its constants and input values, loaded once and
+# reused for every row
+_batch_flow = None
+_batch_constants = None
+_batch_defaults = None
+
+_MISSING = object()
+
+
+def parse_value(text):
+    """Parse a table cell as a Python literal, falling back to the text itself"""
+    try:
+        return ast.literal_eval(text)
+    except (ValueError, SyntaxError):
+        return text
+
+
+def read_rows(filepath):
+    """Read the input rows of a batch lazily from a CSV, JSON (list of dicts) or JSON Lines file"""
+    if filepath.endswith(".csv"):
+        with open(filepath, newline='') as f:
+            for row in csv.DictReader(f):
+                yield {name: parse_value(value) for name, value in row.items()}
+    elif filepath.endswith(".jsonl"):
+        with open(filepath) as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    else:
+        with open(filepath) as f:
+            yield from json.load(f)
+
+
+def saved_defaults(flow):
+    """Get the values of the unconnected inputs of every node, as loaded"""
+    return {node_id: dict(node.defaults) for node_id, node in flow.nodes.items()}
+
+
+def apply_row(flow, row, base_constants, base_defaults):
+    """Set the constants and unconnected node inputs of a flow to the values of a row
+
+    Columns named ``NODE.INPUT`` set the value of an unconnected input, where ``NODE`` is the
+    title or id of a node. The other columns override the global constant of the same name.
+    Inputs and constants the row does not set keep the values of the loaded flow. Nodes that
+    use a constant whose value changed since the previous row are marked dirty; nodes with
+    changed input values are found by the flow engine itself.
+    """
+    for node_id, defaults in base_defaults.items():
+        flow.nodes[node_id].defaults = dict(defaults)
+
+    constants = dict(base_constants)
+    for name, value in row.items():
+        node_name, sep, input_name = name.partition(".")
+        if not sep:
+            constants[name] = value
+            continue
+
+        matched = False
+        for node in flow.nodes.values():
+            if node_name in (node.title, str(node.node_id)) and input_name in node.inputs:
+                node.defaults[input_name] = value
+                matched = True
+        if not matched:
+            raise KeyError(f"No node input named '{name}'")
+
+    changed = {name for name in set(constants) | set(flow.constants)
+               if _changed(constants.get(name, _MISSING), flow.constants.get(name, _MISSING))}
+    if changed:
+        for node in flow.nodes.values():
+            names = node.referenced_globals()
+            if names is None or names & changed:
+                node.mark_dirty()
+    flow.constants = constants
+
+
+def _changed(value, previous):
+    """Check if a constant changed between two rows"""
+    if value is previous:
+        return False
+    try:
+        return bool(value != previous)
+    except Exception:
+        return True  # e.g. arrays, whose comparison is not a single bool
+
+
+def portable(value):
+    """Get a value that can be sent back from a worker process (its repr if it can not)"""
+    try:
+        pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+    except Exception:
+        return repr(value)
+    return value
+
+
+def run_row(flow, base_constants, base_defaults, index, row):
+    """Evaluate the flow for one row and return a record of its outputs (or its error)
+
+    Anything the nodes print goes to stderr, so it does not mix with records written to stdout.
+    The nodes run one at a time on the thread backend, whatever the flow was saved with, since
+    the rows are already spread over processes.
+    """
+    record = {"row": index, "inputs": row}
+    try:
+        apply_row(flow, row, base_constants, base_defaults)
+        with contextlib.redirect_stdout(sys.stderr):
+            results = flow.evaluate(max_workers=1, backend="thread")
+        record["outputs"] = {f"{flow.nodes[node_id].title} [{node_id}]": portable(results[node_id])
+                             for node_id in flow.output_ids()}
+    except Exception as e:
+        record["error"] = str(e)
+    return record
+
+
+def _init_batch(filepath, overrides, outputs, use_disk_cache):
+    """Load the flow once in each process of the batch pool"""
+    global _batch_flow, _batch_constants, _batch_defaults
+    if not use_disk_cache:
+        shared_disk_cache.path = None
+    _batch_flow = Flow.load(filepath)
+    _batch_flow.outputs = outputs
+    _batch_flow.constants.update(overrides)
+    _batch_constants = dict(_batch_flow.constants)
+    _batch_defaults = saved_defaults(_batch_flow)
+
+
+def _run_batch_row(item):
+    """Evaluate one row in a process of the batch pool"""
+    index, row = item
+    return run_row(_batch_flow, _batch_constants, _batch_defaults, index, row)
+
+
+def run_batch(filepath, rows, overrides=None, workers=1, chunksize=8, outputs=None):
+    """Evaluate a saved flow once per row and yield a record for each row as it finishes
+
+    Every process loads the flow once, so compiled functions, memoized results and nodes
+    that do not depend on the row values are reused across the rows it evaluates. With more
+    than one worker, records are yielded in the order the rows finish. ``outputs`` are the
+    ids of the nodes to report (see :py:attr:`Flow.outputs`).
+    """
+    overrides = dict(overrides or {})
+    if workers <= 1:
+        flow = Flow.load(filepath)
+        flow.outputs = outputs
+        flow.constants.update(overrides)
+        base_constants = dict(flow.constants)
+        base_defaults = saved_defaults(flow)
+        for index, row in enumerate(rows):
+            yield run_row(flow, base_constants, base_defaults, index, row)
+        return
+
+    # Imported here to keep the startup of the headless runner fast
+    import multiprocessing
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    with multiprocessing.get_context(method).Pool(
+            workers, _init_batch,
+            (filepath, overrides, outputs, bool(shared_disk_cache.path))) as pool:
+        yield from pool.imap_unordered(_run_batch_row, enumerate(rows), chunksize)
+
+
+class BatchWriter:
+    """Writes batch records as JSON Lines or, with ``output_names``, as CSV rows
+
+    The CSV columns are the row number, the input columns of the first row, the outputs and
+    the error message of rows that failed.
+    """
+
+    def __init__(self, f, output_names=None):
+        self.f = f
+        self.output_names = output_names
+        self._writer = None
+
+    def write(self, record):
+        if self.output_names is None:
+            self.f.write(json.dumps(record, default=repr) + "\n")
+            return
+
+        if self._writer is None:
+            fieldnames = ["row", *record["inputs"], *self.output_names, "error"]
+            self._writer = csv.DictWriter(self.f, fieldnames=fieldnames, extrasaction="ignore")
+            self._writer.writeheader()
+        self._writer.writerow({"row": record["row"], **record["inputs"],
+                               **record.get("outputs", {}), "error": record.get("error", "")})
+
+
+def write_batch(records, output=None, output_names=None):
+    """Stream batch records to a file (or stdout) and return the number of rows and failures
+
+    Records are written as CSV when ``output`` ends with ``.csv`` (with the ``output_names``
+    columns), and as JSON Lines otherwise.
+    """
+    count, failed = 0, 0
+    f = open(output, 'w', newline='') if output else sys.stdout
+    try:
+        csv_format = bool(output) and output.endswith(".csv")
+        writer = BatchWriter(f, (output_names or []) if csv_format else None)
+        start = time.perf_counter()
+        for record in records:
+            writer.write(record)
+            count += 1
+            if "error" in record:
+                failed += 1
+                print(f"Row {record['row']} failed: {record['error']}", file=sys.stderr)
+        elapsed = time.perf_counter() - start
+    finally:
+        if output:
+            f.close()
+
+    print(f"Ran {count} rows ({failed} failed) in {elapsed:.2f}s", file=sys.stderr)
+    return count, failed
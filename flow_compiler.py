@@ -0,0 +1,215 @@
+import ast
+import inspect
+import json
+import re
+import types
+
+import array_support
+from array_support import saved_array_type, save_constant, NPY_MARKER, ARRAY_MARKER
+from code_cache import build_function_source, normalize_body
+from flow_format import FlowArchive, is_flow_archive
+from flow_runtime import NodeGlobals
+
+# Binds a node function to its own globals, like FunctionRuntime.call_function
+BIND_HELPER = '''
+def _bind(function, shared):
+    """Give a node function its own globals, layered over the constants of the run"""
+    return types.FunctionType(function.__code__, NodeGlobals(shared), function.__name__)
+'''
+
+# Helpers of generated modules for nodes that return streams (see flow_streams)
+STREAM_HELPERS = '''
+def _is_stream(value):
+    """Check if a node result is a stream (a generator or other iterator, but not a file)"""
+    return isinstance(value, Iterator) and not isinstance(value, io.IOBase)
+
+
+def _collect(value):
+    """Collect a stream into a list for a regular input"""
+    return list(value) if _is_stream(value) else value
+
+
+def _split(value, count):
+    """Give every stream input its own copy of a stream"""
+    return list(itertools.tee(value, count)) if _is_stream(value) else [value] * count
+'''
+
+
+def node_function_name(node):
+    """Get the name of the generated function of a node"""
+    slug = re.sub(r"\W+", "_", str(node.title)).strip("_").lower()
+    return f"_node_{node.node_id}_{slug}" if slug else f"_node_{node.node_id}"
+
+
+def literal_source(value, description):
+    """Get the source of a literal value, checking that it evaluates back to the same value"""
+    source = repr(value)
+    try:
+        if ast.literal_eval(source) == value:
+            return source
+    except (ValueError, SyntaxError):
+        pass
+    raise ValueError(f"{description} can not be written as Python source: {source[:60]}")
+
+
+def constant_source(name, value, array_path=None):
+    """Get the source of a global constant (arrays are loaded or created with NumPy)"""
+    saved = save_constant(value, array_path)
+    array_type = saved_array_type(saved)
+    if array_type == "npy":
+        return f"np.load({saved[NPY_MARKER]!r}, mmap_mode='r', allow_pickle=False)"
+    if array_type == "array":
+        return f"np.array({saved[ARRAY_MARKER]!r}, dtype={saved['dtype']!r})"
+    return literal_source(value, f"Constant '{name}'")
+
+
+def compile_flow(flow, array_paths=None, description="a flow"):
+    """Generate the source of a Python module that evaluates a flow without the engine
+
+    Every node becomes a function, called in topological order with the results of the
+    nodes before it. As in the engine, each call gets its own globals layered over the global
+    constants, so a node can not change what other nodes (or the module) see.
+    ``run(**constants)`` evaluates the flow with the given constants replacing the saved ones
+    for that call only, and returns the results of the output nodes, keyed like the results
+    of the headless runner. Memoization and incremental runs are not part of the module.
+
+    Nodes that do not lead to an output (see :py:attr:`Flow.outputs`) are left out. The pure
+    nodes that only depend on the constants are folded: they run on the first call of
+    ``run()`` and again on every call that is given constants.
+    """
+    array_paths = array_paths or {}
+    eliminated = [flow.nodes[node_id] for node_id in flow.dead_nodes()]
+    if eliminated:
+        flow = flow.pruned(flow.live_nodes())
+    order = flow.topological_order()
+    outputs = flow.output_ids()
+    nodes = [flow.nodes[node_id] for node_id in order]
+    uses_arrays = (any(saved_array_type(save_constant(value)) for value in flow.constants.values())
+                   or bool(array_paths))
+    vectorized = any(getattr(node, "vectorized", False) for node in nodes)
+
+    lines = [f'"""Generated by the Python Function Node Editor from {description}',
+             "",
+             "Call run() to evaluate the flow. It returns the results of the output nodes.",
+             '"""']
+    if eliminated:
+        lines.append("# Left out since they do not lead to an output: "
+                     + ", ".join(f"{node.title} [{node.node_id}]" for node in eliminated))
+    lines += ["import builtins", "import io", "import itertools", "import types",
+              "from collections.abc import Iterator"]
+    if uses_arrays:
+        lines += ["import numpy as np"]
+    lines += ["", "", "# Global constants", "_CONSTANTS = {"]
+    for name, value in flow.constants.items():
+        lines.append(f"    {name!r}: {constant_source(name, value, array_paths.get(name))},")
+    lines.append("}")
+    lines += ["", "", inspect.getsource(NodeGlobals).rstrip(), "", BIND_HELPER.rstrip()]
+
+    if vectorized:
+        # The same fallback as in the editor: whole arrays first, then element by element
+        lines += ["", "", "# Vectorized nodes", "_ELEMENTWISE = {}"]
+        for helper in (array_support.get_numpy, array_support.call_vectorized,
+                       array_support._call_per_element):
+            lines += ["", "", inspect.getsource(helper).rstrip()]
+    lines += ["", STREAM_HELPERS.rstrip()]
+
+    # One function per node
+    for node in nodes:
+        lines += ["", "", f"# {node.title} [{node.node_id}]",
+                  build_function_source(node_function_name(node), node.inputs,
+                                        normalize_body(node.function_body))]
+
+    consumers = flow.consumers()
+    lazy = {node_id for node_id in order if flow.passes_streams(node_id, consumers)}
+    folded = flow.constant_nodes()
+
+    if folded:
+        lines += ["", "", "# Results of the nodes that only depend on the constants", "_FOLDED = None",
+                  "", "", "def _fold(shared):",
+                  '    """Evaluate the nodes that only depend on the constants"""']
+        for node_id in folded:
+            lines += _node_call_source(flow, flow.nodes[node_id], lazy, consumers)
+        lines.append(f"    return {{{', '.join(f'{node_id}: v{node_id}' for node_id in folded)}}}")
+
+    lines += ["", "", "def run(**constants):",
+              '    """Evaluate the flow and return the results of its output nodes"""']
+    if folded:
+        lines.append("    global _FOLDED")
+    lines.append("    shared = types.MappingProxyType({**_CONSTANTS, **constants})")
+    if folded:
+        # Only the results for the saved constants are kept, other constants fold again
+        lines += ["    if constants:",
+                  "        folded = _fold(shared)",
+                  "    else:",
+                  "        if _FOLDED is None:",
+                  "            _FOLDED = _fold(shared)",
+                  "        folded = _FOLDED"]
+        lines += [f"    v{node_id} = folded[{node_id}]" for node_id in folded]
+    for node in nodes:
+        if node.node_id not in folded:
+            lines += _node_call_source(flow, node, lazy, consumers)
+
+    results = ", ".join(f"{f'{flow.nodes[node_id].title} [{node_id}]'!r}: v{node_id}"
+                        for node_id in outputs)
+    lines += [f"    return {{{results}}}", "", "",
+              'if __name__ == "__main__":',
+              "    for name, value in run().items():",
+              '        print(f"{name}: {value!r}")', ""]
+    return "\n".join(lines)
+
+
+def _node_call_source(flow, node, lazy, consumers):
+    """Get the lines of run() that call a node and pass its result on"""
+    node_id = node.node_id
+    connected = flow.connections.get(node_id, {})
+
+    # Each connection from a lazy stream takes its own copy of the stream
+    arguments = []
+    for input_name in node.inputs:
+        sources = connected.get(input_name)
+        if not sources:
+            arguments.append(literal_source(node.defaults.get(input_name),
+                                            f"Input '{input_name}' of node '{node.title}'"))
+            continue
+        values = [f"s{source}.pop()" if source in lazy else f"v{source}" for source in sources]
+        arguments.append(values[0] if len(values) == 1 else f"[{', '.join(values)}]")
+
+    function = f"_bind({node_function_name(node)}, shared)"
+    if getattr(node, "vectorized", False):
+        call = (f"v{node_id}, _ELEMENTWISE[{node_id}] = call_vectorized({function}, "
+                f"[{', '.join(arguments)}], _ELEMENTWISE.get({node_id}, False))")
+    else:
+        call = f"v{node_id} = {function}({', '.join(arguments)})"
+
+    lines = ["    try:",
+             f"        {call}",
+             "    except Exception as e:",
+             f"        raise RuntimeError({f'Error in node {node.title!r}: '!r} + str(e)) from e"]
+
+    # Like the engine, streams are collected into a list unless every input using them streams
+    if node_id in lazy:
+        lines.append(f"    s{node_id} = _split(v{node_id}, {len(consumers[node_id])})")
+    else:
+        lines.append(f"    v{node_id} = _collect(v{node_id})")
+    return lines
+
+
+def saved_array_paths(filepath):
+    """Get the files of the .npy constants of a saved flow (JSON file or flow archive)"""
+    if is_flow_archive(filepath):
+        archive = FlowArchive(filepath)
+        archive.close()
+        constants = archive.index.get("global_constants", {})
+    else:
+        with open(filepath) as f:
+            constants = json.load(f).get("global_constants", {})
+    return {name: value[NPY_MARKER] for name, value in constants.items()
+            if saved_array_type(value) == "npy"}
+
+
+def load_compiled(source, name="compiled_flow"):
+    """Import the source of a compiled flow as a module"""
+    module = types.ModuleType(name)
+    module.__file__ = f"<{name}>"
+    exec(compile(source, module.__file__, "exec"), module.__dict__)
+    return module
@@ -0,0 +1,762 @@
+import contextlib
+import io
+import json
+import sys
+import threading
+import time
+
+from array_support import resolve_constants
+from flow_format import FlowArchive, is_flow_archive
+from flow_runtime import FunctionRuntime, freeze_constants, same_constants
+from flow_streams import is_stream, guard_stream, split_stream
+from result_cache import shared_disk_cache
+from shared_values import (SharedValue, SharedRefs, to_shared, from_shared, view_values,
+                           detach_unused, release)
+
+# Execution backends for running independent nodes concurrently (the sandbox backend runs
+# every node in a warm pool of worker processes, with CPU time and memory limits)
+BACKENDS = ("thread", "process", "sandbox")
+
+# Constants of the flow, set once in each process of the process pool, and the nodes run there
+_process_globals = None
+_process_nodes = {}  # node id -> (spec, FlowNode)
+
+# Process pool kept between runs: (size, result cache path, constants, executor)
+_process_pool = None
+_process_pool_lock = threading.Lock()
+
+# Node running on each thread, used to tag the output of nodes
+_running = threading.local()
+
+
+def running_node():
+    """Get the node running on the current thread (None outside of a node)"""
+    return getattr(_running, "node", None)
+
+
+@contextlib.contextmanager
+def node_context(node):
+    """Mark a node as the running node of the current thread"""
+    previous = running_node()
+    _running.node = node
+    try:
+        yield
+    finally:
+        _running.node = previous
+
+
+def _init_process(constants, cache_path):
+    """Initialize a process of the process pool with the constants of the flow
+
+    The process uses the persistent result cache of the main process (none with ``--no-cache``).
+    """
+    global _process_globals
+    _process_globals = freeze_constants(constants)
+    shared_disk_cache.path = cache_path
+
+
+def get_process_pool(size, constants):
+    """Get the process pool shared by all runs, with at least ``size`` workers
+
+    Its processes keep their compiled functions, memoized results and nodes between runs. The
+    constants are sent once when the processes start, so the pool is started again when a
+    constant changed (or the result cache was switched off).
+    """
+    global _process_pool
+    # Imported here to keep the startup of the headless runner fast
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    with _process_pool_lock:
+        if _process_pool is not None:
+            pool_size, cache_path, pool_constants, executor = _process_pool
+            if (pool_size >= size and cache_path == shared_disk_cache.path
+                    and same_constants(constants, pool_constants)):
+                return executor
+            _process_pool = None
+            executor.shutdown(wait=True)
+
+        # Fork-safe start method, since the editor runs flows from a thread
+        method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        executor = ProcessPoolExecutor(size, multiprocessing.get_context(method),
+                                       initializer=_init_process,
+                                       initargs=(dict(constants), shared_disk_cache.path))
+        _process_pool = (size, shared_disk_cache.path, dict(constants), executor)
+        return executor
+
+
+def discard_process_pool(executor):
+    """Stop the process pool after a run that failed or was cancelled (it may still be busy)"""
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is not None and _process_pool[3] is executor:
+            _process_pool = None
+    executor.shutdown(wait=True, cancel_futures=True)
+
+
+def _run_in_process(spec, values, elementwise=False):
+    """Run a node in a process of the process pool
+
+    Returns its result, its stdout and whether its vectorized body needs the elementwise
+    fallback, which the node in the main process remembers and passes to the next run (in
+    whichever process it lands). Large inputs and results are passed as handles of shared
+    memory blocks (see shared_values).
+    """
+    detach_unused()
+
+    # Nodes are kept while the pool is, so their compiled function is reused between runs
+    cached = _process_nodes.get(spec["node_id"])
+    if cached is None or cached[0] != spec:
+        cached = _process_nodes[spec["node_id"]] = (spec, FlowNode(**spec))
+    node = cached[1]
+    node.globals_env = _process_globals
+    node.elementwise = node.elementwise or elementwise
+    stdout = io.StringIO()
+    with contextlib.redirect_stdout(stdout):
+        result = node.run(view_values(values))
+
+        # Generators can not be sent back to the main process
+        if is_stream(result):
+            result = list(guard_stream(node.title, result))
+    return to_shared(result), stdout.getvalue(), node.elementwise
+
+
+def _release_result(future):
+    """Release the shared result of a process node whose result is not used (e.g. after an error)"""
+    if not future.cancelled() and future.exception() is None:
+        release(future.result()[0])
+
+
+def _run_node(node, values, profiler=None):
+    """Run a node in this process, profiling it if a profiler is given"""
+    with node_context(node):
+        if profiler is not None:
+            return profiler.run_node(node, values)
+        return node.run(values)
+
+
+def node_spec(node):
+    """Get the picklable description of a node used to rebuild it in another process"""
+    return {
+        "node_id": node.node_id,
+        "title": node.title,
+        "inputs": list(node.inputs),
+        "function_body": node.function_body,
+        "output_name": node.output_name,
+        "function_name": node.function_name,
+        "pure": node.pure,
+        "stream_inputs": list(node.stream_inputs),
+        "vectorized": node.vectorized,
+        "cpu_limit": getattr(node, "cpu_limit", None),
+        "memory_limit": getattr(node, "memory_limit", None)
+    }
+
+
+class FlowCancelled(Exception):
+    """Raised when the evaluation of a flow is cancelled"""
+
+
+class FlowNode(FunctionRuntime):
+    """Qt-free node rebuilt from the saved state of a PythonFunctionNode"""
+
+    def __init__(self, node_id, title="Python Function", inputs=None, function_body="",
+                 output_name="result", function_name=None, defaults=None, pure=False,
+                 stream_inputs=None, vectorized=False, cpu_limit=None, memory_limit=None):
+        self.node_id = node_id
+        self.title = title
+        self.inputs = list(inputs) if inputs is not None else ["input1"]
+        self._function_body = function_body
+        self._load_body = None  # Reads the code on first use (for flows loaded from archives)
+        self.output_name = output_name
+        self.function_name = function_name or f"function_{node_id}"
+        self.defaults = defaults or {}  # Values of inputs that are not connected
+        self.pure = pure  # Memoize results on the input values
+        self.stream_inputs = list(stream_inputs or [])  # Inputs that receive streams as iterators
+        self.vectorized = vectorized  # Run once over whole NumPy arrays
+        self.cpu_limit = cpu_limit  # CPU seconds allowed on the sandbox backend
+        self.memory_limit = memory_limit  # Extra MB of memory allowed on the sandbox backend
+        self.globals_env = {}
+
+        self.init_function_cache()
+
+    @property
+    def function_body(self):
+        if self._load_body is not None:
+            self._function_body = self._load_body()
+            self._load_body = None
+        return self._function_body
+
+    @function_body.setter
+    def function_body(self, function_body):
+        self._function_body = function_body
+        self._load_body = None
+
+    @classmethod
+    def from_state(cls, node_id, state, read_text=None):
+        """Create a node from a saved node state and get the socket ids of its entries
+
+        Returns the node and a dict of (socket id, entry name) pairs. The first entry with a
+        socket is always the output, the others are the inputs in the order they were added.
+        ``read_text`` reads a code stored outside of the state (see flow_format), which is
+        only done when the code is first used.
+        """
+        inputs = state.get("inputs", ["input1"])
+        output_name = state.get("output_name", "result")
+
+        sockets = [entry for entry in state.get("entries", []) if entry.get("socket")]
+        socket_names = {}
+        defaults = {}
+        for entry, name in zip(sockets, [output_name] + list(inputs)):
+            socket_names[entry["socket"]["id"]] = name
+            value = entry.get("custom", {}).get("value")
+            if name != output_name and value is not None:
+                defaults[name] = value
+
+        function_body = state.get("function_body", "")
+        lazy = read_text is not None and not isinstance(function_body, str)
+        node = cls(node_id, state.get("title", "Python Function"), inputs,
+                   "" if lazy else function_body, output_name, state.get("function_name"),
+                   defaults, state.get("pure", False), state.get("stream_inputs"),
+                   state.get("vectorized", False), state.get("cpu_limit"), state.get("memory_limit"))
+        if lazy:
+            node._load_body = lambda: read_text(function_body)
+        return node, socket_names
+
+    def __repr__(self):
+        return f"<FlowNode {self.node_id} '{self.title}'>"
+
+
+class Flow:
+    """Graph of function nodes that can be evaluated without the editor
+
+    ``nodes`` are :py:class:`FlowNode` objects, or any object with a ``node_id``, ``title``,
+    ``inputs`` and ``defaults`` attribute and a ``run(values)`` method. ``connections`` maps each
+    node id to a dict of (input name, list of source node ids).
+
+    Nodes may return a stream (e.g. a generator). Inputs listed in the ``stream_inputs`` of a
+    node receive the stream as an iterator and consume it lazily, while it is produced. When
+    some node uses the result as a regular input, or no node uses it, the stream is collected
+    into a list.
+    """
+
+    def __init__(self, nodes, connections=None, constants=None, max_workers=1, backend="thread"):
+        self.nodes = {node.node_id: node for node in nodes}
+        self.connections = connections or {}
+        self.constants = constants or {}
+
+        # Number of nodes that may run at the same time, and what they run on
+        self.max_workers = max_workers
+        self.backend = backend
+
+        # Limits of the nodes without their own limits on the sandbox backend (None: no limit)
+        self.cpu_limit = None
+        self.memory_limit = None
+
+        # Ids of the nodes whose results are wanted (None for every node whose output is unused)
+        self.outputs = None
+
+        # Ids of the nodes whose cached result was reused by the last evaluation, and of the
+        # nodes it left out since they do not lead to an output
+        self.skipped = []
+        self.eliminated = []
+
+        # Copies of the streams of the running evaluation that were not consumed yet
+        self._streams = {}
+
+    @classmethod
+    def from_state(cls, editor_state, constants=None, read_text=None):
+        """Rebuild a flow from the ``editor_state`` written by the editor"""
+        nodes = []
+        socket_lookup = {}  # socket id -> (node id, entry name, is output)
+        for node_id, node_state in enumerate(editor_state.get("nodes", [])):
+            node, socket_names = FlowNode.from_state(node_id, node_state, read_text)
+            nodes.append(node)
+            for socket_id, name in socket_names.items():
+                socket_lookup[socket_id] = (node_id, name, name == node.output_name)
+
+        # Edges may be stored in either direction, so look at which end is the output
+        connections = {}
+        for edge_state in editor_state.get("edges", []):
+            start = socket_lookup.get(edge_state.get("start"))
+            end = socket_lookup.get(edge_state.get("end"))
+            if start is None or end is None or start[2] == end[2]:
+                continue
+            source, target = (start, end) if start[2] else (end, start)
+            connections.setdefault(target[0], {}).setdefault(target[1], []).append(source[0])
+
+        return cls(nodes, connections, constants)
+
+    @classmethod
+    def load(cls, filepath):
+        """Load a flow from a JSON file or flow archive written by the editor
+
+        The code of the nodes and the large constants of archives are read when first used,
+        so the nodes and constants a run does not need are never read.
+        """
+        if is_flow_archive(filepath):
+            archive = FlowArchive(filepath)
+            save_data = archive.index
+            flow = cls.from_state(save_data.get("editor_state", {}), archive.constants(),
+                                  archive.read_text)
+        else:
+            with open(filepath, 'r') as f:
+                save_data = json.load(f)
+            flow = cls.from_state(save_data.get("editor_state", {}),
+                                  resolve_constants(save_data.get("global_constants", {})))
+
+        settings = save_data.get("settings", {})
+        flow.max_workers = settings.get("max_workers", flow.max_workers)
+        flow.backend = settings.get("backend", flow.backend)
+        return flow
+
+    def predecessors(self, node_id):
+        """Get the ids of the nodes connected to the inputs of a node"""
+        result = []
+        for sources in self.connections.get(node_id, {}).values():
+            for source in sources:
+                if source not in result:
+                    result.append(source)
+        return result
+
+    def dependents(self):
+        """Get a dict of (node id, ids of the nodes that use its output) pairs"""
+        dependents = {node_id: [] for node_id in self.nodes}
+        for node_id in self.nodes:
+            for source in self.predecessors(node_id):
+                dependents[source].append(node_id)
+        return dependents
+
+    def consumers(self):
+        """Get a dict of (node id, (node id, input name) pair of every connection from it) pairs"""
+        consumers = {node_id: [] for node_id in self.nodes}
+        for target, inputs in self.connections.items():
+            for input_name, sources in inputs.items():
+                for source in sources:
+                    consumers[source].append((target, input_name))
+        return consumers
+
+    def sinks(self):
+        """Get the ids of the nodes whose output is not used by another node"""
+        used = set()
+        for node_id in self.nodes:
+            used.update(self.predecessors(node_id))
+        return [node_id for node_id in self.nodes if node_id not in used]
+
+    def output_ids(self):
+        """Get the ids of the nodes whose results are the results of the flow"""
+        if self.outputs is None:
+            return self.sinks()
+        return [node_id for node_id in self.outputs if node_id in self.nodes]
+
+    def live_nodes(self):
+        """Get the ids of the outputs and of the nodes they depend on (the other nodes are dead)"""
+        live = set()
+        pending = list(self.output_ids())
+        while pending:
+            node_id = pending.pop()
+            if node_id not in live:
+                live.add(node_id)
+                pending.extend(self.predecessors(node_id))
+        return live
+
+    def dead_nodes(self):
+        """Get the ids of the nodes that do not lead to an output"""
+        live = self.live_nodes()
+        return [node_id for node_id in self.nodes if node_id not in live]
+
+    def pruned(self, live):
+        """Get a flow of only the given nodes, which share their cached results with this flow"""
+        flow = Flow([node for node_id, node in self.nodes.items() if node_id in live],
+                    {target: inputs for target, inputs in self.connections.items() if target in live},
+                    self.constants, self.max_workers, self.backend)
+        flow.outputs = self.outputs
+        flow.cpu_limit = self.cpu_limit
+        flow.memory_limit = self.memory_limit
+        return flow
+
+    def constant_nodes(self):
+        """Get the ids of the pure nodes that only depend on the constants, in topological order
+
+        These are the pure nodes without connected inputs and the pure nodes whose connections
+        all come from such nodes. Their results stay the same until the constants change.
+        Nodes that pass on streams lazily are not included, since a stream is used up by the
+        run that consumes it.
+        """
+        consumers = self.consumers()
+        constant = []
+        found = set()
+        for node_id in self.topological_order():
+            if (getattr(self.nodes[node_id], "pure", False)
+                    and not self.passes_streams(node_id, consumers)
+                    and all(source in found for source in self.predecessors(node_id))):
+                constant.append(node_id)
+                found.add(node_id)
+        return constant
+
+    def levels(self):
+        """Group the node ids into levels whose nodes only depend on nodes in earlier levels"""
+        level_of = {}
+        for node_id in self.topological_order():
+            level_of[node_id] = 1 + max((level_of[source] for source in self.predecessors(node_id)),
+                                        default=-1)
+
+        levels = [[] for _ in range(max(level_of.values(), default=-1) + 1)]
+        for node_id, level in level_of.items():
+            levels[level].append(node_id)
+        return levels
+
+    def topological_order(self):
+        """Get the node ids in an order where every node comes after its inputs"""
+        remaining = {node_id: len(self.predecessors(node_id)) for node_id in self.nodes}
+        dependents = self.dependents()
+
+        order = []
+        ready = [node_id for node_id, count in remaining.items() if count == 0]
+        while ready:
+            node_id = ready.pop(0)
+            order.append(node_id)
+            for dependent in dependents[node_id]:
+                remaining[dependent] -= 1
+                if remaining[dependent] == 0:
+                    ready.append(dependent)
+
+        if len(order) != len(self.nodes):
+            raise ValueError("Cannot evaluate flow since there are cycles in the connections")
+        return order
+
+    def input_values(self, node_id, results):
+        """Gather the input values of a node from the results of the nodes connected to it"""
+        node = self.nodes[node_id]
+        connected = self.connections.get(node_id, {})
+        values = {}
+        for input_name in node.inputs:
+            sources = connected.get(input_name)
+            if not sources:
+                values[input_name] = node.defaults.get(input_name)
+            elif len(sources) == 1:
+                values[input_name] = self.source_value(sources[0], results)
+            else:
+                # Like the editor, several connections to one input give a list of values
+                values[input_name] = [self.source_value(source, results) for source in sources]
+        return values
+
+    def source_value(self, source, results):
+        """Get the result of a node for one connection (each connection gets its own stream)"""
+        streams = self._streams.get(source)
+        if streams:
+            return streams.pop()
+        return results[source]
+
+    def passes_streams(self, node_id, consumers):
+        """Check if the streams of a node are passed on lazily (every connected input streams)
+
+        ``consumers`` are the connections from every node (see :meth:`consumers`).
+        """
+        return bool(consumers[node_id]) and all(
+            input_name in getattr(self.nodes[target], "stream_inputs", ())
+            for target, input_name in consumers[node_id])
+
+    def prepare_result(self, node_id, result, consumers):
+        """Split a stream into one copy per connection, or collect it into a list
+
+        Streams are only passed on lazily when every connected input is a stream input.
+        """
+        if not is_stream(result):
+            return result
+
+        stream = guard_stream(self.nodes[node_id].title, result)
+        if not self.passes_streams(node_id, consumers):
+            return list(stream)
+
+        self._streams[node_id] = split_stream(stream, len(consumers[node_id]))
+        return result
+
+    def sandbox_spec(self, node):
+        """Get the description of a node for the sandbox, with the limits of the flow as defaults"""
+        spec = node_spec(node)
+        if spec["cpu_limit"] is None:
+            spec["cpu_limit"] = self.cpu_limit
+        if spec["memory_limit"] is None:
+            spec["memory_limit"] = self.memory_limit
+        return spec
+
+    def shared_input_values(self, node_id, values, handles):
+        """Get the input values of a node to send to another process, with large values shared
+
+        Results that are still in the shared memory block of the node that produced them are
+        sent as their handle (``handles``). Other large values are copied into new blocks,
+        which are returned too so the caller can release them once the node ran.
+        """
+        connected = self.connections.get(node_id, {})
+        sent = {}
+        created = []
+
+        def share(value, source=None):
+            handle = handles.get(source)
+            if handle is None:
+                handle = to_shared(value)
+                if isinstance(handle, SharedValue):
+                    created.append(handle)
+            return handle
+
+        for input_name, value in values.items():
+            sources = connected.get(input_name)
+            if not sources:
+                sent[input_name] = share(value)
+            elif len(sources) == 1:
+                sent[input_name] = share(value, sources[0])
+            else:
+                sent[input_name] = [share(item, source) for item, source in zip(value, sources)]
+        return sent, created
+
+    def inputs_key(self, node_id):
+        """Get a value describing the connections and unconnected input values of a node"""
+        node = self.nodes[node_id]
+        connected = self.connections.get(node_id, {})
+        return (tuple((name, tuple(connected.get(name, ()))) for name in node.inputs),
+                tuple(node.defaults.items()))
+
+    def is_clean(self, node_id, rerun):
+        """Check if the cached result of a node can be reused
+
+        A node is clean when it has a result, was not marked dirty (code, inputs or constants
+        changed), its connections are the same as in the last run, and none of the nodes
+        before it were run again (``rerun``).
+        """
+        node = self.nodes[node_id]
+        return (not node.dirty and node.has_cached_result
+                and node.last_inputs_key == self.inputs_key(node_id)
+                and not any(source in rerun for source in self.predecessors(node_id)))
+
+    def store_result(self, node_id, result, dependents):
+        """Cache the result of a node that ran and mark the nodes after it dirty
+
+        The nodes after it are marked right away, so they also run next time if this
+        evaluation stops before reaching them. Streams are consumed by this evaluation, so
+        nodes that return a stream run again every time.
+        """
+        node = self.nodes[node_id]
+        node.store_result(result, self.inputs_key(node_id))
+        if node_id in self._streams:
+            node.mark_dirty()
+        for dependent in dependents[node_id]:
+            self.nodes[dependent].mark_dirty()
+
+    def mark_all_dirty(self):
+        """Make the next evaluation run every node again"""
+        for node in self.nodes.values():
+            node.mark_dirty()
+
+    def evaluate(self, cancel_event=None, on_node_finished=None, max_workers=None, backend=None,
+                 profiler=None):
+        """Evaluate every node in the flow and return a dict of (node id, result) pairs
+
+        Nodes that are clean (see :py:meth:`is_clean`) are not run again; their cached result is
+        used and their id is listed in :py:attr:`skipped`. When :py:attr:`outputs` is set, nodes
+        that do not lead to an output are not run and are listed in :py:attr:`eliminated`.
+
+        Parameters
+        ----------
+        cancel_event : threading.Event, optional
+            When set, the evaluation stops before the next node and raises FlowCancelled
+        on_node_finished : callable, optional
+            Called as ``on_node_finished(node_id, result, index, total)`` after each node
+        max_workers : int, optional
+            Maximum number of nodes running at the same time (default: :py:attr:`max_workers`)
+        backend : str, optional
+            ``'thread'`` for I/O-bound or ``'process'`` for CPU-bound nodes (default:
+            :py:attr:`backend`)
+        profiler : FlowProfiler, optional
+            Profiler that records the measurements of every node that runs
+
+        On the ``'sandbox'`` backend every node runs in a worker process, even with one worker.
+        """
+        max_workers = max_workers or self.max_workers
+        backend = backend or self.backend
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown execution backend '{backend}'")
+
+        # Evaluate the flow of the live nodes only, if some nodes are dead
+        self.eliminated = []
+        if self.outputs is not None:
+            eliminated = self.dead_nodes()
+            if eliminated:
+                flow = self.pruned(self.live_nodes())
+                self.skipped = flow.skipped  # Filled while the pruned flow runs
+                self.eliminated = eliminated
+                return flow.evaluate(cancel_event, on_node_finished, max_workers, backend,
+                                     profiler)
+
+        shared_globals = freeze_constants(self.constants)
+        order = self.topological_order()
+        self.skipped.clear()
+        self._streams = {}
+        try:
+            if backend == "sandbox" or (max_workers > 1 and len(order) > 1):
+                return self._evaluate_parallel(order, shared_globals, cancel_event,
+                                               on_node_finished, max_workers, backend, profiler)
+            return self._evaluate_sequential(order, shared_globals, cancel_event,
+                                             on_node_finished, profiler)
+        finally:
+            # Drop the streams that were not consumed (e.g. after an error)
+            self._streams = {}
+
+    def _evaluate_sequential(self, order, shared_globals, cancel_event, on_node_finished,
+                             profiler=None):
+        """Evaluate the flow one node at a time, in topological order"""
+        dependents = self.dependents()
+        consumers = self.consumers()
+        results = {}
+        rerun = set()
+        for index, node_id in enumerate(order):
+            if cancel_event is not None and cancel_event.is_set():
+                raise FlowCancelled("Flow execution was cancelled")
+
+            node = self.nodes[node_id]
+            if self.is_clean(node_id, rerun):
+                results[node_id] = node.cached_result
+                self.skipped.append(node_id)
+            else:
+                node.globals_env = shared_globals
+                values = self.input_values(node_id, results)
+                results[node_id] = self.prepare_result(node_id, _run_node(node, values, profiler),
+                                                       consumers)
+                self.store_result(node_id, results[node_id], dependents)
+                rerun.add(node_id)
+
+            if on_node_finished is not None:
+                on_node_finished(node_id, results[node_id], index + 1, len(order))
+        return results
+
+    def _evaluate_parallel(self, order, shared_globals, cancel_event, on_node_finished,
+                           max_workers, backend, profiler=None):
+        """Evaluate the flow, running every node as soon as all of its inputs are ready"""
+        # Imported here to keep the startup of the headless runner fast
+        from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+        if backend == "sandbox":
+            from sandbox_pool import get_sandbox_pool
+            executor = get_sandbox_pool(max_workers)
+            executor.set_constants(self.constants)
+        elif backend == "process":
+            executor = get_process_pool(max_workers, self.constants)
+        else:
+            executor = ThreadPoolExecutor(max_workers, thread_name_prefix="flow")
+
+        # Count the unfinished inputs of every node
+        remaining = {node_id: len(self.predecessors(node_id)) for node_id in order}
+        dependents = self.dependents()
+        consumers = self.consumers()
+
+        ready = [node_id for node_id in order if remaining[node_id] == 0]
+        running = {}
+        submitted = {}  # node id -> (submit time, input values, shared inputs) of process nodes
+        results = {}
+        rerun = set()
+
+        # Results of process nodes stay in shared memory until the nodes using them ran
+        handles = {}
+        refs = SharedRefs()
+
+        def finish(node_id, result):
+            results[node_id] = result
+            if on_node_finished is not None:
+                on_node_finished(node_id, result, len(results), len(order))
+
+            for dependent in dependents[node_id]:
+                remaining[dependent] -= 1
+                if remaining[dependent] == 0:
+                    ready.append(dependent)
+
+        completed = False
+        try:
+            while ready or running:
+                if cancel_event is not None and cancel_event.is_set():
+                    raise FlowCancelled("Flow execution was cancelled")
+
+                # Start the nodes whose inputs are ready (clean nodes finish immediately)
+                while ready and len(running) < max_workers:
+                    node_id = ready.pop(0)
+                    node = self.nodes[node_id]
+                    if self.is_clean(node_id, rerun):
+                        self.skipped.append(node_id)
+                        finish(node_id, node.cached_result)
+                        continue
+
+                    values = self.input_values(node_id, results)
+                    if backend != "thread":
+                        sent, created = self.shared_input_values(node_id, values, handles)
+                        submitted[node_id] = (time.perf_counter(), values, created)
+                    if backend == "sandbox":
+                        future = executor.submit(self.sandbox_spec(node), sent)
+                    elif backend == "process":
+                        future = executor.submit(_run_in_process, node_spec(node), sent,
+                                                 node.elementwise)
+                    else:
+                        node.globals_env = shared_globals
+                        future = executor.submit(_run_node, node, values, profiler)
+                    running[future] = node_id
+                    rerun.add(node_id)
+
+                if not running:
+                    continue
+
+                # Collect finished nodes and release the nodes that depend on them
+                finished, _ = wait(running, timeout=0.1, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    node_id = running.pop(future)
+                    result = future.result()
+                    if backend == "process":
+                        result, output, self.nodes[node_id].elementwise = result
+                    elif backend == "sandbox":
+                        result, output = result
+                    if backend != "thread":
+                        if output:
+                            with node_context(self.nodes[node_id]):
+                                sys.stdout.write(output)
+
+                        # The node is done with its shared inputs
+                        start, values, created = submitted.pop(node_id)
+                        for value in created:
+                            release(value)
+                        for sources in self.connections.get(node_id, {}).values():
+                            for source in sources:
+                                refs.done(handles.get(source))
+
+                        # Keep a shared result for the nodes using it, and copy it for this process
+                        if isinstance(result, SharedValue):
+                            handles[node_id] = result
+                            refs.add(result, len(consumers[node_id]))
+                            result = from_shared(result)
+
+                        # Only the wall time of the node is known in this process
+                        if profiler is not None:
+                            profiler.add_record(self.nodes[node_id], start, start,
+                                                time.perf_counter(), values, result)
+
+                    result = self.prepare_result(node_id, result, consumers)
+                    self.store_result(node_id, result, dependents)
+                    finish(node_id, result)
+            completed = True
+        finally:
+            if backend == "sandbox":
+                # The pool stays warm; only the nodes of this run are stopped
+                executor.cancel(list(running))
+            elif backend == "process":
+                # The pool stays warm after a run that completed; otherwise its processes may
+                # still be running nodes of this run (or one of them died)
+                if not completed:
+                    discard_process_pool(executor)
+            else:
+                executor.shutdown(wait=True, cancel_futures=True)
+
+            # Remove the shared memory left by nodes that failed, did not run or were still running
+            if backend != "thread":
+                for future in running:
+                    future.add_done_callback(_release_result)
+            for start, values, created in submitted.values():
+                for value in created:
+                    release(value)
+            refs.clear()
+
+        return results
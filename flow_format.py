@@ -0,0 +1,351 @@
+import io
+import json
+import os
+import re
+import zipfile
+from collections.abc import MutableMapping
+
+from array_support import get_numpy, is_array, saved_array_type, save_constant, load_constant
+
+# Flow archives are zip files with an index of the flow (index.json) and separate compressed
+# blobs for the code of the nodes and the large constants, which are only read when used
+ARCHIVE_EXTENSION = ".flowz"
+ARCHIVE_FORMAT = "python-node-flow"
+ARCHIVE_VERSION = 1
+INDEX_NAME = "index.json"
+
+# Marker of a value stored in a blob of the archive: {"__blob__": "nodes/0.py"}
+BLOB_MARKER = "__blob__"
+
+# Constants whose JSON is at least this many characters are stored as blobs
+BLOB_MIN_SIZE = 4096
+
+# Characters read at a time by the incremental reader of JSON flow files
+CHUNK_SIZE = 1 << 16
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+
+def is_flow_archive(filepath):
+    """Check if a file is a flow archive (and not a JSON flow)"""
+    return zipfile.is_zipfile(filepath)
+
+
+def blob_name(value):
+    """Get the name of the blob of a stored value (None if it is stored in the index)"""
+    if isinstance(value, dict) and len(value) == 1 and BLOB_MARKER in value:
+        return value[BLOB_MARKER]
+    return None
+
+
+def _write_constant(archive, index, value):
+    """Store a constant in the index, or in a blob if it is an array or large"""
+    if saved_array_type(value) == "array" and get_numpy() is not None:
+        value = load_constant(value)
+
+    if is_array(value):
+        buffer = io.BytesIO()
+        get_numpy().save(buffer, value, allow_pickle=False)
+        name = f"constants/{index}.npy"
+        archive.writestr(name, buffer.getvalue())
+        return {BLOB_MARKER: name}
+
+    text = json.dumps(value)
+    if len(text) < BLOB_MIN_SIZE:
+        return value
+    name = f"constants/{index}.json"
+    archive.writestr(name, text)
+    return {BLOB_MARKER: name}
+
+
+def write_flow_archive(filepath, save_data, compresslevel=6):
+    """Write a saved flow (the data of a JSON flow file) as a flow archive
+
+    Constants can be given in their saved form or as NumPy arrays. The file is replaced
+    atomically, so a flow that is still reading blobs from it is not affected.
+    """
+    editor_state = save_data.get("editor_state", {})
+    temp_path = f"{filepath}.tmp"
+    try:
+        with zipfile.ZipFile(temp_path, "w", zipfile.ZIP_DEFLATED,
+                             compresslevel=compresslevel) as archive:
+            # The code of every node is a blob, the rest of the node stays in the index
+            nodes = []
+            for index, node_state in enumerate(editor_state.get("nodes", [])):
+                node_state = dict(node_state)
+                body = node_state.get("function_body")
+                if body:
+                    name = f"nodes/{index}.py"
+                    archive.writestr(name, body)
+                    node_state["function_body"] = {BLOB_MARKER: name}
+                nodes.append(node_state)
+
+            constants = {name: _write_constant(archive, index, value) for index, (name, value)
+                         in enumerate(save_data.get("global_constants", {}).items())}
+
+            archive.writestr(INDEX_NAME, json.dumps({
+                "format": ARCHIVE_FORMAT,
+                "version": ARCHIVE_VERSION,
+                "editor_state": {**editor_state, "nodes": nodes},
+                "global_constants": constants,
+                "settings": save_data.get("settings", {})
+            }, separators=(",", ":")))
+        os.replace(temp_path, filepath)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+class LazyConstants(MutableMapping):
+    """Global constants of a flow archive, reading blobs and loading arrays on first use"""
+
+    def __init__(self, archive, constants):
+        self._archive = archive
+        self._values = dict(constants)
+        self._pending = {name for name, value in constants.items()
+                         if blob_name(value) or saved_array_type(value)}
+
+    def __getitem__(self, name):
+        if name in self._pending:
+            self._values[name] = load_constant(self._archive.read_constant(self._values[name]))
+            self._pending.discard(name)
+        return self._values[name]
+
+    def __setitem__(self, name, value):
+        self._values[name] = value
+        self._pending.discard(name)
+
+    def __delitem__(self, name):
+        del self._values[name]
+        self._pending.discard(name)
+
+    def __iter__(self):
+        return iter(self._values)
+
+    def __len__(self):
+        return len(self._values)
+
+    def __repr__(self):
+        return f"<LazyConstants {sorted(self._values)}>"
+
+
+class FlowArchive:
+    """Reads a flow archive, leaving the node code and large constants in the file until used
+
+    The archive stays open while the flow uses it; reading blobs is safe from several threads.
+    """
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self._zip = zipfile.ZipFile(filepath)
+        self.index = json.loads(self._zip.read(INDEX_NAME))
+        if self.index.get("format") != ARCHIVE_FORMAT:
+            raise ValueError(f"{filepath} is not a flow archive")
+        if self.index.get("version", 0) > ARCHIVE_VERSION:
+            raise ValueError(f"{filepath} was written by a newer version of the editor "
+                             f"(format version {self.index['version']})")
+
+    def read_blob(self, name):
+        """Read the bytes of a blob"""
+        return self._zip.read(name)
+
+    def read_text(self, value):
+        """Get the text of a value that may be stored in a blob (e.g. the code of a node)"""
+        name = blob_name(value)
+        return self.read_blob(name).decode("utf-8") if name else value
+
+    def read_constant(self, value):
+        """Get the value of a constant that may be stored in a blob (.npy file markers are kept)"""
+        name = blob_name(value)
+        if name is None:
+            return value
+        if name.endswith(".npy"):
+            np = get_numpy()
+            if np is None:
+                raise RuntimeError("NumPy is required for the array constants of this flow")
+            return np.load(io.BytesIO(self.read_blob(name)), allow_pickle=False)
+        return json.loads(self.read_blob(name))
+
+    def constants(self):
+        """Get the global constants, read from their blobs when they are first used"""
+        return LazyConstants(self, self.index.get("global_constants", {}))
+
+    def save_data(self):
+        """Read the whole flow in the form of a JSON flow file (arrays of blobs are NumPy arrays)"""
+        editor_state = dict(self.index.get("editor_state", {}))
+        editor_state["nodes"] = [{**node_state, "function_body": self.read_text(node_state["function_body"])}
+                                 if "function_body" in node_state else node_state
+                                 for node_state in editor_state.get("nodes", [])]
+        constants = {name: self.read_constant(value)
+                     for name, value in self.index.get("global_constants", {}).items()}
+        return {"editor_state": editor_state, "global_constants": constants,
+                "settings": self.index.get("settings", {})}
+
+    def close(self):
+        self._zip.close()
+
+
+def load_save_data(filepath):
+    """Read a flow file (JSON or flow archive) in the form of a JSON flow file"""
+    if is_flow_archive(filepath):
+        archive = FlowArchive(filepath)
+        try:
+            return archive.save_data()
+        finally:
+            archive.close()
+    with open(filepath, 'r') as f:
+        return json.load(f)
+
+
+def write_save_data(filepath, save_data):
+    """Write a flow file, as a flow archive if the path ends with .flowz and as JSON otherwise"""
+    if filepath.endswith(ARCHIVE_EXTENSION):
+        write_flow_archive(filepath, save_data)
+        return
+
+    # JSON files keep arrays as lists of values
+    save_data = {**save_data, "global_constants": {
+        name: save_constant(value) for name, value in save_data.get("global_constants", {}).items()}}
+    with open(filepath, 'w') as f:
+        json.dump(save_data, f, indent=2)
+
+
+class _JsonReader:
+    """Reads the values of a JSON document one at a time from a text file, in chunks"""
+
+    def __init__(self, f, chunk_size=CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.pos = 0
+        self.consumed = 0  # Characters before the buffer
+        self.eof = False
+
+    @property
+    def position(self):
+        """Number of characters parsed so far"""
+        return self.consumed + self.pos
+
+    def fill(self, size):
+        """Read at least ``size`` more characters, dropping the parsed part of the buffer"""
+        self.consumed += self.pos
+        self.buffer = self.buffer[self.pos:]
+        self.pos = 0
+        chunk = self.f.read(max(size, self.chunk_size))
+        self.eof = not chunk
+        self.buffer += chunk
+
+    def peek(self):
+        """Get the next character that is not whitespace ('' at the end of the file)"""
+        while True:
+            self.pos = _WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer) or self.eof:
+                return self.buffer[self.pos:self.pos + 1]
+            self.fill(self.chunk_size)
+
+    def expect(self, characters):
+        """Skip the next character, which must be one of ``characters``"""
+        char = self.peek()
+        if not char or char not in characters:
+            raise ValueError(f"Invalid flow file: expected '{characters}' at character "
+                             f"{self.position}, found {char or 'the end of the file'!r}")
+        self.pos += 1
+        return char
+
+    def value(self):
+        """Parse the next complete value, reading more of the file until it is in the buffer"""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            else:
+                # A number at the end of the buffer may continue in the next chunk
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return value
+            # Read as much again as is buffered, so a large value is parsed a few times at most
+            self.fill(len(self.buffer))
+
+    def keys(self):
+        """Iterate over the keys of the next object, the caller parses the value of each"""
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(":")
+            yield key
+            if self.expect(",}") == "}":
+                return
+
+    def items(self):
+        """Iterate over the items of the next array"""
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            if self.expect(",]") == "]":
+                return
+
+
+class FlowFileReader:
+    """Reads a flow file (JSON or flow archive) one node at a time
+
+    :py:meth:`parts` yields ``("nodes", node_state)`` for every node, ``("edges", edge_state)``
+    for every edge and ``(key, value)`` for the other parts of the file (``global_constants``
+    and ``settings``). JSON files are parsed incrementally, so only the current node is held
+    in memory besides what was yielded, and :py:attr:`progress` tells how much was read.
+    """
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.size = max(os.path.getsize(filepath), 1)
+        self.progress = 0.0  # Fraction of the file read
+
+    def parts(self):
+        if is_flow_archive(self.filepath):
+            yield from self._archive_parts()
+        else:
+            yield from self._json_parts()
+        self.progress = 1.0
+
+    def _json_parts(self):
+        with open(self.filepath, 'r') as f:
+            reader = _JsonReader(f)
+            for key in reader.keys():
+                if key != "editor_state":
+                    yield key, reader.value()
+                    continue
+                for section in reader.keys():
+                    if section not in ("nodes", "edges"):
+                        reader.value()
+                        continue
+                    for item in reader.items():
+                        self.progress = min(reader.position / self.size, 1.0)
+                        yield section, item
+
+    def _archive_parts(self):
+        archive = FlowArchive(self.filepath)
+        try:
+            editor_state = archive.index.get("editor_state", {})
+            nodes = editor_state.get("nodes", [])
+            for index, node_state in enumerate(nodes):
+                if "function_body" in node_state:
+                    node_state = {**node_state,
+                                  "function_body": archive.read_text(node_state["function_body"])}
+                self.progress = (index + 1) / (len(nodes) + 1)
+                yield "nodes", node_state
+            for edge_state in editor_state.get("edges", []):
+                yield "edges", edge_state
+            yield "global_constants", {name: archive.read_constant(value) for name, value
+                                       in archive.index.get("global_constants", {}).items()}
+            yield "settings", archive.index.get("settings", {})
+        finally:
+            archive.close()
@@ -0,0 +1,143 @@
+import time
+
+from PyQt5 import sip
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+
+from QNodeEditor import Edge
+
+from flow_format import FlowFileReader
+
+# Time spent building the scene per turn of the event loop, so the editor keeps repainting
+# and handling input while a large flow loads
+TICK_SECONDS = 0.02
+
+# Share of the progress bar for reading the file and building the nodes (the rest is edges)
+NODES_PERCENT = 90
+
+
+class FlowLoader(QObject):
+    """Loads a flow file into a scene a few nodes at a time, between events of the event loop
+
+    The file is read incrementally (see flow_format.FlowFileReader). Nodes are created while
+    it is read, and the edges are connected once all nodes exist. The scene is cleared first,
+    also in steps, since removing a large flow takes as long as building it.
+    """
+
+    progress = pyqtSignal(int)
+    """pyqtSignal -> int: Percentage of the flow that is loaded"""
+    finished = pyqtSignal(dict)
+    """pyqtSignal -> dict: Other parts of the file (``global_constants`` and ``settings``)"""
+    errored = pyqtSignal(str)
+    """pyqtSignal -> str: Error message if loading failed"""
+    cancelled = pyqtSignal()
+    """pyqtSignal: Emitted when loading was cancelled and the scene is empty again"""
+    done = pyqtSignal()
+    """pyqtSignal: Emitted when the loader is done (in all cases)"""
+
+    def __init__(self, scene, node_class, filepath):
+        super().__init__()
+        self.scene = scene
+        self.node_class = node_class
+        self.reader = FlowFileReader(filepath)
+        self.parts = {}
+        self.sockets = {}  # Saved socket id -> socket of the new node
+        self.node_count = 0
+        self.edge_count = 0
+        self._percent = 0
+        self._cancelled = False
+        self._steps = None
+
+    def start(self):
+        """Start loading on the next turn of the event loop"""
+        self._steps = self.build()
+        QTimer.singleShot(0, self.step)
+
+    def cancel(self):
+        """Stop loading and remove the nodes built so far, also in steps"""
+        if not self._cancelled:
+            self._cancelled = True
+            self._steps.close()
+            self._steps = self.clear_scene()
+
+    def step(self):
+        """Build the scene until the time of this turn of the event loop is used up"""
+        try:
+            deadline = time.perf_counter() + TICK_SECONDS
+            for _ in self._steps:
+                if time.perf_counter() >= deadline:
+                    self.progress.emit(self._percent)
+                    QTimer.singleShot(0, self.step)
+                    return
+
+        except Exception as e:
+            self.errored.emit(str(e))
+            self.done.emit()
+            return
+
+        if self._cancelled:
+            self.cancelled.emit()
+        else:
+            self.progress.emit(100)
+            self.finished.emit(self.parts)
+        self.done.emit()
+
+    def clear_scene(self):
+        """Remove the nodes of the scene, yielding after every node"""
+        while self.scene.nodes:
+            delete_node(self.scene.nodes[-1])
+            yield
+
+    def build(self):
+        """Clear the scene and build the flow, yielding after every node and edge"""
+        yield from self.clear_scene()
+
+        # Edges are kept until all nodes exist, since they may come before their nodes
+        edges = []
+        for section, value in self.reader.parts():
+            if section == "nodes":
+                self.add_node(value)
+                self._percent = int(NODES_PERCENT * self.reader.progress)
+                yield
+            elif section == "edges":
+                edges.append(value)
+            else:
+                self.parts[section] = value
+
+        for index, edge_state in enumerate(edges):
+            self.add_edge(edge_state)
+            self._percent = NODES_PERCENT + (100 - NODES_PERCENT) * (index + 1) // len(edges)
+            yield
+
+    def add_node(self, node_state):
+        """Create a node from its saved state and remember its sockets for the edges"""
+        node = self.node_class()
+        self.scene.add_node(node)
+        node.set_state(node_state)
+        for entry, entry_state in zip(node.entries, node_state.get("entries", [])):
+            if entry.socket is not None and entry_state.get("socket"):
+                self.sockets[entry_state["socket"]["id"]] = entry.socket
+        self.node_count += 1
+
+    def add_edge(self, edge_state):
+        """Connect two sockets of the new nodes (edges to unknown sockets are left out)"""
+        start = self.sockets.get(edge_state.get("start"))
+        end = self.sockets.get(edge_state.get("end"))
+        if start is None or end is None:
+            return
+        Edge(start, end, self.scene)
+        self.edge_count += 1
+
+
+def delete_node(node):
+    """Remove a node from its scene and delete its widgets right away
+
+    Nodes and their entries reference each other, so only the garbage collector frees removed
+    nodes, and it deletes the widgets of all of them at once, freezing the editor for seconds
+    after a large flow was removed. Deleting the widgets here spreads that work out.
+    """
+    entries = list(node.entries)
+    node.remove()
+    for entry in entries:
+        for item in (entry.widget, entry.graphics):
+            if item is not None and not sip.isdeleted(item):
+                sip.delete(item)
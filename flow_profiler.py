@@ -0,0 +1,149 @@
+import json
+import os
+import threading
+import time
+import tracemalloc
+
+from result_cache import estimate_size
+
+
+def format_bytes(size):
+    """Format a number of bytes for display"""
+    if size is None:
+        return "-"
+    for unit in ("B", "KB", "MB"):
+        if abs(size) < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+class FlowProfiler:
+    """Records compile time, call time, value sizes and peak memory of every node in a run
+
+    Peak memory is measured with tracemalloc, whose peak is shared by all threads, so it is
+    only recorded for nodes that did not run at the same time as another node.
+    """
+
+    def __init__(self, trace_memory=True):
+        self.trace_memory = trace_memory
+        self.records = []
+        self._lock = threading.Lock()
+        self._started_tracing = False
+        self._run_start = None
+        self._running = 0  # Nodes running now
+        self._started = 0  # Nodes started so far
+
+    def start(self):
+        """Start recording a new run"""
+        self.records = []
+        self._run_start = time.perf_counter()
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+    def stop(self):
+        """Stop recording (and stop tracemalloc if this profiler started it)"""
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def run_node(self, node, values):
+        """Run a node, record its measurements and return its result"""
+        with self._lock:
+            self._running += 1
+            self._started += 1
+            started = self._started
+            alone = self._running == 1
+
+        tracing = self.trace_memory and tracemalloc.is_tracing() and alone
+        if tracing:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+
+        # The compile time is measured by the node, so the compiled function is looked up
+        # only once and its cache counters stay the same as without profiling
+        node.compile_time = 0.0
+        start = time.perf_counter()
+        try:
+            result = node.run(values)
+        finally:
+            end = time.perf_counter()
+            peak = tracemalloc.get_traced_memory()[1] - base if tracing else None
+            with self._lock:
+                self._running -= 1
+                if self._started != started:
+                    peak = None  # Another node started meanwhile and reset the peak
+
+        self.add_record(node, start, start + node.compile_time, end, values, result, peak)
+        return result
+
+    def add_record(self, node, start, compiled, end, values, result, peak_memory=None):
+        """Add the measurements of one node evaluation"""
+        if self._run_start is None:
+            self._run_start = start
+
+        record = {
+            "node_id": node.node_id,
+            "title": node.title,
+            "start": start - self._run_start,
+            "compile_time": compiled - start,
+            "call_time": end - compiled,
+            "total_time": end - start,
+            "input_bytes": sum(estimate_size(value) for value in values.values()),
+            "output_bytes": estimate_size(result),
+            "peak_memory": peak_memory,
+            "thread": threading.get_ident()
+        }
+        with self._lock:
+            self.records.append(record)
+
+    def sorted_records(self):
+        """Get the records sorted from slowest to fastest"""
+        return sorted(self.records, key=lambda record: record["total_time"], reverse=True)
+
+    def table(self):
+        """Format the records as a text table, slowest node first"""
+        lines = [f"{'Node':<28} {'Total':>10} {'Compile':>10} {'Call':>10} "
+                 f"{'In':>10} {'Out':>10} {'Peak mem':>10}"]
+        for record in self.sorted_records():
+            title = record["title"] if len(record["title"]) <= 28 else record["title"][:25] + "..."
+            lines.append(f"{title:<28} {record['total_time'] * 1000:>8.2f}ms "
+                         f"{record['compile_time'] * 1000:>8.2f}ms "
+                         f"{record['call_time'] * 1000:>8.2f}ms "
+                         f"{format_bytes(record['input_bytes']):>10} "
+                         f"{format_bytes(record['output_bytes']):>10} "
+                         f"{format_bytes(record['peak_memory']):>10}")
+        return "\n".join(lines)
+
+    def to_json(self):
+        """Get the records as a JSON-safe dict"""
+        return {"records": self.sorted_records()}
+
+    def to_chrome_trace(self):
+        """Get the records in the Chrome trace event format (chrome://tracing, Perfetto)"""
+        events = []
+        pid = os.getpid()
+        for record in self.records:
+            start = record["start"] * 1e6
+            args = {key: record[key] for key in ("node_id", "input_bytes", "output_bytes",
+                                                 "peak_memory")}
+            events.append({"name": record["title"], "cat": "node", "ph": "X", "ts": start,
+                           "dur": record["total_time"] * 1e6, "pid": pid,
+                           "tid": record["thread"], "args": args})
+            events.append({"name": "compile", "cat": "compile", "ph": "X", "ts": start,
+                           "dur": record["compile_time"] * 1e6, "pid": pid,
+                           "tid": record["thread"]})
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def export(self, filepath, trace_format="json"):
+        """Write the records to a file as plain JSON (``'json'``) or a Chrome trace (``'chrome'``)"""
+        if trace_format == "chrome":
+            data = self.to_chrome_trace()
+        elif trace_format == "json":
+            data = self.to_json()
+        else:
+            raise ValueError(f"Unknown profile format '{trace_format}'")
+
+        with open(filepath, 'w') as f:
+            json.dump(data, f, indent=2)
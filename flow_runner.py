@@ -0,0 +1,205 @@
+import argparse
+import json
+import sys
+
+from flow_batch import parse_value, read_rows, run_batch, write_batch
+from flow_compiler import compile_flow, load_compiled, saved_array_paths
+from flow_engine import Flow, BACKENDS
+from flow_format import load_save_data, write_save_data
+from flow_profiler import FlowProfiler
+from result_cache import shared_disk_cache, clear_result_caches
+
+
+def parse_constant(text):
+    """Parse a NAME=VALUE command-line constant (VALUE is a Python literal or a string)"""
+    name, sep, value = text.partition("=")
+    if not sep or not name:
+        raise argparse.ArgumentTypeError(f"Constant '{text}' must be in the form NAME=VALUE")
+    return name, parse_value(value)
+
+
+def find_outputs(flow, names):
+    """Get the ids of the nodes named (by title or id) as the outputs of the run"""
+    outputs = []
+    for name in names:
+        matches = [node_id for node_id, node in flow.nodes.items()
+                   if name in (node.title, str(node_id))]
+        if not matches:
+            raise ValueError(f"No node named '{name}'")
+        outputs.extend(matches)
+    return outputs
+
+
+def report_eliminated(flow, eliminated):
+    """Print the nodes that are left out of the run since they do not lead to an output"""
+    if eliminated:
+        titles = ", ".join(flow.nodes[node_id].title for node_id in eliminated)
+        print(f"Eliminated {len(eliminated)} node(s) that do not lead to an output: {titles}",
+              file=sys.stderr)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Run a saved Python function flow without the editor")
+    parser.add_argument("flow", help="Flow file written by the editor (JSON or .flowz archive)")
+    parser.add_argument("-c", "--constant", action="append", type=parse_constant, default=[],
+                        metavar="NAME=VALUE", help="Override a global constant")
+    parser.add_argument("-w", "--workers", type=int, default=None,
+                        help="Maximum number of nodes (or batch rows) running at the same time")
+    parser.add_argument("-b", "--backend", choices=BACKENDS, default=None,
+                        help="Run concurrent nodes on threads (I/O-bound), processes (CPU-bound) "
+                             "or isolated in sandbox processes with limits")
+    parser.add_argument("--cpu-limit", type=float, metavar="SECONDS",
+                        help="CPU time limit of every node without its own limit (sandbox backend)")
+    parser.add_argument("--memory-limit", type=float, metavar="MB",
+                        help="Memory limit of every node without its own limit (sandbox backend)")
+    parser.add_argument("-t", "--target", action="append", default=[], metavar="NODE",
+                        help="Report this node (title or id) and only run the nodes it depends on. "
+                             "Can be given several times (default: every node whose output is unused)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Do not read or write the persistent result cache")
+    parser.add_argument("--clear-cache", action="store_true",
+                        help="Clear the persistent result cache before running")
+    parser.add_argument("--profile", metavar="FILE",
+                        help="Profile every node, print a timing table and write it to FILE")
+    parser.add_argument("--profile-format", choices=("json", "chrome"), default="json",
+                        help="Format of the profile file (chrome: chrome://tracing / Perfetto)")
+    parser.add_argument("--batch", metavar="ROWS",
+                        help="Run the flow once per row of a CSV, JSON (list of objects) or JSON Lines "
+                             "file. Columns set constants, or node inputs as NODE.INPUT")
+    parser.add_argument("-o", "--output", metavar="FILE",
+                        help="File for the batch results, CSV if it ends with .csv, JSON Lines "
+                             "otherwise (default: stdout)")
+    parser.add_argument("--compile", metavar="FILE",
+                        help="Write the flow as a standalone Python module to FILE instead of running it")
+    parser.add_argument("--compiled", action="store_true",
+                        help="Run the flow as one compiled function (sequential, no result cache)")
+    parser.add_argument("--convert", metavar="FILE",
+                        help="Write the flow to FILE instead of running it, as a flow archive if FILE "
+                             "ends with .flowz and as JSON otherwise")
+    parser.add_argument("--json", action="store_true",
+                        help="Print the results of the output nodes as JSON")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    # Batch rows run sequentially in each process, without the backends or the profiler
+    if args.batch:
+        unsupported = [option for option, value in (("--backend", args.backend), ("--profile", args.profile),
+                                                    ("--cpu-limit", args.cpu_limit),
+                                                    ("--memory-limit", args.memory_limit))
+                       if value is not None]
+        if unsupported:
+            parser.error(f"{', '.join(unsupported)} can not be used with --batch")
+
+    if args.clear_cache and not clear_result_caches():
+        print("Warning: the result cache could not be cleared", file=sys.stderr)
+    if args.no_cache:
+        shared_disk_cache.path = None
+
+    if args.convert:
+        return run_convert_mode(args)
+    if args.batch:
+        return run_batch_mode(args)
+    if args.compile or args.compiled:
+        return run_compiled_mode(args)
+
+    profiler = FlowProfiler() if args.profile else None
+    try:
+        flow = Flow.load(args.flow)
+        flow.constants.update(dict(args.constant))
+        if args.target:
+            flow.outputs = find_outputs(flow, args.target)
+        flow.cpu_limit = args.cpu_limit
+        flow.memory_limit = args.memory_limit
+        if profiler is not None:
+            profiler.start()
+        try:
+            results = flow.evaluate(max_workers=args.workers, backend=args.backend,
+                                    profiler=profiler)
+        finally:
+            if profiler is not None:
+                profiler.stop()
+    except Exception as e:
+        print(f"Error executing flow: {str(e)}", file=sys.stderr)
+        return 1
+
+    report_eliminated(flow, flow.eliminated)
+    if profiler is not None:
+        print(profiler.table(), file=sys.stderr)
+        profiler.export(args.profile, args.profile_format)
+
+    print_outputs({f"{flow.nodes[node_id].title} [{node_id}]": results[node_id]
+                   for node_id in flow.output_ids()}, args.json)
+    return 0
+
+
+def print_outputs(outputs, as_json=False):
+    """Print the results of the output nodes"""
+    if as_json:
+        print(json.dumps(outputs, indent=2, default=repr))
+    else:
+        for name, value in outputs.items():
+            print(f"{name}: {value!r}")
+
+
+def run_compiled_mode(args):
+    """Compile the flow to a Python module and write it, or run it in place of the engine"""
+    try:
+        flow = Flow.load(args.flow)
+        overrides = dict(args.constant)
+        flow.constants.update(overrides)
+        if args.target:
+            flow.outputs = find_outputs(flow, args.target)
+        array_paths = {name: path for name, path in saved_array_paths(args.flow).items()
+                       if name not in overrides}
+        source = compile_flow(flow, array_paths, args.flow)
+        report_eliminated(flow, flow.dead_nodes())
+        if args.compile:
+            with open(args.compile, 'w') as f:
+                f.write(source)
+            print(f"Flow compiled to {args.compile}", file=sys.stderr)
+            return 0
+        outputs = load_compiled(source).run()
+    except Exception as e:
+        print(f"Error executing flow: {str(e)}", file=sys.stderr)
+        return 1
+
+    print_outputs(outputs, args.json)
+    return 0
+
+
+def run_convert_mode(args):
+    """Write the flow in the format of the extension of the target file"""
+    try:
+        save_data = load_save_data(args.flow)
+        save_data.setdefault("global_constants", {}).update(dict(args.constant))
+        write_save_data(args.convert, save_data)
+    except Exception as e:
+        print(f"Error converting flow: {str(e)}", file=sys.stderr)
+        return 1
+
+    print(f"Flow written to {args.convert}", file=sys.stderr)
+    return 0
+
+
+def run_batch_mode(args):
+    """Run the flow for every row of the batch file, spreading the rows over processes"""
+    try:
+        flow = Flow.load(args.flow)
+        if args.target:
+            flow.outputs = find_outputs(flow, args.target)
+        output_names = [f"{flow.nodes[node_id].title} [{node_id}]" for node_id in flow.output_ids()]
+        records = run_batch(args.flow, read_rows(args.batch), dict(args.constant),
+                            workers=args.workers or 1, outputs=flow.outputs)
+        count, failed = write_batch(records, args.output, output_names)
+    except Exception as e:
+        print(f"Error executing batch: {str(e)}", file=sys.stderr)
+        return 1
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
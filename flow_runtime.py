@@ -0,0 +1,186 @@
+import builtins
+import time
+import types
+
+from array_support import call_vectorized
+from code_cache import shared_cache
+from flow_streams import is_stream, StreamError
+from result_cache import shared_memo, shared_disk_cache, stable_hash
+
+
+def freeze_constants(constants):
+    """Wrap the global constants of a run in a read-only mapping shared by all nodes"""
+    if isinstance(constants, types.MappingProxyType):
+        return constants
+    return types.MappingProxyType(constants if constants is not None else {})
+
+
+def same_constants(constants, previous):
+    """Check if two sets of constants hold the same objects
+
+    Values are compared by identity, since the editor replaces the value of a constant when it
+    is edited, so large arrays are never compared or pickled.
+    """
+    return constants.keys() == previous.keys() and all(
+        value is previous[name] for name, value in constants.items())
+
+
+class NodeGlobals(dict):
+    """Globals of a single node evaluation, layered over the shared constants
+
+    Names assigned by the node (e.g. through a ``global`` statement) are stored in this dict
+    only. Names that are not found here are looked up in the shared constants, so the constants
+    are never copied and one node can not change what another node sees.
+    """
+
+    def __init__(self, shared):
+        super().__init__()
+        self.shared = shared
+        self["__builtins__"] = builtins
+
+    def __missing__(self, name):
+        # Raising KeyError lets the interpreter fall back to the builtins
+        return self.shared[name]
+
+
+class FunctionRuntime:
+    """Compiles and calls the function of a node, without depending on Qt
+
+    Used by both the editor nodes and the headless flow nodes. Classes using it provide the
+    ``inputs``, ``function_body``, ``function_name``, ``globals_env``, ``pure`` and
+    ``vectorized`` attributes and call :meth:`init_function_cache` before the first evaluation.
+    """
+
+    def init_function_cache(self):
+        """Create an empty compiled function cache"""
+        self._compiled_key = None
+        self._compiled_code = None
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.compile_time = 0.0  # Seconds spent compiling since the profiler last reset it
+        self.elementwise = False  # Whether the vectorized body failed on whole arrays
+
+        # Result of the last run, reused by the flow engine while the node is clean
+        self.dirty = True
+        self.has_cached_result = False
+        self.cached_result = None
+        self.last_inputs_key = None
+
+    def invalidate_function_cache(self):
+        """Drop the compiled function so it is rebuilt on the next evaluation"""
+        self._compiled_key = None
+        self._compiled_code = None
+        self.elementwise = False
+        self.mark_dirty()
+
+    def mark_dirty(self):
+        """Make the flow engine run this node (and the nodes after it) on the next run"""
+        self.dirty = True
+
+    def store_result(self, result, inputs_key):
+        """Remember the result of a run so it can be reused while the node stays clean"""
+        self.cached_result = result
+        self.has_cached_result = True
+        self.last_inputs_key = inputs_key
+        self.dirty = False
+
+    def cache_info(self):
+        """Get the hit/miss counters of the compiled function cache"""
+        return {"hits": self.cache_hits, "misses": self.cache_misses}
+
+    def get_compiled_function(self):
+        """Get the code object of the node function, compiling it only when the node changed"""
+        key = (self.function_body, tuple(self.inputs), self.function_name)
+        if self._compiled_key == key:
+            self.cache_hits += 1
+            return self._compiled_code
+
+        self.cache_misses += 1
+
+        # Identical bodies are compiled once per process and shared between nodes
+        start = time.perf_counter()
+        self._compiled_code = shared_cache.get_function_code(
+            self.function_name, self.inputs, self.function_body)
+        self.compile_time += time.perf_counter() - start
+
+        self._compiled_key = key
+        return self._compiled_code
+
+    def referenced_globals(self):
+        """Get the global names used by the function (None if it does not compile)"""
+        try:
+            code = self.get_compiled_function()
+        except Exception:
+            return None
+
+        names = set()
+        stack = [code]
+        while stack:
+            code = stack.pop()
+            names.update(code.co_names)
+            stack.extend(const for const in code.co_consts if isinstance(const, types.CodeType))
+        return names
+
+    def call_function(self, values):
+        """Call the node function with the input values and return its result"""
+        # Layer the node globals over the shared constants instead of copying them
+        exec_globals = NodeGlobals(self.globals_env)
+
+        # Bind the cached code to the globals and call it with the inputs
+        function = types.FunctionType(self.get_compiled_function(), exec_globals,
+                                      self.function_name)
+        function_args = [values.get(input_name) for input_name in self.inputs]
+
+        # Vectorized nodes run once over whole arrays if their body supports it
+        if self.vectorized:
+            result, self.elementwise = call_vectorized(function, function_args, self.elementwise)
+            return result
+
+        return function(*function_args)
+
+    def memo_constants(self):
+        """Get the constants used by the function, by name"""
+        names = self.referenced_globals() or set()
+        return {name: self.globals_env[name] for name in sorted(names) if name in self.globals_env}
+
+    def memo_key(self, values, constants):
+        """Get the memoization key of a call: code, mode, input values and the constants it uses
+
+        Every constant is hashed on its own, so a constant that can not be pickled is hashed by
+        its identity (the caller keeps it alive while the result is memoized). Vectorized calls
+        can return other types than plain calls of the same code, so the mode is part of the key.
+        """
+        code_hash = shared_cache.key(self.inputs, self.function_body)
+        mode = "vectorized" if self.vectorized else "plain"
+        return (f"{code_hash}:{mode}",
+                tuple(stable_hash(values.get(input_name)) for input_name in self.inputs),
+                tuple(constants),
+                tuple(stable_hash(value) for value in constants.values()))
+
+    def run(self, values):
+        """Execute the node function and return the result (errors name the node)
+
+        Results of pure nodes are memoized on the values of their inputs and constants, in
+        memory and in the persistent result cache. Streams can only be consumed once, so they
+        are never memoized.
+        """
+        try:
+            if not self.pure:
+                return self.call_function(values)
+
+            constants = self.memo_constants()
+            key = self.memo_key(values, constants)
+            found, result = shared_memo.get(key)
+            if not found:
+                found, result = shared_disk_cache.get(key)
+                if not found:
+                    result = self.call_function(values)
+                    if is_stream(result):
+                        return result
+                    shared_disk_cache.put(key, result)
+                shared_memo.put(key, result, keepalive=(values, constants))
+            return result
+        except StreamError:
+            raise  # Already names the node that produced the stream
+        except Exception as e:
+            raise RuntimeError(f"Error in node '{self.title}': {str(e)}") from e
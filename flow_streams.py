@@ -0,0 +1,55 @@
+import io
+import itertools
+import threading
+from collections.abc import Iterator
+
+
+class StreamError(RuntimeError):
+    """Raised when the node that produced a stream fails while the stream is consumed"""
+
+
+def is_stream(value):
+    """Check if a node result is a stream (a generator or other iterator, but not a file)"""
+    return isinstance(value, Iterator) and not isinstance(value, io.IOBase)
+
+
+def guard_stream(title, stream):
+    """Iterate over a stream, naming the node that produced it in errors
+
+    The body of a generator node runs while the nodes after it consume the stream, so without
+    this its errors would be reported as errors of the consumer.
+    """
+    try:
+        yield from stream
+    except StreamError:
+        raise  # Raised by a stream further up, which already names its node
+    except Exception as e:
+        raise StreamError(f"Error in node '{title}': {str(e)}") from e
+
+
+class SharedStream:
+    """One of several copies of a stream, safe to consume from different threads
+
+    The copies are made with :py:func:`itertools.tee`, which keeps the items that one copy has
+    read and the others have not. Memory stays constant as long as the consumers advance
+    together; a consumer that reads the whole stream before the others start buffers all of it.
+    """
+
+    def __init__(self, iterator, lock):
+        self._iterator = iterator
+        self._lock = lock
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        with self._lock:
+            return next(self._iterator)
+
+
+def split_stream(stream, count):
+    """Split a stream into ``count`` independent copies"""
+    if count == 1:
+        return [stream]
+    lock = threading.Lock()
+    return [SharedStream(copy, lock) for copy in itertools.tee(stream, count)]
@@ -0,0 +1,115 @@
+import contextlib
+import threading
+
+from PyQt5.QtCore import QObject, pyqtSignal
+
+from QNodeEditor.entry import Entry
+
+from flow_engine import Flow, FlowCancelled
+from output_stream import NodeOutputStream
+
+
+def scene_to_flow(scene, constants):
+    """Build a flow engine graph from the nodes and edges of a live scene"""
+    nodes = []
+    for node in scene.nodes:
+        if hasattr(node, "run"):
+            node.flush_edits()
+            node.capture_input_defaults()
+            nodes.append(node)
+
+    # Edges may be drawn in either direction, so look at which end is the output
+    connections = {}
+    for edge in scene.edges:
+        if edge.start is None or edge.end is None:
+            continue
+        start, end = edge.start.entry, edge.end.entry
+        if start.entry_type == Entry.TYPE_OUTPUT and end.entry_type == Entry.TYPE_INPUT:
+            source, target = start, end
+        elif end.entry_type == Entry.TYPE_OUTPUT and start.entry_type == Entry.TYPE_INPUT:
+            source, target = end, start
+        else:
+            continue
+        inputs = connections.setdefault(target.node.node_id, {})
+        inputs.setdefault(target.name, []).append(source.node.node_id)
+
+    return Flow(nodes, connections, constants)
+
+
+class FlowWorker(QObject):
+    """Worker that evaluates a flow on a QThread and reports back through signals"""
+
+    progress = pyqtSignal(int, int)
+    """pyqtSignal -> (int, int): Number of evaluated nodes and total number of nodes"""
+    node_finished = pyqtSignal(str, object)
+    """pyqtSignal -> (str, object): Title and result of a node that finished"""
+    output = pyqtSignal(str, str)
+    """pyqtSignal -> (str, str): Title of a node (empty outside of nodes) and a chunk of its stdout"""
+    skipped = pyqtSignal(list)
+    """pyqtSignal -> list: Titles of the unchanged nodes whose cached result was reused"""
+    finished = pyqtSignal(dict)
+    """pyqtSignal -> dict: Results of the outputs of the flow (see Flow.output_ids)"""
+    errored = pyqtSignal(str)
+    """pyqtSignal -> str: Error message if the evaluation failed"""
+    profiled = pyqtSignal(object)
+    """pyqtSignal -> FlowProfiler: Profiler with the measurements of the run (if profiling)"""
+    cancelled = pyqtSignal()
+    """pyqtSignal: Emitted when the evaluation was cancelled"""
+    done = pyqtSignal()
+    """pyqtSignal: Emitted when the worker is done (in all cases)"""
+
+    def __init__(self, flow, profiler=None, log_path=None):
+        super().__init__()
+        self.flow = flow
+        self.profiler = profiler
+        self._cancel_event = threading.Event()
+        
+        # Stdout of the nodes is forwarded while they run (and optionally kept in a log file)
+        self._stdout = NodeOutputStream(self._on_output, log_path=log_path)
+
+    def cancel(self):
+        """Request cancellation (takes effect before the next node starts)"""
+        self._cancel_event.set()
+
+    def run(self):
+        """Evaluate the flow, emitting progress, node results and output along the way"""
+        if self.profiler is not None:
+            self.profiler.start()
+        try:
+            self._stdout.start()
+            try:
+                with contextlib.redirect_stdout(self._stdout):
+                    results = self.flow.evaluate(self._cancel_event, self._on_node_finished,
+                                                 profiler=self.profiler)
+            finally:
+                self._stdout.close()
+
+            if self.flow.skipped:
+                self.skipped.emit([self.flow.nodes[node_id].title for node_id in self.flow.skipped])
+
+            # Report the results of the outputs of the flow
+            outputs = {f"{self.flow.nodes[node_id].title} [{node_id}]": results[node_id]
+                       for node_id in self.flow.output_ids()}
+            self.finished.emit(outputs)
+
+        except FlowCancelled:
+            self.cancelled.emit()
+
+        except Exception as e:
+            self.errored.emit(str(e))
+
+        finally:
+            if self.profiler is not None:
+                self.profiler.stop()
+                self.profiled.emit(self.profiler)
+            self.done.emit()
+
+    def _on_node_finished(self, node_id, result, index, total):
+        node = self.flow.nodes[node_id]
+        self._stdout.flush(node)
+        if node_id not in self.flow.skipped:
+            self.node_finished.emit(node.title, result)
+        self.progress.emit(index, total)
+
+    def _on_output(self, node, text):
+        self.output.emit(node.title if node is not None else "", text)
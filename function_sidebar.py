@@ -54,7 +54,7 @@ class FunctionSidebar(QWidget):
         
     def populate_default_functions(self):
         """Add default function categories and functions"""
-        # File Operations - Only include the three default functions
+        # File Operations
         file_category = self.add_category("File Operations")
         
         self.add_function(file_category, "Read File", 
@@ -65,6 +65,55 @@ class FunctionSidebar(QWidget):
                          "with open(filename, 'w') as f:\n    f.write(content)\nreturn True",
                          ["filename", "content"], "success")
         
+        # Streaming versions, for files that do not fit in memory
+        self.add_function(file_category, "Read File Lines",
+                         "with open(filename, 'r') as f:\n    for line in f:\n        yield line",
+                         ["filename"], "lines")
+        
+        self.add_function(file_category, "Write Lines",
+                         "count = 0\nwith open(filename, 'w') as f:\n    for line in lines:\n        f.write(line)\n        count += 1\nreturn count",
+                         ["filename", "lines"], "count", stream_inputs=["lines"])
+        
+        # Large files, without copying their contents through str objects
+        large_file_category = self.add_category("Large Files")
+        
+        self.add_function(large_file_category, "Map File",
+                         "import mmap\n"
+                         "import os\n"
+                         "with open(filename, 'rb') as f:\n"
+                         "    if os.fstat(f.fileno()).st_size == 0:\n"
+                         "        return memoryview(b'')\n"
+                         "    # The mapping stays open while the memoryview is used\n"
+                         "    mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)\n"
+                         "return memoryview(mapped)",
+                         ["filename"], "buffer")
+        
+        self.add_function(large_file_category, "Read Line Chunks",
+                         "size = int(chunk_size or 0) or 1024 * 1024\n"
+                         "with open(filename, 'r') as f:\n"
+                         "    while True:\n"
+                         "        # About chunk_size bytes of complete lines\n"
+                         "        lines = f.readlines(size)\n"
+                         "        if not lines:\n"
+                         "            break\n"
+                         "        yield lines",
+                         ["filename", "chunk_size"], "chunks")
+        
+        self.add_function(large_file_category, "Buffered Write",
+                         "size = int(buffer_size or 0) or 1024 * 1024\n"
+                         "if isinstance(data, (str, bytes, bytearray, memoryview)):\n"
+                         "    data = [data]\n"
+                         "written = 0\n"
+                         "with open(filename, 'wb', buffering=size) as f:\n"
+                         "    for chunk in data:\n"
+                         "        if isinstance(chunk, list):\n"
+                         "            chunk = ''.join(chunk) if chunk and isinstance(chunk[0], str) else b''.join(chunk)\n"
+                         "        if isinstance(chunk, str):\n"
+                         "            chunk = chunk.encode()\n"
+                         "        written += f.write(chunk)\n"
+                         "return written",
+                         ["filename", "data", "buffer_size"], "bytes_written", stream_inputs=["data"])
+        
         # System Operations
         system_category = self.add_category("System Operations")
         
@@ -88,7 +137,7 @@ class FunctionSidebar(QWidget):
         category.setFont(0, font)
         return category
         
-    def add_function(self, parent, name, code, inputs, output):
+    def add_function(self, parent, name, code, inputs, output, stream_inputs=None):
         """Add a function to a category"""
         function_item = QTreeWidgetItem(parent)
         function_item.setText(0, name)
@@ -96,7 +145,8 @@ class FunctionSidebar(QWidget):
             "name": name,
             "code": code,
             "inputs": inputs,
-            "output": output
+            "output": output,
+            "stream_inputs": stream_inputs or []
         })
         return function_item
         
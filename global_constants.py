@@ -1,9 +1,13 @@
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QPushButton, 
                            QListWidget, QListWidgetItem, QLineEdit, QLabel, 
-                           QMessageBox, QDialog, QDialogButtonBox, QComboBox)
+                           QMessageBox, QDialog, QDialogButtonBox, QComboBox,
+                           QFileDialog)
 from PyQt5.QtCore import Qt, pyqtSignal
 import ast
 
+from array_support import (is_array, make_array, load_array, saved_array_type,
+                           save_constant, load_constant, NPY_MARKER)
+
 class ConstantEditDialog(QDialog):
     """Dialog for editing a constant's value and type"""
     
@@ -27,7 +31,7 @@ class ConstantEditDialog(QDialog):
         type_layout = QHBoxLayout()
         type_label = QLabel("Type:")
         self.type_combo = QComboBox()
-        self.type_combo.addItems(["str", "int", "float", "bool", "list", "dict"])
+        self.type_combo.addItems(["str", "int", "float", "bool", "list", "dict", "array", "npy"])
         self.type_combo.setCurrentText(value_type)
         self.type_combo.currentTextChanged.connect(self.on_type_changed)
         type_layout.addWidget(type_label)
@@ -40,6 +44,12 @@ class ConstantEditDialog(QDialog):
         self.value_edit = QLineEdit(str(value))
         value_layout.addWidget(value_label)
         value_layout.addWidget(self.value_edit)
+        
+        # File picker for .npy constants
+        self.browse_button = QPushButton("Browse...")
+        self.browse_button.clicked.connect(self.browse_array_file)
+        self.browse_button.setVisible(value_type == "npy")
+        value_layout.addWidget(self.browse_button)
         layout.addLayout(value_layout)
         
         # Button box
@@ -62,6 +72,17 @@ class ConstantEditDialog(QDialog):
             self.value_edit.setPlaceholderText("Enter a list (e.g. [1, 2, 3])")
         elif type_text == "dict":
             self.value_edit.setPlaceholderText("Enter a dict (e.g. {'a': 1, 'b': 2})")
+        elif type_text == "array":
+            self.value_edit.setPlaceholderText("Enter a NumPy array as a list (e.g. [[1, 2], [3, 4]])")
+        elif type_text == "npy":
+            self.value_edit.setPlaceholderText("Path of a .npy file (loaded memory-mapped)")
+        self.browse_button.setVisible(type_text == "npy")
+    
+    def browse_array_file(self):
+        """Choose the .npy file of an array constant"""
+        filepath, _ = QFileDialog.getOpenFileName(self, "Load Array", "", "NumPy Arrays (*.npy)")
+        if filepath:
+            self.value_edit.setText(filepath)
     
     def get_name(self):
         return self.name_edit.text()
@@ -82,6 +103,10 @@ class ConstantEditDialog(QDialog):
                 return value_str.lower() == "true"
             elif value_type == "list" or value_type == "dict":
                 return ast.literal_eval(value_str)
+            elif value_type == "array":
+                return make_array(ast.literal_eval(value_str))
+            elif value_type == "npy":
+                return load_array(value_str)
             else:
                 return value_str
         except Exception as e:
@@ -90,6 +115,10 @@ class ConstantEditDialog(QDialog):
     
     def get_type(self):
         return self.type_combo.currentText()
+    
+    def get_array_path(self):
+        """Get the file of a .npy constant (None for other types)"""
+        return self.value_edit.text() if self.type_combo.currentText() == "npy" else None
 
 
 class GlobalConstantsWidget(QWidget):
@@ -103,6 +132,7 @@ class GlobalConstantsWidget(QWidget):
         # Constants dictionary
         self.constants = {}
         self.constants_types = {}
+        self.array_paths = {}  # Files of the .npy constants
         
         # Set up the UI
         self.setup_ui()
@@ -162,6 +192,7 @@ class GlobalConstantsWidget(QWidget):
             
             self.constants[name] = value
             self.constants_types[name] = value_type
+            self.set_array_path(name, dialog.get_array_path())
             
             self.update_constants_list()
             self.constants_changed.emit(self.constants)
@@ -172,6 +203,12 @@ class GlobalConstantsWidget(QWidget):
         current_value = self.constants.get(name, "")
         current_type = self.constants_types.get(name, "str")
         
+        # Arrays are edited as their file or as a list
+        if name in self.array_paths:
+            current_value = self.array_paths[name]
+        elif is_array(current_value):
+            current_value = repr(current_value.tolist())
+        
         dialog = ConstantEditDialog(name, current_value, current_type, parent=self)
         if dialog.exec_():
             new_name = dialog.get_name()
@@ -189,10 +226,12 @@ class GlobalConstantsWidget(QWidget):
                     
                 del self.constants[name]
                 del self.constants_types[name]
+                self.array_paths.pop(name, None)
             
             # Update with new values
             self.constants[new_name] = value
             self.constants_types[new_name] = value_type
+            self.set_array_path(new_name, dialog.get_array_path())
             
             self.update_constants_list()
             self.constants_changed.emit(self.constants)
@@ -222,6 +261,7 @@ class GlobalConstantsWidget(QWidget):
             if name in self.constants:
                 del self.constants[name]
                 del self.constants_types[name]
+                self.array_paths.pop(name, None)
                 
             self.update_constants_list()
             self.constants_changed.emit(self.constants)
@@ -232,7 +272,10 @@ class GlobalConstantsWidget(QWidget):
         
         for name, value in self.constants.items():
             type_name = self.constants_types.get(name, "unknown")
-            display_value = str(value)
+            if is_array(value):
+                display_value = f"{value.dtype}{list(value.shape)}"
+            else:
+                display_value = str(value)
             
             # Truncate long values
             if len(display_value) > 30:
@@ -246,9 +289,30 @@ class GlobalConstantsWidget(QWidget):
         """Get the current constants dictionary"""
         return self.constants
     
+    def set_array_path(self, name, path):
+        """Remember the file of a .npy constant (None for other constants)"""
+        if path:
+            self.array_paths[name] = path
+        else:
+            self.array_paths.pop(name, None)
+    
+    def get_saved_constants(self, keep_arrays=False):
+        """Get the constants in a JSON-safe form, with arrays saved as their file or values
+
+        With ``keep_arrays``, arrays that were not loaded from a file stay NumPy arrays (flow
+        archives store them in binary form).
+        """
+        return {name: save_constant(value, self.array_paths.get(name))
+                if not keep_arrays or name in self.array_paths else value
+                for name, value in self.constants.items()}
+    
     def set_constants(self, constants_dict, types_dict=None):
-        """Set the constants from a dictionary"""
-        self.constants = constants_dict.copy()
+        """Set the constants from a dictionary (saved array constants are loaded)"""
+        self.array_paths = {name: value[NPY_MARKER] for name, value in constants_dict.items()
+                            if saved_array_type(value) == "npy"}
+        array_types = {name: saved_array_type(value) for name, value in constants_dict.items()
+                       if saved_array_type(value)}
+        self.constants = {name: load_constant(value) for name, value in constants_dict.items()}
         
         if types_dict:
             self.constants_types = types_dict.copy()
@@ -269,6 +333,8 @@ class GlobalConstantsWidget(QWidget):
                     self.constants_types[name] = "list"
                 elif value_type == "dict":
                     self.constants_types[name] = "dict"
+                elif name in array_types or is_array(value):
+                    self.constants_types[name] = array_types.get(name, "array")
                 else:
                     self.constants_types[name] = "str"
                     
@@ -0,0 +1,159 @@
+import os
+import time
+
+from PyQt5 import sip
+from PyQt5.QtCore import QEvent, QObject, QTimer
+from PyQt5.QtGui import QPalette
+from PyQt5.QtWidgets import QHBoxLayout, QLabel, QWidget
+
+from QNodeEditor.graphics.node import NodeGraphics
+
+# Nodes get their real widgets only at this zoom level or closer; further out they are too
+# small to use and are drawn with placeholders
+DETAIL_ZOOM = float(os.environ.get("NODE_EDITOR_DETAIL_ZOOM", 0.5))
+
+# Pixels around the viewport in which nodes are already shown in detail, so scrolling a
+# little does not create and delete widgets all the time
+VIEW_MARGIN = 200
+
+# Milliseconds to wait for scrolling or loading to settle before the widgets are updated
+UPDATE_DELAY_MS = 50
+
+# Time spent creating widgets per turn of the event loop, so scrolling to a screen full of
+# nodes does not freeze the editor (the nodes nearest the center get their widgets first)
+TICK_SECONDS = 0.02
+
+
+class LazyEntry:
+    """Mixin for entries that only create their widget while their node is shown in detail
+
+    Until ``materialize`` is called (and again after ``release``) the entry shows a cheap
+    placeholder of the same height. Subclasses implement ``create_widget`` and
+    ``create_placeholder``, and keep the values of the widget in attributes so the entry
+    works the same without it.
+    """
+
+    def init_lazy(self):
+        """Show the placeholder (called at the end of the entry's __init__)"""
+        self.materialized = False
+        self.hidden = False  # Shown with a height of 0, in collapsed nodes
+        self.widget = self.placeholder()
+
+    def placeholder(self):
+        if self.hidden:
+            widget = QWidget()
+            widget.setFixedHeight(0)
+            return widget
+        return self.create_placeholder()
+
+    def materialize(self):
+        """Replace the placeholder with the real widget"""
+        if self.materialized:
+            return
+        self.materialized = True
+        self.replace_widget(self.create_widget())
+
+    def release(self):
+        """Replace the real widget with the placeholder, deleting the widget"""
+        if not self.materialized:
+            return
+        self.before_release()
+        self.materialized = False
+        self.replace_widget(self.placeholder())
+
+    def set_hidden(self, hidden):
+        """Hide the entry (only while it shows its placeholder)"""
+        if hidden != self.hidden:
+            self.hidden = hidden
+            if not self.materialized:
+                self.replace_widget(self.placeholder())
+
+    def before_release(self):
+        """Store what the widget holds before it is deleted"""
+
+    def replace_widget(self, widget):
+        old_widget = self.widget
+        self.widget = widget
+        if not sip.isdeleted(old_widget):
+            sip.delete(old_widget)
+
+
+def placeholder_label(text, theme):
+    """Get a label that looks like the entry labels of a node, without a style sheet"""
+    label = QLabel(text)
+    palette = label.palette()
+    palette.setColor(QPalette.WindowText, theme.widget_color_text)
+    label.setPalette(palette)
+    label.setFont(theme.font())
+
+    # In a layout, like the labels of QNodeEditor, so the padding of the entry is not cut off
+    container = QWidget()
+    container.setFixedHeight(theme.widget_height)
+    layout = QHBoxLayout(container)
+    layout.setContentsMargins(0, 0, 0, 0)
+    layout.addWidget(label)
+    layout.addStretch()
+    return container
+
+
+class WidgetCuller(QObject):
+    """Shows the nodes in and around the viewport in detail and the other nodes with placeholders
+
+    Creating the widgets of a node takes milliseconds (mostly for applying style sheets) and
+    they take memory, so a large flow only has widgets for the few nodes in view. The widgets
+    are created when a node scrolls into view and deleted when it scrolls away. Below
+    ``DETAIL_ZOOM`` no node is shown in detail.
+    """
+
+    def __init__(self, editor):
+        super().__init__(editor)
+        self.view = editor.view
+        self.scene = editor.scene
+        self.detailed = set()  # Nodes shown in detail
+
+        # The view has no signal for scrolling and zooming, but both move its (hidden) scroll bars
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.update_nodes)
+        for scroll_bar in (self.view.horizontalScrollBar(), self.view.verticalScrollBar()):
+            scroll_bar.valueChanged.connect(self.schedule)
+            scroll_bar.rangeChanged.connect(self.schedule)
+        self.view.viewport().installEventFilter(self)
+
+    def schedule(self, *args):
+        """Update the nodes once scrolling, zooming or loading pauses"""
+        if not self.timer.isActive():
+            self.timer.start(UPDATE_DELAY_MS)
+
+    def eventFilter(self, watched, event):
+        if event.type() == QEvent.Resize:
+            self.schedule()
+        return False
+
+    def visible_nodes(self):
+        """Get the nodes in and around the viewport, or none if zoomed out too far"""
+        if self.view.transform().m11() < DETAIL_ZOOM:
+            return set()
+        rect = self.view.mapToScene(self.view.viewport().rect()).boundingRect()
+        margin = VIEW_MARGIN / self.view.transform().m11()
+        rect.adjust(-margin, -margin, margin, margin)
+        return {item.node for item in self.scene.graphics.items(rect)
+                if isinstance(item, NodeGraphics) and hasattr(item.node, "set_detailed")}
+
+    def update_nodes(self):
+        """Delete the widgets of the nodes that left the view and create those of the new ones"""
+        visible = self.visible_nodes()
+        for node in self.detailed - visible:
+            if node.graphics is not None:
+                node.set_detailed(False)
+        self.detailed &= visible
+
+        center = self.view.mapToScene(self.view.viewport().rect().center())
+        deadline = time.perf_counter() + TICK_SECONDS
+        for node in sorted(visible - self.detailed,
+                           key=lambda node: (node.graphics.sceneBoundingRect().center() - center).manhattanLength()):
+            if time.perf_counter() >= deadline:
+                self.timer.start(0)
+                return
+            node.set_detailed(True)
+            self.detailed.add(node)
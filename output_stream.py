@@ -0,0 +1,120 @@
+import io
+import threading
+
+from flow_engine import running_node
+
+
+class NodeOutputStream(io.TextIOBase):
+    """Text stream that forwards the output of each node in chunks while the flow runs
+
+    Output is buffered per node (see :py:func:`flow_engine.running_node`) and passed to
+    ``callback(node, text)`` from a background thread every ``interval`` seconds, one chunk of
+    complete lines per node. A buffer that grows beyond ``max_chunk`` characters is passed on
+    right away, so memory stays bounded. Output written outside of a node is passed with
+    ``node=None``. If ``log_path`` is given, all output is also appended to that file, tagged
+    with the node title, so it is kept after the terminal drops it from its scrollback.
+    """
+
+    def __init__(self, callback, interval=0.05, max_chunk=64 * 1024, log_path=None):
+        self.callback = callback
+        self.interval = interval
+        self.max_chunk = max_chunk
+        self.log_path = log_path
+
+        self._buffers = {}  # node id -> [node, list of text parts, size]
+        self._lock = threading.Lock()
+        self._log = None
+        self._log_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Open the log file and start forwarding output"""
+        if self.log_path:
+            self._log = open(self.log_path, "a", encoding="utf-8")
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._forward, name="node-output", daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        """Forward the remaining output and close the log file"""
+        if self._thread is not None:
+            self._stopped.set()
+            self._thread.join()
+            self._thread = None
+        self.flush()
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+        super().close()
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        if not text:
+            return 0
+        node = running_node()
+        key = node.node_id if node is not None else None
+
+        with self._lock:
+            buffer = self._buffers.get(key)
+            if buffer is None:
+                buffer = self._buffers[key] = [node, [], 0]
+            buffer[1].append(text)
+            buffer[2] += len(text)
+            if buffer[2] < self.max_chunk:
+                return len(text)
+            chunk = self._take(buffer, complete_lines=False)
+
+        self._emit(node, chunk)
+        return len(text)
+
+    def flush(self, node=None):
+        """Forward all buffered output (of one node if given), including unfinished lines"""
+        with self._lock:
+            if node is not None:
+                buffers = [self._buffers[node.node_id]] if node.node_id in self._buffers else []
+            else:
+                buffers = list(self._buffers.values())
+            chunks = [(buffer[0], self._take(buffer, complete_lines=False)) for buffer in buffers]
+
+        for buffer_node, chunk in chunks:
+            if chunk:
+                self._emit(buffer_node, chunk)
+
+    def _forward(self):
+        """Forward the complete lines of every node once per interval"""
+        while not self._stopped.wait(self.interval):
+            with self._lock:
+                chunks = [(buffer[0], self._take(buffer, complete_lines=True))
+                          for buffer in self._buffers.values()]
+            for node, chunk in chunks:
+                if chunk:
+                    self._emit(node, chunk)
+
+    @staticmethod
+    def _take(buffer, complete_lines):
+        """Remove the buffered text (up to the last newline) from a buffer and return it"""
+        if not buffer[1]:
+            return ""
+        text = "".join(buffer[1])
+        if complete_lines:
+            end = text.rfind("\n") + 1
+            text, rest = text[:end], text[end:]
+            buffer[1] = [rest] if rest else []
+            buffer[2] = len(rest)
+        else:
+            buffer[1] = []
+            buffer[2] = 0
+        return text
+
+    def _emit(self, node, text):
+        if self._log is not None:
+            prefix = f"[{node.title}] " if node is not None else ""
+            with self._log_lock:
+                lines = text.splitlines()
+                self._log.write("".join(f"{prefix}{line}\n" for line in lines))
+                self._log.flush()
+        self.callback(node, text)
@@ -1,16 +1,53 @@
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QPushButton,
-                            QLabel, QTextEdit, QMenu, QAction, QLineEdit)
-from PyQt5.QtCore import Qt, pyqtSignal
-from PyQt5.QtGui import QFont
+                            QLabel, QTextEdit, QMenu, QAction, QLineEdit,
+                            QGraphicsSimpleTextItem, QInputDialog)
+from PyQt5.QtCore import Qt, QEvent, QObject, QTimer, pyqtSignal
+from PyQt5.QtGui import QFont, QColor
 
 from QNodeEditor import Node
 from QNodeEditor.entry import Entry
 from QNodeEditor.entries.text_box import TextBoxEntry
+from QNodeEditor.entries.value_box import ValueBoxEntry
+from QNodeEditor.widgets.value_box import ValueBox
+from QNodeEditor.themes.dark import DarkTheme
 import inspect
 import ast
+import os
 import textwrap
 
-class PythonFunctionNode(Node):
+from flow_runtime import FunctionRuntime
+from lazy_widgets import LazyEntry, placeholder_label
+
+# Milliseconds without typing before the code of a node is passed on, so the node (and the
+# autosave journal) sees one update per pause instead of one per keystroke
+EDIT_DELAY_MS = int(os.environ.get("NODE_EDITOR_EDIT_DELAY", 300))
+
+# Heights of the code editor and of the button row, shared by their placeholders so a node
+# keeps its size when its widgets are created or deleted
+CODE_EDITOR_HEIGHT = 120
+BUTTON_ROW_HEIGHT = 26
+
+
+class NodeEvents(QObject):
+    """Edits of the function nodes, reported for the autosave journal"""
+    
+    added = pyqtSignal(object)
+    """pyqtSignal -> PythonFunctionNode: Node added to a scene"""
+    removed = pyqtSignal(object)
+    """pyqtSignal -> PythonFunctionNode: Node removed from its scene"""
+    changed = pyqtSignal(object)
+    """pyqtSignal -> PythonFunctionNode: Node whose inputs, output, options or input values changed"""
+    body_changed = pyqtSignal(object, str)
+    """pyqtSignal -> (PythonFunctionNode, str): Node and its new function body"""
+    edges_changed = pyqtSignal(object)
+    """pyqtSignal -> PythonFunctionNode: Node with an edge that was connected or disconnected"""
+
+
+# Shared by all nodes, so edits are seen however the node was created (sidebar, copy or load)
+node_events = NodeEvents()
+
+
+class PythonFunctionNode(Node, FunctionRuntime):
     # Use a counter to ensure each node has a unique code
     _node_counter = 0
     
@@ -25,15 +62,42 @@ class PythonFunctionNode(Node):
     def code(self):
         return self._code
     
+    @property
+    def scene(self):
+        return self._scene
+    
+    @scene.setter
+    def scene(self, new_scene):
+        Node.scene.fset(self, new_scene)
+        if new_scene is not None:
+            node_events.added.emit(self)
+    
+    @property
+    def node_id(self):
+        """Unique id of this node instance (used by the flow engine)"""
+        return self._code
+    
     def __init__(self):
         # Generate unique code for this node instance
         self._code = PythonFunctionNode.get_next_code()
-        self.globals_env = {}  # Will be set from outside
+        self.globals_env = {}  # Will be set from outside (shared, read-only)
         self.inputs = []  # Track input names
         self.input_types = {}  # Track input types
         self.output_name = "result"  # Default output name
         self.function_body = ""  # The Python code for the function body
         self.function_name = f"function_{self._code}"  # Default function name
+        self.defaults = {}  # Values of unconnected inputs, captured before a run
+        self.pure = False  # Memoize results on the input values
+        self.stream_inputs = []  # Inputs that receive streams (generators) as iterators
+        self.vectorized = False  # Run once over whole NumPy arrays
+        self.cpu_limit = None  # CPU seconds allowed on the sandbox backend
+        self.memory_limit = None  # Extra MB of memory allowed on the sandbox backend
+        self.timing_badge = None  # Profiler time shown above the node
+        self.detailed = False  # Entries show their real widgets (see lazy_widgets)
+        self.collapsed = False  # Only the title and the sockets are shown
+        
+        # Compiled function cache, keyed by (function_body, inputs, function_name)
+        self.init_function_cache()
         
         # Initialize first, then create components
         super().__init__()
@@ -47,6 +111,7 @@ class PythonFunctionNode(Node):
         
         # Add output for the result
         self.add_label_output(self.output_name)
+        self.watch_entry(self.get_entry(self.output_name))
         
         # Add one default input
         self.add_input("input1")
@@ -56,9 +121,53 @@ class PythonFunctionNode(Node):
 
     def add_input(self, name, input_type="any"):
         """Add a new input to the node"""
-        self.add_value_input(name)
+        self.add_input_entry(name)
         self.inputs.append(name)
         self.input_types[name] = input_type
+        self.invalidate_function_cache()
+    
+    def add_input_entry(self, name):
+        """Add the value box entry of an input"""
+        entry = ValueInputEntry(name, theme=self.graphics.theme)
+        self.add_entry(entry)
+        self.watch_entry(entry)
+        self.update_widgets(entry)
+    
+    def watch_entry(self, entry):
+        """Report the edges and the value of an entry with a socket to the autosave journal"""
+        entry.edge_connected.connect(lambda: node_events.edges_changed.emit(self))
+        entry.edge_disconnected.connect(lambda: node_events.edges_changed.emit(self))
+        if hasattr(entry, "value_edited"):
+            entry.value_edited.connect(lambda value: node_events.changed.emit(self))
+    
+    def set_detailed(self, detailed):
+        """Show the real widgets of the entries, or placeholders (when out of view)"""
+        if detailed != self.detailed:
+            self.detailed = detailed
+            self.update_widgets()
+    
+    def set_collapsed(self, collapsed):
+        """Show only the title and the sockets of the node, or the whole node"""
+        if collapsed != self.collapsed:
+            self.collapsed = collapsed
+            self.update_widgets()
+            node_events.changed.emit(self)
+    
+    def update_widgets(self, *entries):
+        """Create or delete the widgets of the entries (all by default) to match the node mode"""
+        for entry in entries or self.entries:
+            if not isinstance(entry, LazyEntry):
+                continue
+            entry.set_hidden(self.collapsed and entry.socket is None)
+            if self.detailed and not self.collapsed:
+                entry.materialize()
+            else:
+                entry.release()
+    
+    def remove(self):
+        """Remove the node from its scene"""
+        super().remove()
+        node_events.removed.emit(self)
 
     def remove_input(self, name):
         """Remove an input from the node"""
@@ -67,6 +176,9 @@ class PythonFunctionNode(Node):
             self.inputs.remove(name)
             if name in self.input_types:
                 del self.input_types[name]
+            if name in self.stream_inputs:
+                self.stream_inputs.remove(name)
+            self.invalidate_function_cache()
     
     def add_code_editor(self):
         """Add a code editor to the node"""
@@ -74,9 +186,11 @@ class PythonFunctionNode(Node):
         code_entry = CodeEntry(self.function_body)
         code_entry.name = "code_editor"
         code_entry.text_changed.connect(self.update_function_body)
+        self.code_entry = code_entry
         
         # Add our custom code entry to the node
         self.add_entry(code_entry)
+        self.update_widgets(code_entry)
         
         # Add buttons for managing inputs
         self.add_input_buttons()
@@ -88,12 +202,31 @@ class PythonFunctionNode(Node):
         button_entry.add_clicked.connect(self.on_add_input)
         button_entry.remove_clicked.connect(self.on_remove_input)
         button_entry.rename_clicked.connect(self.on_rename_output)
+        button_entry.pure_toggled.connect(self.on_pure_toggled)
+        button_entry.stream_toggled.connect(self.on_stream_toggled)
+        button_entry.vectorized_toggled.connect(self.on_vectorized_toggled)
+        button_entry.limits_changed.connect(self.on_limits_changed)
         
         self.add_entry(button_entry)
+        self.update_widgets(button_entry)
+    
+    def capture_input_defaults(self):
+        """Store the widget values of the inputs so the flow engine can use them off the GUI thread"""
+        self.defaults = {}
+        for input_name in self.inputs:
+            entry = self.get_entry(input_name)
+            if entry.socket is None or not entry.socket.edges:
+                self.defaults[input_name] = entry.calculate_value()
+    
+    def flush_edits(self):
+        """Pass on the code typed in the code editor that was not passed on yet"""
+        self.code_entry.flush()
     
     def update_function_body(self, code):
         """Update the function body when code changes"""
         self.function_body = code
+        self.invalidate_function_cache()
+        node_events.body_changed.emit(self, code)
     
     def on_add_input(self):
         """Add a new input field"""
@@ -109,6 +242,7 @@ class PythonFunctionNode(Node):
         
         # Force update of the node layout
         self.update_entries()
+        node_events.changed.emit(self)
     
     def on_remove_input(self):
         """Remove the last input field"""
@@ -118,6 +252,53 @@ class PythonFunctionNode(Node):
             
             # Force update of the node layout
         self.update_entries()
+        node_events.changed.emit(self)
+    
+    def on_pure_toggled(self, pure):
+        """Mark the function as pure, so its results are memoized on the input values"""
+        self.pure = pure
+        node_events.changed.emit(self)
+    
+    def on_vectorized_toggled(self, vectorized):
+        """Run the function once over whole arrays instead of once per value"""
+        self.vectorized = vectorized
+        self.invalidate_function_cache()
+        node_events.changed.emit(self)
+    
+    def on_limits_changed(self, cpu_limit, memory_limit):
+        """Set the CPU time (seconds) and memory (MB) limits of the node on the sandbox backend"""
+        self.cpu_limit = cpu_limit
+        self.memory_limit = memory_limit
+        node_events.changed.emit(self)
+    
+    def on_stream_toggled(self, name, stream):
+        """Let an input receive connected streams lazily, as an iterator"""
+        if stream and name not in self.stream_inputs:
+            self.stream_inputs.append(name)
+        elif not stream and name in self.stream_inputs:
+            self.stream_inputs.remove(name)
+        self.mark_dirty()
+        node_events.changed.emit(self)
+    
+    def set_timing_badge(self, text, color=None):
+        """Show a profiler time above the node (None removes it)"""
+        if text is None:
+            if self.timing_badge is not None:
+                self.timing_badge.setParentItem(None)
+                if self.timing_badge.scene() is not None:
+                    self.timing_badge.scene().removeItem(self.timing_badge)
+                self.timing_badge = None
+            return
+        
+        if self.timing_badge is None:
+            self.timing_badge = QGraphicsSimpleTextItem(self.graphics)
+            font = QFont()
+            font.setBold(True)
+            self.timing_badge.setFont(font)
+        
+        self.timing_badge.setText(text)
+        self.timing_badge.setBrush(color if color is not None else QColor("#e2e8f0"))
+        self.timing_badge.setPos(0, -self.timing_badge.boundingRect().height() - 4)
     
     def on_rename_output(self):
         """Rename the output of the node"""
@@ -136,52 +317,19 @@ class PythonFunctionNode(Node):
                 # Force update of the node layout
                 self.update_entries()
                 break
+        node_events.changed.emit(self)
     
     def evaluate(self, values):
         """Execute the Python function and return the result"""
-        try:
-            # Create local environment for execution
-            local_env = {}
-            
-            # Add input values
-            for input_name in self.inputs:
-                if input_name in values:
-                    local_env[input_name] = values[input_name]
-                else:
-                    local_env[input_name] = None
-            
-            # Prepare the full function code
-            params = ", ".join(self.inputs)
-            function_code = f"def {self.function_name}({params}):\n"
-            
-            # Handle empty function body
-            if not self.function_body.strip():
-                function_code += "    return None"
-            else:
-                # Indent the function body
-                indented_body = textwrap.indent(self.function_body, '    ')
-                function_code += indented_body
-            
-            # Execute the function in the context of both globals and locals
-            exec_globals = self.globals_env.copy()
-            
-            # Execute the function definition
-            exec(function_code, exec_globals, local_env)
-            
-            # Call the function with the inputs
-            function_args = [local_env[input_name] if input_name in local_env else None 
-                            for input_name in self.inputs]
-            
-            result = local_env[self.function_name](*function_args)
-            
-            # Set the output
-            self.set_output_value(self.output_name, result)
-            
-        except Exception as e:
-            raise RuntimeError(f"Error in Python function node: {str(e)}")
+        # Call the cached (or memoized) function with the inputs
+        result = self.run(values)
+        
+        # Set the output
+        self.set_output_value(self.output_name, result)
     
     def get_state(self):
         """Save the node state"""
+        self.flush_edits()
         state = super().get_state()
         
         # Add custom properties
@@ -190,16 +338,23 @@ class PythonFunctionNode(Node):
             "input_types": self.input_types,
             "output_name": self.output_name,
             "function_body": self.function_body,
-            "function_name": self.function_name
+            "function_name": self.function_name,
+            "pure": self.pure,
+            "stream_inputs": self.stream_inputs,
+            "vectorized": self.vectorized,
+            "cpu_limit": self.cpu_limit,
+            "memory_limit": self.memory_limit,
+            "collapsed": self.collapsed
         })
         
         return state
     
-    def set_state(self, state):
+    def set_state(self, state, restore_id=True):
         """Restore the node state"""
-        # Extract our custom properties
+        # Recreate the input and output entries of the saved node first
         if "inputs" in state:
-            self.inputs = state["inputs"]
+            self.match_entries(state)
+            self.inputs = list(state["inputs"])
         
         if "input_types" in state:
             self.input_types = state["input_types"]
@@ -213,28 +368,87 @@ class PythonFunctionNode(Node):
         if "function_name" in state:
             self.function_name = state["function_name"]
         
+        if "pure" in state:
+            self.pure = state["pure"]
+        
+        if "stream_inputs" in state:
+            self.stream_inputs = list(state["stream_inputs"])
+        
+        if "vectorized" in state:
+            self.vectorized = state["vectorized"]
+        
+        self.cpu_limit = state.get("cpu_limit")
+        self.memory_limit = state.get("memory_limit")
+        
+        self.invalidate_function_cache()
+        
         # Call parent implementation
-        super().set_state(state)
+        super().set_state(state, restore_id)
+        
+        if self.collapsed != state.get("collapsed", False):
+            self.collapsed = state.get("collapsed", False)
+            self.update_widgets()
         
         # Ensure code editor has the latest function body
         for entry_name in self.entry_names():
             entry = self.get_entry(entry_name)
             if entry_name == "code_editor" and hasattr(entry, 'set_text'):
                 entry.set_text(self.function_body)
+            elif entry_name == "input_buttons" and hasattr(entry, 'set_pure'):
+                entry.set_pure(self.pure)
+                entry.set_vectorized(self.vectorized)
+        
+        node_events.changed.emit(self)
+
+
+    def match_entries(self, state):
+        """Add, remove, rename and order the entries to match those of a saved node state
 
+        Entries with a socket are the output and then the inputs, in the order of the saved
+        entries, and the two entries without a socket are the code editor and the buttons.
+        """
+        inputs = list(state["inputs"])
+        output_name = state.get("output_name", self.output_name)
+        socket_names = iter([output_name] + inputs)
+        static_names = iter(["code_editor", "input_buttons"])
+        order = [next(socket_names, None) if entry_state.get("socket") else next(static_names, None)
+                 for entry_state in state.get("entries", [])]
+        
+        for entry in self.entries:
+            if entry.socket is not None and entry.entry_type == Entry.TYPE_OUTPUT:
+                entry.name = output_name
+        for name in self.inputs:
+            if name not in inputs:
+                self.remove_entry(name)
+        for name in inputs:
+            if name not in self.entry_names():
+                self.add_input_entry(name)
+        
+        if sorted(order, key=str) == sorted(self.entry_names(), key=str):
+            self.entries.sort(key=lambda entry: order.index(entry.name))
+        self.update_entries()
 
-class CodeEntry(Entry):
-    """A custom entry for editing Python code"""
+
+class CodeEntry(LazyEntry, Entry):
+    """A custom entry for editing Python code
+    
+    Edits are coalesced: ``text_changed`` is emitted once typing pauses for ``delay``
+    milliseconds (at once with a delay of 0), when the editor loses focus, or on ``flush``.
+    The editor only exists while the node is shown in detail.
+    """
     text_changed = pyqtSignal(str)
     
-    def __init__(self, initial_text=""):
+    def __init__(self, initial_text="", delay=EDIT_DELAY_MS):
         # Entry requires a name parameter
         super().__init__(name="code_editor")
         self.text = initial_text
-        # Pre-create widget to avoid None issues during node creation
-        self._widget = self.create_widget()
+        self.delay = delay
+        self.pending = False  # Edited since text_changed was last emitted
+        self.editor = None
+        self.init_lazy()
         
     def calculate_value(self):
+        self.flush()
         return self.text
         
     def create_widget(self):
@@ -251,42 +465,79 @@ class CodeEntry(Entry):
         font = QFont("Courier New", 10)
         self.editor.setFont(font)
         
-        # Connect change signal
+        # Connect change signal, restarting the timer on every keystroke
         self.editor.textChanged.connect(self.on_text_changed)
+        self.editor.installEventFilter(self)
+        self.edit_timer = QTimer(self.editor)
+        self.edit_timer.setSingleShot(True)
+        self.edit_timer.timeout.connect(self.flush)
         
         # Add editor to layout
         layout.addWidget(self.editor)
         
-        # Set minimum size
-        widget.setMinimumHeight(120)
-        widget.setMinimumWidth(200)
+        # Same height as the placeholder
+        widget.setFixedHeight(CODE_EDITOR_HEIGHT)
         
         return widget
     
+    def create_placeholder(self):
+        widget = QWidget()
+        widget.setFixedHeight(CODE_EDITOR_HEIGHT)
+        return widget
+    
+    def before_release(self):
+        self.flush()
+        self.editor = None
+    
     def on_text_changed(self):
+        self.pending = True
+        if self.delay > 0:
+            self.edit_timer.start(self.delay)
+        else:
+            self.flush()
+    
+    def flush(self):
+        """Emit the edited text now if it was not emitted yet"""
+        if not self.pending:
+            return
+        self.pending = False
+        self.edit_timer.stop()
         self.text = self.editor.toPlainText()
         self.text_changed.emit(self.text)
+    
+    def eventFilter(self, watched, event):
+        if event.type() == QEvent.FocusOut:
+            self.flush()
+        return False
         
     def set_text(self, text):
         """Set the text in the editor"""
         self.text = text
-        if hasattr(self, 'editor'):
+        if self.editor is not None:
             self.editor.setText(text)
-            
-    def get_widget(self):
-        """Override to ensure widget is always available"""
-        return self._widget
+            self.flush()
+        else:
+            self.text_changed.emit(text)
 
 
-class InputButtonsEntry(Entry):
-    """A custom entry for adding input management buttons"""
+class InputButtonsEntry(LazyEntry, Entry):
+    """A custom entry for adding input management buttons (created while the node is shown in detail)"""
     add_clicked = pyqtSignal()
     remove_clicked = pyqtSignal()
     rename_clicked = pyqtSignal()
+    pure_toggled = pyqtSignal(bool)
+    stream_toggled = pyqtSignal(str, bool)
+    vectorized_toggled = pyqtSignal(bool)
+    limits_changed = pyqtSignal(object, object)
     
     def __init__(self):
         # Entry requires a name parameter
         super().__init__(name="input_buttons")
+        self.pure = False
+        self.vectorized = False
+        self.pure_btn = None
+        self.vectorized_btn = None
+        self.init_lazy()
     
     def calculate_value(self):
         return None
@@ -295,29 +546,181 @@ class InputButtonsEntry(Entry):
         widget = QWidget()
         layout = QHBoxLayout(widget)
         layout.setContentsMargins(0, 0, 0, 0)
+        layout.setSpacing(2)
         
         # Add input button
         add_btn = QPushButton("+")
         add_btn.setToolTip("Add input")
-        add_btn.setFixedWidth(30)
+        add_btn.setFixedWidth(22)
         add_btn.clicked.connect(self.add_clicked.emit)
         
         # Remove input button
         remove_btn = QPushButton("-")
         remove_btn.setToolTip("Remove input")
-        remove_btn.setFixedWidth(30)
+        remove_btn.setFixedWidth(22)
         remove_btn.clicked.connect(self.remove_clicked.emit)
         
         # Rename output button
         rename_btn = QPushButton("✎")
         rename_btn.setToolTip("Rename output")
-        rename_btn.setFixedWidth(30)
+        rename_btn.setFixedWidth(22)
         rename_btn.clicked.connect(self.rename_clicked.emit)
         
+        # Pure function toggle
+        self.pure_btn = QPushButton("ƒ")
+        self.pure_btn.setToolTip("Pure function: reuse results for identical inputs")
+        self.pure_btn.setFixedWidth(22)
+        self.pure_btn.setCheckable(True)
+        self.pure_btn.setChecked(self.pure)
+        self.pure_btn.toggled.connect(self.pure_toggled.emit)
+        
+        # Vectorized toggle
+        self.vectorized_btn = QPushButton("▦")
+        self.vectorized_btn.setToolTip("Vectorized: run once over whole NumPy arrays")
+        self.vectorized_btn.setFixedWidth(22)
+        self.vectorized_btn.setCheckable(True)
+        self.vectorized_btn.setChecked(self.vectorized)
+        self.vectorized_btn.toggled.connect(self.vectorized_toggled.emit)
+        
+        # Menu of the inputs that consume streams lazily
+        stream_btn = QPushButton("⇶")
+        stream_btn.setToolTip("Stream inputs: receive generators lazily, as iterators")
+        stream_btn.setFixedWidth(22)
+        self.stream_menu = QMenu(stream_btn)
+        self.stream_menu.aboutToShow.connect(self.update_stream_menu)
+        stream_btn.setMenu(self.stream_menu)
+        
+        # Menu of the CPU time and memory limits on the sandbox backend
+        limits_btn = QPushButton("⛨")
+        limits_btn.setToolTip("Limits: CPU time and memory of the node on the sandbox backend")
+        limits_btn.setFixedWidth(22)
+        limits_menu = QMenu(limits_btn)
+        limits_menu.addAction("CPU Time Limit...", lambda: self.edit_limit("cpu_limit"))
+        limits_menu.addAction("Memory Limit...", lambda: self.edit_limit("memory_limit"))
+        limits_btn.setMenu(limits_menu)
+        
         # Add buttons to layout
         layout.addWidget(add_btn)
         layout.addWidget(remove_btn)
         layout.addWidget(rename_btn)
+        layout.addWidget(self.pure_btn)
+        layout.addWidget(self.vectorized_btn)
+        layout.addWidget(stream_btn)
+        layout.addWidget(limits_btn)
         layout.addStretch()
         
+        # Same height as the placeholder
+        widget.setFixedHeight(BUTTON_ROW_HEIGHT)
+        
         return widget
+    
+    def create_placeholder(self):
+        widget = QWidget()
+        widget.setFixedHeight(BUTTON_ROW_HEIGHT)
+        return widget
+    
+    def before_release(self):
+        self.pure = self.pure_btn.isChecked()
+        self.vectorized = self.vectorized_btn.isChecked()
+        self.pure_btn = None
+        self.vectorized_btn = None
+    
+    def set_pure(self, pure):
+        """Set the state of the pure toggle without emitting a signal"""
+        self.pure = pure
+        if self.pure_btn is not None:
+            self.pure_btn.blockSignals(True)
+            self.pure_btn.setChecked(pure)
+            self.pure_btn.blockSignals(False)
+    
+    def set_vectorized(self, vectorized):
+        """Set the state of the vectorized toggle without emitting a signal"""
+        self.vectorized = vectorized
+        if self.vectorized_btn is not None:
+            self.vectorized_btn.blockSignals(True)
+            self.vectorized_btn.setChecked(vectorized)
+            self.vectorized_btn.blockSignals(False)
+    
+    def edit_limit(self, name):
+        """Ask for the CPU time or memory limit of the node (0 for no limit)"""
+        label = "CPU time (seconds)" if name == "cpu_limit" else "Memory (MB)"
+        value, ok = QInputDialog.getDouble(None, "Node Limit", f"{label}, 0 for no limit:",
+                                           getattr(self.node, name) or 0, 0, 1e9, 1)
+        if not ok:
+            return
+        limits = {"cpu_limit": self.node.cpu_limit, "memory_limit": self.node.memory_limit}
+        limits[name] = value or None
+        self.limits_changed.emit(limits["cpu_limit"], limits["memory_limit"])
+    
+    def update_stream_menu(self):
+        """List the inputs of the node as checkable stream inputs"""
+        self.stream_menu.clear()
+        for name in self.node.inputs:
+            action = QAction(name, self.stream_menu)
+            action.setCheckable(True)
+            action.setChecked(name in self.node.stream_inputs)
+            action.toggled.connect(lambda checked, name=name: self.stream_toggled.emit(name, checked))
+            self.stream_menu.addAction(action)
+
+
+class ValueInputEntry(LazyEntry, ValueBoxEntry):
+    """A value box input that only creates its value box while the node is shown in detail
+    
+    The value, minimum and maximum are kept in the entry, and ``value_edited`` is emitted
+    when the value is changed in the value box. The placeholder is a label with the input name.
+    """
+    value_edited = pyqtSignal(object)
+    
+    def __init__(self, name, value=0.0, minimum=-100, maximum=100, theme=DarkTheme):
+        # The value box of ValueBoxEntry.__init__ is what is left out, so only Entry is set up
+        Entry.__init__(self, name, Entry.TYPE_INPUT, theme=theme)
+        self.box_value = value
+        self.minimum = minimum
+        self.maximum = maximum
+        self.edge_connected.connect(self.check_visible)
+        self.edge_disconnected.connect(self.check_visible)
+        self.init_lazy()
+    
+    def create_widget(self):
+        widget = ValueBox(self.name, theme=self.theme)
+        widget.value_type = ValueBox.TYPE_FLOAT
+        widget.minimum = self.minimum
+        widget.maximum = self.maximum
+        widget.value = self.box_value
+        widget.value_changed.connect(self.on_box_changed)
+        return widget
+    
+    def create_placeholder(self):
+        return placeholder_label(self.name, self.theme)
+    
+    def materialize(self):
+        super().materialize()
+        self.check_visible()
+    
+    def on_box_changed(self, value):
+        # The signal of the value box is declared as int, so its argument is not used
+        self.box_value = self.widget.value
+        self.value_edited.emit(self.box_value)
+    
+    def check_visible(self):
+        """Show only the name while an edge is connected"""
+        if self.materialized:
+            super().check_visible()
+    
+    def calculate_value(self):
+        if self.socket.edges:
+            return self._get_connected_value()
+        return self.box_value
+    
+    def save(self):
+        return {"value": self.box_value, "minimum": self.minimum, "maximum": self.maximum}
+    
+    def load(self, state):
+        self.minimum = state.get("minimum", self.minimum)
+        self.maximum = state.get("maximum", self.maximum)
+        self.box_value = state.get("value", self.box_value)
+        if self.materialized:
+            self.widget.minimum = self.minimum
+            self.widget.maximum = self.maximum
+            self.widget.value = self.box_value
+        return True
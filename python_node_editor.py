@@ -1,22 +1,31 @@
 import sys
 import os
-import json
-import io
-import contextlib
+import shutil
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QVBoxLayout, QHBoxLayout, 
                             QWidget, QPushButton, QSplitter, QFileDialog, 
-                            QListWidget, QLineEdit, QLabel, QMessageBox, QTabWidget)
-from PyQt5.QtCore import Qt, QSize, pyqtSlot
+                            QListWidget, QLineEdit, QLabel, QMessageBox, QTabWidget,
+                            QProgressBar, QSpinBox, QComboBox, QCheckBox)
+from PyQt5.QtCore import Qt, QSize, QThread, QTimer, pyqtSlot
 from PyQt5.QtGui import QColor, QFont, QPalette
 
 from QNodeEditor import NodeEditorDialog, Node, NodeEditor
 from QNodeEditor.themes import theme as Theme
 
-from python_node import PythonFunctionNode
+from python_node import PythonFunctionNode, node_events
 from global_constants import GlobalConstantsWidget
 from function_sidebar import FunctionSidebar
 from terminal_widget import TerminalWidget
 from custom_theme import ModernTheme
+from lazy_widgets import WidgetCuller
+from autosave import ChangeJournal, autosave_dir, crashed_sessions, replay, session_directory
+from flow_compiler import compile_flow
+from flow_engine import BACKENDS
+from flow_format import ARCHIVE_EXTENSION, write_save_data
+from flow_loader import FlowLoader
+from flow_profiler import FlowProfiler
+from flow_worker import FlowWorker, scene_to_flow
+from result_cache import shared_disk_cache, clear_result_caches
+from sandbox_pool import get_sandbox_pool
 
 class PythonNodeEditor(QMainWindow):
     def __init__(self):
@@ -47,6 +56,7 @@ class PythonNodeEditor(QMainWindow):
         
         # Create global constants sidebar
         self.constants_widget = GlobalConstantsWidget()
+        self.constants_widget.constants_changed.connect(self.on_constants_changed)
         self.sidebar_splitter.addWidget(self.constants_widget)
         
         # Add sidebar splitter to main splitter
@@ -60,6 +70,14 @@ class PythonNodeEditor(QMainWindow):
         self.editor_layout = QVBoxLayout(self.editor_container)
         self.editor_layout.setContentsMargins(0, 0, 0, 0)
         
+        # Background flow execution
+        self.run_thread = None
+        self.run_worker = None
+        self.run_constants = {}  # Constants used by the last run (to find changed constants)
+        self.last_profile = None  # Profiler of the last profiled run
+        self.folded_titles = []  # Titles of the constant nodes computed by the running fold
+        self.flow_loader = None  # Loader of the flow file being opened
+        
         # Create editor
         self.create_editor()
         
@@ -81,6 +99,25 @@ class PythonNodeEditor(QMainWindow):
         self.sidebar_splitter.setSizes([500, 400])
         self.editor_terminal_splitter.setSizes([700, 200])
         
+        # Autosave journal of the edits, to recover the flow after a crash (see autosave)
+        root = autosave_dir()
+        self.journal = ChangeJournal(session_directory(root)) if root else None
+        self.journal_paused = False  # Set while a whole flow is replaced
+        self.journal_constants = {}  # Constants as last written to the journal
+        self.journal_positions = {}  # Node positions as last written to the journal
+        node_events.added.connect(self.on_node_added)
+        node_events.changed.connect(self.on_node_added)
+        node_events.removed.connect(self.on_node_removed)
+        node_events.body_changed.connect(self.on_node_body_changed)
+        node_events.edges_changed.connect(self.on_node_edges_changed)
+        self.workers_spin.valueChanged.connect(self.record_settings)
+        self.backend_combo.currentTextChanged.connect(self.record_settings)
+        
+        # Node moves are not reported by the editor, so positions are written periodically
+        self.positions_timer = QTimer(self)
+        self.positions_timer.timeout.connect(self.record_positions)
+        self.positions_timer.start(5000)
+        
         # Initialize with welcome message
         self.terminal.append_message("Python Function Node Editor started\n", "info")
         self.terminal.append_message("Drag functions from the sidebar to the editor to create nodes\n")
@@ -185,13 +222,17 @@ class PythonNodeEditor(QMainWindow):
         # Remove custom theme
         self.editor_layout.addWidget(self.editor)
         
+        # Only the nodes in view get their widgets, new nodes once they are placed
+        self.widget_culler = WidgetCuller(self.editor)
+        node_events.added.connect(self.widget_culler.schedule)
+        
     def create_toolbar(self):
         toolbar_widget = QWidget()
         toolbar_layout = QHBoxLayout(toolbar_widget)
         toolbar_layout.setContentsMargins(10, 10, 10, 10)
         
         # Create toolbar buttons with modern styling
-        run_button = QPushButton("Run Flow")
+        self.run_button = run_button = QPushButton("Run Flow")
         run_button.setStyleSheet("""
             QPushButton { 
                 background-color: #6366f1; 
@@ -203,22 +244,83 @@ class PythonNodeEditor(QMainWindow):
         """)
         run_button.clicked.connect(self.run_flow)
         
-        save_button = QPushButton("Save")
+        self.run_all_button = QPushButton("Run All")
+        self.run_all_button.setToolTip("Run every node again, including unchanged nodes")
+        self.run_all_button.clicked.connect(self.run_all)
+        
+        self.run_selected_button = QPushButton("Run Selected")
+        self.run_selected_button.setToolTip("Run only the selected nodes and the nodes they depend on")
+        self.run_selected_button.clicked.connect(self.run_selected)
+        
+        self.cancel_button = QPushButton("Cancel")
+        self.cancel_button.setEnabled(False)
+        self.cancel_button.clicked.connect(self.cancel_flow)
+        
+        self.save_button = save_button = QPushButton("Save")
         save_button.clicked.connect(self.save_flow)
         
-        load_button = QPushButton("Load")
+        self.load_button = load_button = QPushButton("Load")
         load_button.clicked.connect(self.load_flow)
         
         clear_button = QPushButton("New")
         clear_button.clicked.connect(self.clear_flow)
         
+        clear_cache_button = QPushButton("Clear Cache")
+        clear_cache_button.setToolTip("Remove the memoized results of pure nodes (in memory and on disk)")
+        clear_cache_button.clicked.connect(self.clear_cache)
+        
+        export_python_button = QPushButton("Export Python")
+        export_python_button.setToolTip("Compile the flow to a standalone Python module")
+        export_python_button.clicked.connect(self.export_python)
+        
+        collapse_button = QPushButton("Collapse")
+        collapse_button.setToolTip("Show only the title and sockets of the selected nodes, or expand them again")
+        collapse_button.clicked.connect(self.toggle_collapsed)
+        
+        # Per-node timing and memory of the next runs
+        self.profile_check = QCheckBox("Profile")
+        self.profile_check.setToolTip("Measure the time and memory of every node and show it on the nodes")
+        self.profile_check.toggled.connect(self.on_profile_toggled)
+        
+        self.export_profile_button = QPushButton("Export Profile")
+        self.export_profile_button.setEnabled(False)
+        self.export_profile_button.clicked.connect(self.export_profile)
+        
         # Add buttons to toolbar
         toolbar_layout.addWidget(run_button)
+        toolbar_layout.addWidget(self.run_all_button)
+        toolbar_layout.addWidget(self.run_selected_button)
+        toolbar_layout.addWidget(self.cancel_button)
         toolbar_layout.addWidget(save_button)
         toolbar_layout.addWidget(load_button)
         toolbar_layout.addWidget(clear_button)
+        toolbar_layout.addWidget(clear_cache_button)
+        toolbar_layout.addWidget(export_python_button)
+        toolbar_layout.addWidget(collapse_button)
+        toolbar_layout.addWidget(self.profile_check)
+        toolbar_layout.addWidget(self.export_profile_button)
         toolbar_layout.addStretch()
         
+        # Maximum number of nodes running at the same time, and what they run on
+        toolbar_layout.addWidget(QLabel("Parallel:"))
+        self.workers_spin = QSpinBox()
+        self.workers_spin.setRange(1, 64)
+        self.workers_spin.setToolTip("Maximum number of independent nodes running at the same time")
+        toolbar_layout.addWidget(self.workers_spin)
+        
+        self.backend_combo = QComboBox()
+        self.backend_combo.addItems(BACKENDS)
+        self.backend_combo.setToolTip("Threads for I/O-bound nodes, processes for CPU-bound nodes, "
+                                      "sandbox to isolate nodes from the editor with limits")
+        self.backend_combo.currentTextChanged.connect(self.on_backend_changed)
+        toolbar_layout.addWidget(self.backend_combo)
+        
+        # Progress of the running flow (hidden while idle)
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setFixedWidth(200)
+        self.progress_bar.setVisible(False)
+        toolbar_layout.addWidget(self.progress_bar)
+        
         self.editor_layout.insertWidget(0, toolbar_widget)
     
     @pyqtSlot(str, dict)
@@ -235,7 +337,8 @@ class PythonNodeEditor(QMainWindow):
                 # Use the view's add_node method to place a node
                 # This properly creates and positions the node in the editor
                 pos = self.editor.view.mapToScene(self.editor.view.rect().center())
-                node = self.editor.view.add_node(node_class)
+                self.editor.view.add_node(node_class)
+                node = self.editor.scene.nodes[-1] if self.editor.scene.nodes else None
                 
                 if node:
                     # Set node properties from function data
@@ -258,6 +361,10 @@ class PythonNodeEditor(QMainWindow):
                     output_name = function_data.get("output", "result")
                     node.output_name = output_name
                     
+                    # Inputs that consume streams lazily
+                    node.stream_inputs = [name for name in function_data.get("stream_inputs", [])
+                                          if name in node.inputs]
+                    
                     # Update the node
                     node.update_entries()
                     
@@ -276,13 +383,37 @@ class PythonNodeEditor(QMainWindow):
                 self.terminal.append_message(traceback.format_exc(), "error")
         
     def run_flow(self):
-        """Execute the node graph"""
+        """Execute the node graph on a background thread"""
+        self.start_flow()
+    
+    def run_selected(self):
+        """Execute the selected nodes and the nodes they depend on"""
+        selected = [node.node_id for node in self.editor.scene.nodes
+                    if hasattr(node, "run") and node.graphics.isSelected()]
+        if not selected:
+            self.terminal.append_message("Select the nodes to run first\n", "info")
+            return
+        self.start_flow(selected)
+    
+    def toggle_collapsed(self):
+        """Collapse the selected nodes, or expand them if they are all collapsed"""
+        selected = [node for node in self.editor.scene.nodes
+                    if hasattr(node, "set_collapsed") and node.graphics.isSelected()]
+        if not selected:
+            self.terminal.append_message("Select the nodes to collapse first\n", "info")
+            return
+        collapsed = not all(node.collapsed for node in selected)
+        for node in selected:
+            node.set_collapsed(collapsed)
+    
+    def start_flow(self, outputs=None):
+        """Execute the node graph, or only what the ``outputs`` node ids need, on a background thread"""
+        if self.run_thread is not None:
+            return
+        
         try:
             self.terminal.append_message("\n--- Running Flow ---\n", "info")
             
-            # Capture stdout to display in terminal
-            stdout_capture = io.StringIO()
-            
             # Add global constants to environment
             globals_env = self.constants_widget.get_constants()
             
@@ -293,55 +424,415 @@ class PythonNodeEditor(QMainWindow):
                     self.terminal.append_message(f"  {name} = {repr(value)}\n")
                 self.terminal.append_message("\n")
             
-            # Pass globals to the scene through a special property
-            for node in self.editor.scene.nodes:
-                node.globals_env = globals_env
+            # Snapshot the graph on the GUI thread. All nodes share one read-only view of the
+            # constants during the run
+            self.run_constants = dict(globals_env)
+            flow = scene_to_flow(self.editor.scene, dict(globals_env))
+            flow.max_workers = self.workers_spin.value()
+            flow.backend = self.backend_combo.currentText()
             
-            # Evaluate the scene and capture stdout
-            with contextlib.redirect_stdout(stdout_capture):
-                result = self.editor.scene.evaluate()
+            # Nodes that do not lead to the selected nodes are not run
+            flow.outputs = outputs
+            eliminated = flow.dead_nodes()
+            if eliminated:
+                titles = ", ".join(flow.nodes[node_id].title for node_id in eliminated)
+                self.terminal.append_message(
+                    f"Eliminated {len(eliminated)} node(s) that do not lead to the selected nodes: {titles}\n", "info")
             
-            # Get captured output
-            output = stdout_capture.getvalue()
-            if output:
-                self.terminal.append_message("Output:\n")
-                self.terminal.append_message(output)
+        except Exception as e:
+            self.terminal.append_message(f"Error executing flow: {str(e)}\n", "error")
+            return
+        
+        profiler = FlowProfiler() if self.profile_check.isChecked() else None
+        worker = self.create_worker(flow, profiler)
+        
+        # Report node results in the terminal
+        worker.node_finished.connect(self.on_node_finished)
+        worker.skipped.connect(self.on_nodes_skipped)
+        worker.finished.connect(self.on_flow_finished)
+        worker.errored.connect(self.on_flow_errored)
+        worker.cancelled.connect(self.on_flow_cancelled)
+        worker.profiled.connect(self.on_flow_profiled)
+        
+        self.set_running(True)
+        self.run_thread.start()
+    
+    def create_worker(self, flow, profiler=None):
+        """Create a QThread and place a worker evaluating a flow on it (started by the caller)"""
+        self.run_thread = QThread()
+        self.run_worker = FlowWorker(flow, profiler, os.environ.get("NODE_EDITOR_OUTPUT_LOG") or None)
+        self.run_worker.moveToThread(self.run_thread)
+        self.run_thread.started.connect(self.run_worker.run)
+        
+        # Report progress and output in the terminal
+        self.run_worker.progress.connect(self.on_flow_progress)
+        self.run_worker.output.connect(self.on_node_output)
+        self.run_worker.done.connect(self.on_flow_done)
+        return self.run_worker
+    
+    def fold_constants(self):
+        """Precompute the pure nodes that only depend on the constants on a background thread
+        
+        Their results are cached, so the next run reuses them instead of running them again.
+        """
+        if self.run_thread is not None:
+            return
+        
+        try:
+            constants = dict(self.constants_widget.get_constants())
+            flow = scene_to_flow(self.editor.scene, constants)
+            flow.outputs = flow.constant_nodes()
+            if all(flow.is_clean(node_id, set()) for node_id in flow.outputs):
+                return
+        except Exception as e:
+            self.terminal.append_message(f"Error folding constants: {str(e)}\n", "error")
+            return
+        
+        self.run_constants = dict(constants)
+        self.folded_titles = []
+        worker = self.create_worker(flow)
+        worker.node_finished.connect(self.on_node_folded)
+        worker.finished.connect(self.on_constants_folded)
+        worker.errored.connect(self.on_fold_errored)
+        
+        self.set_running(True)
+        self.run_thread.start()
+    
+    def run_all(self):
+        """Execute every node again, ignoring the results of the previous run"""
+        if self.run_thread is not None:
+            return
+        for node in self.editor.scene.nodes:
+            if hasattr(node, "mark_dirty"):
+                node.mark_dirty()
+        self.run_flow()
+    
+    def on_constants_changed(self, constants):
+        """Mark the nodes that use a changed constant as dirty and fold the constant nodes again"""
+        self.record_constants()
+        changed = {name for name in set(constants) | set(self.run_constants)
+                   if name not in constants or name not in self.run_constants
+                   or constants[name] is not self.run_constants[name]}
+        if not changed:
+            return
+        
+        for node in self.editor.scene.nodes:
+            if not hasattr(node, "referenced_globals"):
+                continue
+            names = node.referenced_globals()
+            if names is None or names & changed:
+                node.mark_dirty()
+        
+        self.fold_constants()
+    
+    def record(self, op, **fields):
+        """Append an edit to the autosave journal"""
+        if self.journal is None or self.journal_paused:
+            return
+        try:
+            self.journal.append(op, **fields)
+        except Exception as e:
+            self.journal = None
+            self.terminal.append_message(f"Autosave stopped: {str(e)}\n", "error")
+    
+    def on_node_added(self, node):
+        """Write the whole state of a node that was added or changed"""
+        if node.graphics is not None:
+            self.record("node", state=node.get_state())
+    
+    def on_node_removed(self, node):
+        self.record("remove", code=node.code)
+    
+    def on_node_body_changed(self, node, code):
+        self.record("body", code=node.code, text=code)
+    
+    def on_node_edges_changed(self, node):
+        """Write the edges of a node, whose sockets replace the edges written before"""
+        sockets = node.sockets()
+        edges = [[edge.start.id, edge.end.id] for socket in sockets for edge in socket.edges
+                 if edge.start is not None and edge.end is not None]
+        self.record("edges", sockets=[socket.id for socket in sockets], edges=edges)
+    
+    def record_constants(self):
+        """Write the constants that changed since they were last written"""
+        constants = self.constants_widget.get_saved_constants()
+        changed = {name: value for name, value in constants.items()
+                   if name not in self.journal_constants or self.journal_constants[name] != value}
+        removed = [name for name in self.journal_constants if name not in constants]
+        if changed or removed:
+            self.record("constants", set=changed, removed=removed)
+        self.journal_constants = constants
+    
+    def record_settings(self, *args):
+        self.record("settings", settings={"max_workers": self.workers_spin.value(),
+                                          "backend": self.backend_combo.currentText()})
+    
+    def record_positions(self):
+        """Write the positions of the nodes that moved since they were last written"""
+        if self.journal is None or self.journal_paused:
+            return
+        positions = {node.code: [node.graphics.scenePos().x(), node.graphics.scenePos().y()]
+                     for node in self.editor.scene.nodes}
+        moved = {code: position for code, position in positions.items()
+                 if self.journal_positions.get(code) != position}
+        if moved:
+            self.record("positions", positions=moved)
+        self.journal_positions = positions
+    
+    def record_scene(self):
+        """Start the journal over from the whole flow (after it was opened, saved or replaced)
+
+        The flow is written as the snapshot of the journal, so recovery does not depend on the
+        flow file, which may have been changed or removed since.
+        """
+        if self.journal is None or self.journal_paused:
+            return
+        constants = self.constants_widget.get_saved_constants()
+        try:
+            self.journal.restart({
+                "editor_state": self.editor.scene.get_state(),
+                "global_constants": constants,
+                "settings": {
+                    "max_workers": self.workers_spin.value(),
+                    "backend": self.backend_combo.currentText()
+                }
+            })
+        except Exception as e:
+            self.journal = None
+            self.terminal.append_message(f"Autosave stopped: {str(e)}\n", "error")
+            return
+        self.journal_constants = constants
+        self.journal_positions = {node.code: [node.graphics.scenePos().x(), node.graphics.scenePos().y()]
+                                  for node in self.editor.scene.nodes}
+    
+    def check_recovery(self):
+        """Offer to recover the flow of an editor session that did not close properly"""
+        if self.journal is None:
+            return
+        sessions = crashed_sessions(autosave_dir())
+        if not sessions:
+            return
+        
+        reply = QMessageBox.question(
+            self, "Recover Flow",
+            "The editor did not close properly last time. Recover the flow it was editing?",
+            QMessageBox.Yes | QMessageBox.No, QMessageBox.Yes
+        )
+        try:
+            if reply == QMessageBox.Yes:
+                state, _ = replay(sessions[0])
+                os.makedirs(self.journal.directory, exist_ok=True)
+                filepath = os.path.join(self.journal.directory, "recovered.json")
+                write_save_data(filepath, state.save_data())
+                self.open_flow(filepath)
+            shutil.rmtree(sessions[0], ignore_errors=True)
+        except Exception as e:
+            # Set the journal aside, so the next start does not offer it again
+            kept = os.path.join(os.path.dirname(sessions[0]), "failed-" + os.path.basename(sessions[0]))
+            os.replace(sessions[0], kept)
+            self.terminal.append_message(
+                f"Error recovering flow: {str(e)} (the journal was kept in {kept})\n", "error")
+    
+    def closeEvent(self, event):
+        """Remove the autosave journal when the editor closes normally"""
+        if self.journal is not None:
+            self.journal.close(discard=True)
+            self.journal = None
+        super().closeEvent(event)
+    
+    def on_backend_changed(self, backend):
+        """Start the sandbox workers ahead of the first run on the sandbox backend"""
+        if backend != "sandbox":
+            return
+        try:
+            get_sandbox_pool(self.workers_spin.value())
+        except Exception as e:
+            self.terminal.append_message(f"Error starting the sandbox: {str(e)}\n", "error")
+    
+    def cancel_flow(self):
+        """Ask the running flow to stop before its next node (or stop loading a flow)"""
+        if self.flow_loader is not None:
+            self.flow_loader.cancel()
+        elif self.run_worker is not None:
+            self.terminal.append_message("Cancelling flow...\n", "info")
+            self.run_worker.cancel()
+    
+    def set_running(self, running):
+        """Update the toolbar and editor for a flow that starts or stops running"""
+        self.run_button.setEnabled(not running)
+        self.run_all_button.setEnabled(not running)
+        self.run_selected_button.setEnabled(not running)
+        self.cancel_button.setEnabled(running)
+        self.progress_bar.setVisible(running)
+        self.progress_bar.setValue(0)
+        
+        # Prevent edits to the graph and the constants while the worker reads them (a node
+        # marked dirty by an edit would be marked clean again when its run finishes)
+        self.editor.view.setDisabled(running)
+        self.constants_widget.setDisabled(running)
+    
+    def set_loading(self, loading):
+        """Update the toolbar and editor for a flow file that starts or stops loading"""
+        self.set_running(loading)
+        self.save_button.setEnabled(not loading)
+        self.load_button.setEnabled(not loading)
+        self.progress_bar.setMaximum(100)
+    
+    def on_flow_progress(self, evaluated, total):
+        self.progress_bar.setMaximum(total)
+        self.progress_bar.setValue(evaluated)
+    
+    def on_node_finished(self, title, result):
+        display_value = repr(result)
+        if len(display_value) > 200:
+            display_value = display_value[:197] + "..."
+        self.terminal.append_message(f"{title}: {display_value}\n")
+    
+    def on_node_output(self, title, text):
+        """Show a chunk of the stdout of a running node, tagged with the node title"""
+        if title:
+            text = "".join(f"[{title}] {line}" for line in text.splitlines(keepends=True))
+        self.terminal.append_message(text)
+    
+    def on_node_folded(self, title, result):
+        self.folded_titles.append(title)
+    
+    def on_constants_folded(self, results):
+        if self.folded_titles:
+            self.terminal.append_message(
+                f"Folded {len(self.folded_titles)} constant node(s): {', '.join(self.folded_titles)}\n", "info")
+    
+    def on_fold_errored(self, message):
+        self.terminal.append_message(f"Error folding constants: {message}\n", "error")
+    
+    def on_nodes_skipped(self, titles):
+        self.terminal.append_message(f"Skipped {len(titles)} unchanged node(s): {', '.join(titles)}\n", "info")
+    
+    def on_flow_finished(self, results):
+        if results:
+            self.terminal.append_message(f"Result: {results}\n", "success")
+        self.terminal.append_message("Flow executed successfully\n", "success")
+    
+    def on_flow_errored(self, message):
+        self.terminal.append_message(f"Error executing flow: {message}\n", "error")
+    
+    def on_flow_cancelled(self):
+        self.terminal.append_message("Flow cancelled\n", "error")
+    
+    def on_flow_profiled(self, profiler):
+        """Show the profile of a run in the terminal and on the nodes"""
+        if not profiler.records:
+            return
+        self.last_profile = profiler
+        self.export_profile_button.setEnabled(True)
+        self.terminal.append_message(f"\n--- Profile (slowest first) ---\n{profiler.table()}\n", "info")
+        
+        # Color the nodes from green (fastest) to red (slowest)
+        times = {record["node_id"]: record["total_time"] for record in profiler.records}
+        slowest = max(times.values()) or 1.0
+        for node in self.editor.scene.nodes:
+            if not hasattr(node, "set_timing_badge"):
+                continue
+            if node.node_id not in times:
+                node.set_timing_badge(None)
+                continue
+            total = times[node.node_id]
+            color = QColor.fromHsvF((1.0 - total / slowest) / 3.0, 0.8, 0.95)
+            node.set_timing_badge(f"{total * 1000:.2f} ms", color)
+    
+    def on_profile_toggled(self, enabled):
+        """Remove the timing badges when profiling is switched off"""
+        if enabled:
+            return
+        for node in self.editor.scene.nodes:
+            if hasattr(node, "set_timing_badge"):
+                node.set_timing_badge(None)
+    
+    def export_profile(self):
+        """Save the profile of the last profiled run"""
+        if self.last_profile is None:
+            return
+        try:
+            filepath, selected_filter = QFileDialog.getSaveFileName(
+                self, "Export Profile", "",
+                "JSON Files (*.json);;Chrome Trace (*.trace.json)"
+            )
             
-            # Display result
-            if result:
-                self.terminal.append_message(f"Result: {result}\n", "success")
+            if not filepath:
+                return
+            
+            trace_format = "chrome" if selected_filter.startswith("Chrome") else "json"
+            self.last_profile.export(filepath, trace_format)
+            self.terminal.append_message(f"Profile exported to {filepath}\n", "success")
             
-            self.terminal.append_message("Flow executed successfully\n", "success")
-                
         except Exception as e:
-            self.terminal.append_message(f"Error executing flow: {str(e)}\n", "error")
+            self.terminal.append_message(f"Error exporting profile: {str(e)}\n", "error")
+    
+    def export_python(self):
+        """Compile the flow to a Python module that runs without the editor"""
+        try:
+            filepath, _ = QFileDialog.getSaveFileName(
+                self, "Export Python", "", "Python Files (*.py)"
+            )
+            
+            if not filepath:
+                return
+            
+            flow = scene_to_flow(self.editor.scene, dict(self.constants_widget.get_constants()))
+            source = compile_flow(flow, self.constants_widget.array_paths,
+                                  os.path.basename(filepath))
+            with open(filepath, 'w') as f:
+                f.write(source)
+            
+            self.terminal.append_message(f"Flow compiled to {filepath}\n", "success")
+            
+        except Exception as e:
+            self.terminal.append_message(f"Error compiling flow: {str(e)}\n", "error")
+    
+    def on_flow_done(self):
+        """Close the worker thread once the flow is done"""
+        self.run_thread.quit()
+        self.run_thread.wait()
+        self.run_worker.deleteLater()
+        self.run_thread.deleteLater()
+        self.run_thread = None
+        self.run_worker = None
+        self.set_running(False)
     
     def save_flow(self):
         """Save the current node graph to a file"""
         try:
             # Get file path
-            filepath, _ = QFileDialog.getSaveFileName(
-                self, "Save Flow", "", "JSON Files (*.json)"
+            filepath, file_filter = QFileDialog.getSaveFileName(
+                self, "Save Flow", "", f"JSON Files (*.json);;Flow Archive (*{ARCHIVE_EXTENSION})"
             )
             
             if not filepath:
                 return
+            
+            # The format follows the extension, or the chosen filter if there is none
+            if not os.path.splitext(filepath)[1]:
+                filepath += ARCHIVE_EXTENSION if ARCHIVE_EXTENSION in file_filter else ".json"
                 
             # Save node editor state
             editor_state = self.editor.scene.get_state()
             
-            # Save global constants
-            global_constants = self.constants_widget.get_constants()
+            # Save global constants (arrays as their file, other arrays are converted on writing)
+            global_constants = self.constants_widget.get_saved_constants(keep_arrays=True)
             
             # Combine both states
             save_data = {
                 "editor_state": editor_state,
-                "global_constants": global_constants
+                "global_constants": global_constants,
+                "settings": {
+                    "max_workers": self.workers_spin.value(),
+                    "backend": self.backend_combo.currentText()
+                }
             }
             
-            # Save to file
-            with open(filepath, 'w') as f:
-                json.dump(save_data, f, indent=2)
+            # Save to file (JSON, or a flow archive for .flowz files)
+            write_save_data(filepath, save_data)
+            self.record_scene()
                 
             self.terminal.append_message(f"Flow saved to {filepath}\n", "success")
             
@@ -353,32 +844,93 @@ class PythonNodeEditor(QMainWindow):
         try:
             # Get file path
             filepath, _ = QFileDialog.getOpenFileName(
-                self, "Load Flow", "", "JSON Files (*.json)"
+                self, "Load Flow", "", f"Flow Files (*.json *{ARCHIVE_EXTENSION});;All Files (*)"
             )
             
             if not filepath:
                 return
-                
-            # Load file
-            with open(filepath, 'r') as f:
-                save_data = json.load(f)
-                
-            # Clear current scene
-            self.editor.scene.clear()
             
-            # Restore node editor state
-            editor_state = save_data.get("editor_state", {})
-            self.editor.scene.set_state(editor_state)
+            self.open_flow(filepath)
+            
+        except Exception as e:
+            self.terminal.append_message(f"Error loading flow: {str(e)}\n", "error")
+    
+    def open_flow(self, filepath):
+        """Start loading a flow file into the editor"""
+        try:
+            # The scene is built in steps between events, so large flows do not freeze the editor
+            loader = FlowLoader(self.editor.scene, self.editor.available_nodes["Python Function"],
+                                filepath)
+            loader.progress.connect(self.progress_bar.setValue)
+            loader.finished.connect(lambda parts: self.on_flow_loaded(filepath, parts))
+            loader.errored.connect(self.on_load_errored)
+            loader.cancelled.connect(self.on_load_cancelled)
+            loader.done.connect(self.on_load_done)
+            
+            self.flow_loader = loader
+            self.journal_paused = True
+            self.set_loading(True)
+            self.terminal.append_message(f"Loading flow from {filepath}...\n", "info")
+            loader.start()
             
+        except Exception as e:
+            self.terminal.append_message(f"Error loading flow: {str(e)}\n", "error")
+    
+    def on_flow_loaded(self, filepath, parts):
+        """Restore the constants and settings once the nodes and edges of a flow are loaded"""
+        try:
             # Restore global constants
-            global_constants = save_data.get("global_constants", {})
+            global_constants = parts.get("global_constants", {})
             self.constants_widget.set_constants(global_constants)
             
-            self.terminal.append_message(f"Flow loaded from {filepath}\n", "success")
+            # Restore execution settings
+            settings = parts.get("settings", {})
+            self.workers_spin.setValue(settings.get("max_workers", 1))
+            self.backend_combo.setCurrentText(settings.get("backend", "thread"))
+            
+            self.terminal.append_message(
+                f"Flow loaded from {filepath} ({self.flow_loader.node_count} nodes, "
+                f"{self.flow_loader.edge_count} edges)\n", "success")
+            
+            self.journal_paused = False
+            self.record_scene()
             
         except Exception as e:
             self.terminal.append_message(f"Error loading flow: {str(e)}\n", "error")
     
+    def on_load_errored(self, message):
+        self.terminal.append_message(f"Error loading flow: {message}\n", "error")
+    
+    def on_load_cancelled(self):
+        self.terminal.append_message("Loading cancelled\n", "info")
+    
+    def on_load_done(self):
+        self.flow_loader.deleteLater()
+        self.flow_loader = None
+        self.set_loading(False)
+        
+        # After an error or cancel the journal gets whatever the scene holds now
+        if self.journal_paused:
+            self.journal_paused = False
+            self.record_scene()
+    
+    def clear_cache(self):
+        """Remove all cached results so the next run executes every node"""
+        try:
+            info = shared_disk_cache.info()
+            cleared = clear_result_caches()
+            for node in self.editor.scene.nodes:
+                if hasattr(node, "mark_dirty"):
+                    node.mark_dirty()
+            if not cleared:
+                self.terminal.append_message(
+                    "Error clearing cache: the result database could not be changed\n", "error")
+                return
+            self.terminal.append_message(
+                f"Cleared result cache ({info['entries']} stored results, {info['bytes']} bytes)\n", "info")
+        except Exception as e:
+            self.terminal.append_message(f"Error clearing cache: {str(e)}\n", "error")
+    
     def clear_flow(self):
         """Create a new empty flow"""
         # Ask for confirmation
@@ -390,9 +942,12 @@ class PythonNodeEditor(QMainWindow):
         
         if reply == QMessageBox.Yes:
             # Clear the editor
+            self.journal_paused = True
             self.editor.scene.clear()
             # Clear the constants
             self.constants_widget.set_constants({})
+            self.journal_paused = False
+            self.record_scene()
             # Log
             self.terminal.append_message("Created new flow\n", "info")
 
@@ -401,4 +956,5 @@ if __name__ == "__main__":
     app = QApplication(sys.argv)
     window = PythonNodeEditor()
     window.show()
+    QTimer.singleShot(0, window.check_recovery)
     sys.exit(app.exec_())
@@ -0,0 +1,288 @@
+import hashlib
+import os
+import pickle
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_RESULT_CACHE = os.path.join(os.path.expanduser("~"), ".cache", "python-node-editor",
+                                    "results.sqlite")
+
+
+def stable_hash(value):
+    """Get a hash of a value that is stable between runs
+
+    Values are hashed by their pickled bytes. Values that can not be pickled fall back to
+    their identity, which only matches the same object (see :py:class:`MemoCache`).
+    """
+    try:
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+    except Exception:
+        return f"id:{type(value).__qualname__}:{id(value)}"
+    return hashlib.sha256(data).hexdigest()
+
+
+def estimate_size(value):
+    """Estimate the memory used by a value in bytes, without copying or pickling it
+
+    Arrays count their data, and lists, tuples, sets and dicts also count the items they hold
+    directly (but not what those items hold).
+    """
+    size = _shallow_size(value)
+    if isinstance(value, dict):
+        size += sum(_shallow_size(key) + _shallow_size(item) for key, item in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(_shallow_size(item) for item in value)
+    return size
+
+
+def _shallow_size(value):
+    nbytes = getattr(value, "nbytes", None)
+    if isinstance(nbytes, int):
+        return nbytes  # NumPy arrays and memoryviews
+    return sys.getsizeof(value, 0)
+
+
+class MemoCache:
+    """LRU cache of node results, bounded by number of entries and approximate size"""
+
+    def __init__(self, max_entries=1024, max_bytes=256 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+        self._entries = OrderedDict()  # key -> (result, size, keepalive)
+        self._size = 0
+        self._lock = threading.Lock()
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Get a (found, result) pair for a key"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[0]
+
+    def put(self, key, result, keepalive=None):
+        """Store a result, evicting the least recently used results above the limits
+
+        ``keepalive`` holds references to the inputs, so objects hashed by identity can not
+        be freed (and their id reused) while the result is cached.
+        """
+        size = estimate_size(result)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._size -= self._entries.pop(key)[1]
+            self._entries[key] = (result, size, keepalive)
+            self._size += size
+
+            while self._entries and (len(self._entries) > self.max_entries
+                                     or self._size > self.max_bytes):
+                self._size -= self._entries.popitem(last=False)[1][1]
+
+    def info(self):
+        """Get the counters and current size of the cache"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "bytes": self._size
+            }
+
+    def clear(self):
+        """Remove all cached results"""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+
+class DiskResultCache:
+    """Persistent cache of pickled node results in an SQLite database
+
+    Results are evicted when they are older than ``ttl`` seconds, and the least recently used
+    results are evicted when the total size exceeds ``max_bytes``.
+    """
+
+    def __init__(self, path, max_bytes=1024 * 1024 * 1024, ttl=7 * 24 * 3600):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+
+        self._connection = None
+        self._lock = threading.Lock()
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key_string(key):
+        """Convert a memoization key to a database key (None if it can not be persisted)"""
+        code_hash, input_hashes, constant_names, constant_hashes = key
+        hashes = [*input_hashes, *constant_hashes]
+
+        # Identity hashes are only meaningful within this process
+        if any(value.startswith("id:") for value in hashes):
+            return None
+        return f"{code_hash}:{','.join(input_hashes)}:{','.join(constant_names)}={','.join(constant_hashes)}"
+
+    def get(self, key):
+        """Get a (found, result) pair for a memoization key"""
+        key = self.key_string(key)
+        if key is None or not self.path:
+            return False, None
+
+        with self._lock:
+            connection = self._connect()
+            if connection is None:
+                return False, None
+
+            import sqlite3
+            now = time.time()
+            try:
+                row = connection.execute("SELECT value, created FROM results WHERE key = ?",
+                                         (key,)).fetchone()
+                if row is None or now - row[1] > self.ttl:
+                    self.misses += 1
+                    return False, None
+                connection.execute("UPDATE results SET accessed = ? WHERE key = ?", (now, key))
+                connection.commit()
+            except sqlite3.Error:
+                # e.g. the database is locked by another process, counted as a miss
+                self.misses += 1
+                return False, None
+
+        try:
+            result = pickle.loads(row[0])
+        except Exception:
+            return False, None
+        self.hits += 1
+        return True, result
+
+    def put(self, key, result):
+        """Store a result, evicting expired and least recently used results"""
+        key = self.key_string(key)
+        if key is None or not self.path:
+            return
+
+        try:
+            data = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            return  # Results that can not be pickled are only kept in memory
+        if len(data) > self.max_bytes:
+            return
+
+        with self._lock:
+            connection = self._connect()
+            if connection is None:
+                return
+
+            import sqlite3
+            now = time.time()
+            try:
+                connection.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)",
+                                   (key, sqlite3.Binary(data), len(data), now, now))
+                self._evict(connection, now)
+                connection.commit()
+            except sqlite3.Error:
+                connection.rollback()
+
+    def info(self):
+        """Get the counters and current size of the cache"""
+        import sqlite3
+        entries, size = 0, 0
+        with self._lock:
+            connection = self._connect()
+            if connection is not None:
+                try:
+                    entries, size = connection.execute(
+                        "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+                except sqlite3.Error:
+                    pass  # e.g. the database is locked by another process
+        return {"hits": self.hits, "misses": self.misses, "entries": entries, "bytes": size}
+
+    def clear(self):
+        """Remove all cached results (returns False if the database could not be changed)"""
+        import sqlite3
+        with self._lock:
+            connection = self._connect()
+            if connection is None:
+                return True
+            try:
+                connection.execute("DELETE FROM results")
+                connection.commit()
+            except sqlite3.Error:
+                # e.g. the database is locked by another process or corrupt
+                connection.rollback()
+                return False
+            try:
+                connection.execute("VACUUM")
+            except sqlite3.Error:
+                pass  # The results are removed, only the file stays as large
+            return True
+
+    def _evict(self, connection, now):
+        """Remove expired results and the least recently used results above the size limit"""
+        connection.execute("DELETE FROM results WHERE created < ?", (now - self.ttl,))
+
+        total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in connection.execute(
+                "SELECT key, size FROM results ORDER BY accessed").fetchall():
+            connection.execute("DELETE FROM results WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def _connect(self):
+        """Open the database on first use (None if it can not be opened)"""
+        if self._connection is not None:
+            return self._connection
+
+        # Imported here to keep the startup of the headless runner fast
+        import sqlite3
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            connection.execute("CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, "
+                               "value BLOB, size INTEGER, created REAL, accessed REAL)")
+            connection.commit()
+        except (OSError, sqlite3.Error):
+            # The disk cache is only an optimization
+            self.path = None
+            return None
+
+        self._connection = connection
+        return connection
+
+
+# Results of pure nodes, shared by every node in the process
+shared_memo = MemoCache()
+
+# Persistent results of pure nodes, shared between runs of the editor and the headless runner
+shared_disk_cache = DiskResultCache(
+    os.environ.get("NODE_EDITOR_RESULT_CACHE", DEFAULT_RESULT_CACHE),
+    max_bytes=int(os.environ.get("NODE_EDITOR_RESULT_CACHE_SIZE", 1024 * 1024 * 1024)),
+    ttl=float(os.environ.get("NODE_EDITOR_RESULT_CACHE_TTL", 7 * 24 * 3600))
+)
+
+
+def clear_result_caches():
+    """Remove all memoized results, in memory and on disk
+
+    Returns False if the results on disk could not be removed.
+    """
+    shared_memo.clear()
+    return shared_disk_cache.clear()
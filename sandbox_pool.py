@@ -0,0 +1,339 @@
+import atexit
+import contextlib
+import io
+import math
+import pickle
+import queue
+import signal
+import threading
+from concurrent.futures import Future
+
+from flow_streams import is_stream, guard_stream
+from shared_values import to_shared, view_values, detach_unused, release
+
+# Pool shared by all runs of this process, so its workers stay warm between runs
+_sandbox_pool = None
+_sandbox_lock = threading.Lock()
+
+# Limits of the node running in this worker process, used in the messages of NodeLimitError
+_active_limits = None
+
+
+class NodeLimitError(RuntimeError):
+    """Raised in a sandboxed node that exceeds its CPU time limit"""
+
+
+def _on_cpu_limit(signum, frame):
+    """Stop the running node when the process reaches its CPU time limit (SIGXCPU)"""
+    if _active_limits is not None:
+        raise NodeLimitError(f"CPU time limit of {_active_limits[0]:g} s exceeded")
+
+
+def _address_space():
+    """Get the size of the virtual memory of this process in bytes (0 if unknown)"""
+    try:
+        import os
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return 0
+
+
+@contextlib.contextmanager
+def node_limits(cpu_time=None, memory=None):
+    """Limit the CPU time (seconds) and the additional memory (MB) of code in this process
+
+    Uses ``resource.setrlimit``, so the limits apply to the whole process and need Unix. The
+    CPU time limit has a granularity of one second, and stops the node with NodeLimitError.
+    Allocations beyond the memory limit raise MemoryError.
+    """
+    global _active_limits
+    if not cpu_time and not memory:
+        yield
+        return
+
+    try:
+        import resource
+    except ImportError:
+        raise RuntimeError("Node limits need the resource module (Unix)") from None
+
+    saved = []
+    try:
+        if cpu_time:
+            usage = resource.getrusage(resource.RUSAGE_SELF)
+            soft, hard = resource.getrlimit(resource.RLIMIT_CPU)
+            limit = math.ceil(usage.ru_utime + usage.ru_stime + cpu_time)
+            if hard != resource.RLIM_INFINITY:
+                limit = min(limit, hard)
+            resource.setrlimit(resource.RLIMIT_CPU, (limit, hard))
+            saved.append((resource.RLIMIT_CPU, (soft, hard)))
+        if memory:
+            soft, hard = resource.getrlimit(resource.RLIMIT_AS)
+            limit = _address_space() + int(memory * 1024 * 1024)
+            if hard != resource.RLIM_INFINITY:
+                limit = min(limit, hard)
+            resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+            saved.append((resource.RLIMIT_AS, (soft, hard)))
+
+        _active_limits = (cpu_time, memory)
+        yield
+    finally:
+        _active_limits = None
+        for kind, limits in reversed(saved):
+            resource.setrlimit(kind, limits)
+
+
+def _limit_message(error, memory):
+    """Get the message of a node error, naming the memory limit if the node ran out of memory"""
+    cause = error
+    while cause is not None and not isinstance(cause, MemoryError):
+        cause = cause.__cause__
+    if cause is None or not memory:
+        return str(error)
+    return f"{str(error).rstrip(': ')}: memory limit of {memory:g} MB exceeded"
+
+
+def _run_sandboxed(nodes, spec, values, constants):
+    """Run a node in a worker process and get the reply to send back to the pool"""
+    from flow_engine import FlowNode
+    detach_unused()
+
+    # Nodes are kept between runs, so their compiled function and memoized results are reused
+    node_id = spec["node_id"]
+    cached = nodes.get(node_id)
+    if cached is None or cached[0] != spec:
+        cached = nodes[node_id] = (spec, FlowNode(**spec))
+    node = cached[1]
+    node.globals_env = constants
+
+    stdout = io.StringIO()
+    try:
+        values = view_values(values)
+        with contextlib.redirect_stdout(stdout):
+            with node_limits(spec.get("cpu_limit"), spec.get("memory_limit")):
+                result = node.run(values)
+
+                # Generators can not be sent back to the pool
+                if is_stream(result):
+                    result = list(guard_stream(node.title, result))
+    except Exception as e:
+        return ("error", _limit_message(e, spec.get("memory_limit")), stdout.getvalue())
+
+    result = to_shared(result)
+    try:
+        return ("ok", pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL), stdout.getvalue())
+    except Exception as e:
+        release(result)
+        return ("error", f"Error in node '{node.title}': the result can not be sent back "
+                         f"from the sandbox ({str(e)})", stdout.getvalue())
+
+
+def _sandbox_main(conn, use_disk_cache):
+    """Run the nodes sent by the pool in this worker process until the pipe is closed"""
+    from flow_runtime import freeze_constants
+    from result_cache import shared_disk_cache
+
+    if not use_disk_cache:
+        shared_disk_cache.path = None
+    if hasattr(signal, "SIGXCPU"):
+        signal.signal(signal.SIGXCPU, _on_cpu_limit)
+
+    constants = freeze_constants({})
+    nodes = {}
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            return
+
+        if message[0] == "constants":
+            constants = freeze_constants(pickle.loads(message[1]))
+        elif message[0] == "run":
+            conn.send(_run_sandboxed(nodes, message[1], message[2], constants))
+
+
+class _SandboxWorker:
+    """A worker process of the pool and the thread that feeds it tasks"""
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.process = None
+        self.conn = None
+        self.constants_version = None  # Version of the pool constants the process has
+        self.future = None  # Future of the running task
+        self.killed = False
+        self.start_process()
+
+        self.thread = threading.Thread(target=self.serve, name="sandbox", daemon=True)
+        self.thread.start()
+
+    def start_process(self):
+        parent_conn, child_conn = self.pool.context.Pipe()
+        self.process = self.pool.context.Process(target=_sandbox_main,
+                                                 args=(child_conn, self.pool.use_disk_cache),
+                                                 name="node-sandbox", daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.conn = parent_conn
+        self.constants_version = None
+        self.killed = False
+
+    def kill(self):
+        """Stop the process in the middle of its task (a new process takes its place)
+
+        Called with the lock of the pool held, so the task can not change meanwhile.
+        """
+        self.killed = True
+        self.process.kill()
+
+    def restart_process(self):
+        """Replace the process with a new one and get the exit code of the old one"""
+        self.process.join(1)
+        exitcode = self.process.exitcode
+        self.conn.close()
+        self.start_process()
+        return exitcode
+
+    def serve(self):
+        """Send the tasks of the pool to the process one at a time and set their results"""
+        while True:
+            task = self.pool.tasks.get()
+            if task is None:
+                return
+            future, spec, values = task
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            with self.pool.lock:
+                self.future = future
+            try:
+                reply = self.run_task(spec, values)
+            except Exception as e:
+                reply = None
+                error = e
+            with self.pool.lock:
+                self.future = None
+                killed = self.killed
+
+            # A task cancelled just after its reply arrived still killed the process
+            if killed:
+                self.restart_process()
+
+            try:
+                if reply is None:
+                    raise error
+                if reply[0] != "ok":
+                    raise RuntimeError(reply[1])
+                future.set_result((pickle.loads(reply[1]), reply[2]))
+            except Exception as e:
+                future.set_exception(e)
+
+    def run_task(self, spec, values):
+        """Run one node in the process, starting a new process if it died"""
+        version, payload = self.pool.constants
+        try:
+            if self.constants_version != version:
+                self.conn.send(("constants", payload))
+                self.constants_version = version
+
+            self.conn.send(("run", spec, values))
+            return self.conn.recv()
+
+        except (EOFError, OSError):
+            killed = self.killed
+            exitcode = self.restart_process()
+            if killed:
+                raise RuntimeError(f"Node '{spec['title']}' was stopped") from None
+            raise RuntimeError(f"Error in node '{spec['title']}': its sandbox process died "
+                               f"(exit code {exitcode})") from None
+
+
+class SandboxPool:
+    """Pool of worker processes that run nodes isolated from the editor, kept warm between runs
+
+    A node that crashes its process, runs out of memory or exceeds its CPU time limit only takes
+    down its worker, which is replaced by a new one. Workers keep their compiled functions and
+    memoized results between runs, and receive the constants only when they changed. Large
+    values are passed through shared memory instead of the pipe (see shared_values).
+    """
+
+    def __init__(self, size, use_disk_cache=True):
+        # Imported here to keep the startup of the headless runner fast
+        import multiprocessing
+        method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        self.context = multiprocessing.get_context(method)
+        self.use_disk_cache = use_disk_cache
+        self.tasks = queue.Queue()
+        self.lock = threading.Lock()  # Held while the running tasks of the workers are checked
+        self.constants = (0, pickle.dumps({}))  # Version and pickled constants
+        self.constant_values = {}  # Constants last set, compared by identity
+        self.workers = []
+        self.resize(size)
+
+    def resize(self, size):
+        """Start workers until the pool has at least ``size`` of them"""
+        while len(self.workers) < size:
+            self.workers.append(_SandboxWorker(self))
+
+    def set_constants(self, constants):
+        """Set the constants of the next tasks (sent to each worker once per change)
+
+        The constants are only pickled again when one of them was replaced, since pickling
+        reads large arrays (e.g. memory-mapped .npy files) in full.
+        """
+        from flow_runtime import same_constants
+        if same_constants(constants, self.constant_values):
+            return
+        self.constant_values = dict(constants)
+        payload = pickle.dumps(self.constant_values, protocol=pickle.HIGHEST_PROTOCOL)
+        if payload != self.constants[1]:
+            self.constants = (self.constants[0] + 1, payload)
+
+    def submit(self, spec, values):
+        """Run a node (see flow_engine.node_spec) in a worker and get a future of its result
+
+        The result of the future is a tuple of the node result and its stdout. Large results
+        are handles of shared memory blocks, which the caller releases.
+        """
+        future = Future()
+        self.tasks.put((future, spec, values))
+        return future
+
+    def cancel(self, futures):
+        """Cancel tasks, stopping the workers that are running them"""
+        for future in futures:
+            if future.cancel():
+                continue
+            with self.lock:
+                for worker in self.workers:
+                    if worker.future is future:
+                        worker.kill()
+
+    def close(self):
+        """Stop all workers"""
+        for _ in self.workers:
+            self.tasks.put(None)
+        for worker in self.workers:
+            worker.conn.close()
+            worker.process.join(1)
+            if worker.process.is_alive():
+                worker.process.kill()
+        self.workers = []
+
+
+def get_sandbox_pool(size=1):
+    """Get the sandbox pool shared by all runs, with at least ``size`` workers"""
+    global _sandbox_pool
+    from result_cache import shared_disk_cache
+
+    with _sandbox_lock:
+        use_disk_cache = bool(shared_disk_cache.path)
+        if _sandbox_pool is not None and _sandbox_pool.use_disk_cache != use_disk_cache:
+            _sandbox_pool.close()
+            _sandbox_pool = None
+        if _sandbox_pool is None:
+            _sandbox_pool = SandboxPool(size, use_disk_cache)
+            atexit.register(_sandbox_pool.close)
+        else:
+            _sandbox_pool.resize(size)
+        return _sandbox_pool
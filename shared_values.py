@@ -0,0 +1,194 @@
+import os
+import threading
+from multiprocessing import shared_memory
+
+from array_support import is_array
+
+# Values of at least this many bytes are passed to other processes through shared memory
+SHARED_MIN_SIZE = int(os.environ.get("NODE_EDITOR_SHARED_MIN_SIZE", 1 << 20))
+
+# Blocks attached by this process for zero-copy array views, closed once no view uses them
+_attached = {}
+
+
+class SharedValue:
+    """Handle of a value placed in a shared memory block, sent between processes in its place
+
+    Only the name of the block and the type of the value are pickled, so sending the handle
+    costs the same for any size of value.
+    """
+
+    def __init__(self, name, kind, size, shape=None, dtype=None):
+        self.name = name
+        self.kind = kind  # 'bytes', 'bytearray', 'str' or 'ndarray'
+        self.size = size
+        self.shape = shape
+        self.dtype = dtype
+
+    def __repr__(self):
+        return f"<SharedValue {self.kind} of {self.size} bytes in {self.name}>"
+
+
+def to_shared(value, min_size=None):
+    """Copy a large bytes, bytearray, str or NumPy array into a new shared memory block
+
+    Returns a :py:class:`SharedValue` to send in place of the value, or the value itself if it
+    is small or of another type. The block exists until :py:func:`release` is called. Only
+    arrays are read in place by the receiving process; bytes, bytearray and str values are
+    copied out of the block there (see :py:func:`view_shared`).
+    """
+    min_size = SHARED_MIN_SIZE if min_size is None else min_size
+    if isinstance(value, SharedValue):
+        return value
+    if isinstance(value, str):
+        # Checked before encoding, since the encoded text is at least as long
+        if len(value) < min_size:
+            return value
+        kind, shape, dtype, data = "str", None, None, value.encode("utf-8", "surrogatepass")
+    elif isinstance(value, (bytes, bytearray)):
+        kind, shape, dtype, data = type(value).__name__, None, None, value
+    elif is_array(value) and not value.dtype.hasobject:
+        kind, shape, dtype = "ndarray", value.shape, value.dtype.str
+        data = value if value.flags.c_contiguous else value.copy()
+    else:
+        return value
+
+    size = data.nbytes if kind == "ndarray" else len(data)
+    if size < min_size:
+        return value
+
+    block = shared_memory.SharedMemory(create=True, size=max(size, 1))
+    try:
+        block.buf[:size] = data.reshape(-1).view("B") if kind == "ndarray" else data
+    finally:
+        block.close()
+    return SharedValue(block.name, kind, size, shape, dtype)
+
+
+def from_shared(value):
+    """Get a copy of the value of a handle (other values are returned as they are)"""
+    if not isinstance(value, SharedValue):
+        return value
+
+    block = shared_memory.SharedMemory(value.name)
+    try:
+        if value.kind == "ndarray":
+            import numpy as np
+            return np.ndarray(value.shape, value.dtype, buffer=block.buf).copy()
+        return _copy_data(value, block)
+    finally:
+        block.close()
+
+
+def view_shared(value):
+    """Get the value of a handle without copying arrays (other values are returned as they are)
+
+    Arrays are read-only views of the block, since other nodes may read the same block. The
+    block stays mapped in this process while a view of it exists (see :py:func:`detach_unused`).
+    Bytes and strings are copied, as Python can not create them on top of existing memory.
+    """
+    if not isinstance(value, SharedValue):
+        return value
+
+    block = shared_memory.SharedMemory(value.name)
+    if value.kind != "ndarray":
+        try:
+            return _copy_data(value, block)
+        finally:
+            block.close()
+
+    import numpy as np
+    array = np.ndarray(value.shape, value.dtype, buffer=block.buf)
+    array.flags.writeable = False
+    _attached.setdefault(value.name, []).append(block)
+    return array
+
+
+def _copy_data(value, block):
+    """Copy the bytes, bytearray or str of a handle out of its block"""
+    data = block.buf[:value.size]
+    try:
+        if value.kind == "str":
+            return str(data, "utf-8", "surrogatepass")
+        return bytes(data) if value.kind == "bytes" else bytearray(data)
+    finally:
+        data.release()
+
+
+def detach_unused():
+    """Close the blocks attached by :py:func:`view_shared` that no array uses anymore"""
+    for name, blocks in list(_attached.items()):
+        for block in list(blocks):
+            try:
+                block.close()
+            except BufferError:
+                continue  # Still used, e.g. by a memoized result
+            blocks.remove(block)
+        if not blocks:
+            del _attached[name]
+
+
+def view_values(values):
+    """Get the input values of a node from the handles sent to its process"""
+    return {name: [view_shared(item) for item in value] if isinstance(value, list)
+            else view_shared(value) for name, value in values.items()}
+
+
+def release(value):
+    """Remove the shared memory block of a handle (other values are ignored)
+
+    Processes that still map the block keep their views, but no process can attach it anymore.
+    """
+    if not isinstance(value, SharedValue):
+        return
+    try:
+        block = shared_memory.SharedMemory(value.name)
+    except FileNotFoundError:
+        return
+    block.close()
+    block.unlink()
+
+
+class SharedRefs:
+    """Reference counts of the shared memory blocks of node results during a run
+
+    The result of a node that ran in another process stays in its block and every node using
+    it attaches that block, so the value is not pickled or copied for each of them. The block
+    is removed once the last of them ran.
+    """
+
+    def __init__(self):
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def add(self, value, count):
+        """Keep a handle until ``count`` nodes are done with it (released right away for 0)"""
+        if not isinstance(value, SharedValue):
+            return
+        if count <= 0:
+            release(value)
+            return
+        with self._lock:
+            self._counts[value.name] = [value, count]
+
+    def done(self, value):
+        """Mark one of the nodes using a handle as done, releasing it after the last one"""
+        if not isinstance(value, SharedValue):
+            return
+        with self._lock:
+            entry = self._counts.get(value.name)
+            if entry is None:
+                return
+            entry[1] -= 1
+            if entry[1] > 0:
+                return
+            del self._counts[value.name]
+        release(value)
+
+    def clear(self):
+        """Release every handle still kept (e.g. when a run stops early)"""
+        with self._lock:
+            values = [value for value, count in self._counts.values()]
+            self._counts.clear()
+        for value in values:
+            release(value)
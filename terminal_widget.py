@@ -1,16 +1,30 @@
+from collections import deque
+
 from PyQt5.QtWidgets import QPlainTextEdit, QWidget, QVBoxLayout, QHBoxLayout, QLabel
-from PyQt5.QtCore import Qt, pyqtSignal
+from PyQt5.QtCore import Qt, pyqtSignal, QTimer
 from PyQt5.QtGui import QColor, QTextCharFormat, QFont, QTextCursor
 
 class TerminalWidget(QWidget):
     """Terminal widget for displaying command execution output"""
     
-    def __init__(self):
+    def __init__(self, max_lines=10000, flush_interval=50):
         super().__init__()
         
+        # Messages waiting for the next flush, as (text, message type) pairs
+        self.max_lines = max_lines
+        self._pending = deque()
+        self._pending_lines = 0
+        self._dropped_lines = 0
+        
         # Set up the UI
         self.setup_ui()
         
+        # Coalesce the messages of one interval into a single update of the document
+        self._flush_timer = QTimer(self)
+        self._flush_timer.setSingleShot(True)
+        self._flush_timer.setInterval(flush_interval)
+        self._flush_timer.timeout.connect(self.flush)
+        
     def setup_ui(self):
         """Set up the terminal UI"""
         layout = QVBoxLayout(self)
@@ -27,6 +41,10 @@ class TerminalWidget(QWidget):
         # Terminal output area
         self.terminal = QPlainTextEdit()
         self.terminal.setReadOnly(True)
+        self.terminal.setUndoRedoEnabled(False)
+        
+        # Limit the scrollback, the oldest lines are removed first
+        self.terminal.setMaximumBlockCount(self.max_lines)
         
         # Set monospace font
         font = QFont("Menlo", 10)  # Just use Menlo which is available on macOS
@@ -62,31 +80,75 @@ class TerminalWidget(QWidget):
         
     def clear(self):
         """Clear the terminal"""
+        self._pending.clear()
+        self._pending_lines = 0
+        self._dropped_lines = 0
         self.terminal.clear()
+    
+    def set_max_lines(self, max_lines):
+        """Change the number of lines kept in the scrollback"""
+        self.max_lines = max_lines
+        self.terminal.setMaximumBlockCount(max_lines)
         
     def append_message(self, message, message_type="standard"):
-        """Append a message to the terminal"""
-        cursor = self.terminal.textCursor()
+        """Append a message to the terminal (shown on the next flush)"""
+        # Add a newline if the message doesn't end with one
+        if not message.endswith('\n'):
+            message += '\n'
+        
+        self._pending.append((message, message_type))
+        self._pending_lines += message.count('\n')
+        
+        # Lines above the scrollback limit would be removed right after the flush
+        while self._pending_lines > self.max_lines and len(self._pending) > 1:
+            dropped, _ = self._pending.popleft()
+            self._pending_lines -= dropped.count('\n')
+            self._dropped_lines += dropped.count('\n')
+        
+        if not self._flush_timer.isActive():
+            self._flush_timer.start()
+    
+    def flush(self):
+        """Insert the pending messages into the terminal"""
+        self._flush_timer.stop()
+        if not self._pending:
+            return
+        
+        cursor = QTextCursor(self.terminal.document())
         cursor.movePosition(QTextCursor.End)
+        cursor.beginEditBlock()
+        
+        if self._dropped_lines:
+            cursor.setCharFormat(self.format_info)
+            cursor.insertText(f"... {self._dropped_lines} line(s) of output dropped ...\n")
+        
+        # Insert consecutive messages of the same type at once
+        pending = list(self._pending)
+        start = 0
+        while start < len(pending):
+            message_type = pending[start][1]
+            end = start
+            while end < len(pending) and pending[end][1] == message_type:
+                end += 1
+            cursor.setCharFormat(self.get_format(message_type))
+            cursor.insertText("".join(text for text, _ in pending[start:end]))
+            start = end
         
-        # Choose format based on message type
+        cursor.endEditBlock()
+        self._pending.clear()
+        self._pending_lines = 0
+        self._dropped_lines = 0
+        
+        # Scroll to the new content
+        scroll_bar = self.terminal.verticalScrollBar()
+        scroll_bar.setValue(scroll_bar.maximum())
+    
+    def get_format(self, message_type):
+        """Get the text format of a message type"""
         if message_type == "error":
-            text_format = self.format_error
+            return self.format_error
         elif message_type == "success":
-            text_format = self.format_success
+            return self.format_success
         elif message_type == "info":
-            text_format = self.format_info
-        else:
-            text_format = self.format_standard
-            
-        # Insert text with the specified format
-        cursor.setCharFormat(text_format)
-        cursor.insertText(message)
-        
-        # Add a newline if the message doesn't end with one
-        if not message.endswith('\n'):
-            cursor.insertText('\n')
-            
-        # Scroll to the new content
-        self.terminal.setTextCursor(cursor)
-        self.terminal.ensureCursorVisible()
+            return self.format_info
+        return self.format_standard